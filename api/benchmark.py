@@ -0,0 +1,206 @@
+"""
+Benchmark of the API routes.
+
+run_benchmark requests every route of api.urls with the test client, the
+routes of an investigator once per investigator given, and returns the
+latency percentiles and the number of queries of each route, read from the
+X-Query-Count header of QueryInstrumentationMiddleware. The results are
+saved as JSON and compared to a saved baseline with diff_results.
+
+run_serializer_benchmark compares the rows per second of the list
+serializers and of the ValuesSerializer returning the same data, and
+checks that both render the same JSON.
+"""
+import time
+
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+
+from . import urls
+from .serializers import ClinicalTrialValuesSerializer, \
+                         EventValuesSerializer, \
+                         FavoriteMedicalExpertValuesSerializer, \
+                         InvestigatorValuesSerializer, \
+                         InvestigatorValuesSerializerSuperUser, \
+                         PublicationValuesSerializer, \
+                         SpeakerValuesSerializer
+
+# the queryset of each serializer prefetches the related objects it reads
+SERIALIZER_BENCHMARKS = (
+    ('investigators', InvestigatorValuesSerializer,
+     ('country',), ('therapeutic_areas', 'specialties')),
+    ('investigators_superuser', InvestigatorValuesSerializerSuperUser,
+     ('country',), ('therapeutic_areas', 'specialties')),
+    ('speakers', SpeakerValuesSerializer,
+     ('country',), ('therapeutic_areas', 'specialties')),
+    ('favorite_investigators', FavoriteMedicalExpertValuesSerializer,
+     ('country',), ('therapeutic_areas', 'specialties')),
+    ('clinical_trials', ClinicalTrialValuesSerializer,
+     ('recruitment_status', 'study_type', 'enrollment'),
+     ('condition', 'study_phases')),
+    ('events', EventValuesSerializer, ('event_subtype', 'country'), ()),
+    ('publications', PublicationValuesSerializer,
+     ('publication_subtype',), ()),
+)
+
+
+def get_percentile(values, percentile):
+    """
+    Return the nearest rank PERCENTILE of the sorted VALUES
+    """
+    if not values:
+        return None
+    rank = int(round(percentile / 100.0 * len(values) + 0.5)) - 1
+    return values[max(0, min(rank, len(values) - 1))]
+
+
+def get_routes(pks, names=None):
+    """
+    Return the [(name, urls)] of the API routes, or of the routes NAMES,
+    the routes of an investigator having one url per investigator of PKS
+    """
+    routes = []
+    for pattern in urls.urlpatterns:
+        if names and pattern.name not in names:
+            continue
+        if 'pk' in pattern.regex.groupindex:
+            route_urls = [reverse(pattern.name, kwargs={'pk': pk})
+                          for pk in pks]
+        else:
+            route_urls = [reverse(pattern.name)]
+        routes.append((pattern.name, route_urls))
+    return routes
+
+
+def summarize(times, queries):
+    times = sorted(times)
+    queries = sorted(queries)
+    return {
+        'requests': len(times),
+        'p50_ms': get_percentile(times, 50),
+        'p95_ms': get_percentile(times, 95),
+        'p99_ms': get_percentile(times, 99),
+        'max_ms': times[-1] if times else None,
+        'queries': get_percentile(queries, 50),
+        'max_queries': queries[-1] if queries else None,
+    }
+
+
+def run_benchmark(user, pks, repeat=20, warmup=1, cold=False, names=None,
+                  log=None):
+    """
+    Request each route REPEAT times per url, after WARMUP requests, as
+    USER, clearing the cache before each request when COLD. Return the
+    {name: results} of the routes
+    """
+    client = Client()
+    client.force_login(user)
+    results = {}
+    for name, route_urls in get_routes(pks, names):
+        times = []
+        queries = []
+        errors = 0
+        for url in route_urls:
+            for i in range(warmup):
+                client.get(url)
+            for i in range(repeat):
+                if cold:
+                    cache.clear()
+                start = time.time()
+                response = client.get(url)
+                elapsed = (time.time() - start) * 1000
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+                times.append(elapsed)
+                if response.has_header('X-Query-Count'):
+                    queries.append(int(response['X-Query-Count']))
+        results[name] = summarize(times, queries)
+        results[name]['errors'] = errors
+        if log is not None:
+            log(name, results[name])
+    return results
+
+
+def diff_results(baseline, results, threshold=20):
+    """
+    Return the [(name, field, old, new, regression)] changes from BASELINE
+    to RESULTS. More queries, or a p95 more than THRESHOLD percent slower,
+    is a regression
+    """
+    changes = []
+    for name in sorted(results):
+        if name not in baseline:
+            changes.append((name, 'new', None, None, False))
+            continue
+        old, new = baseline[name], results[name]
+        for field in ('p50_ms', 'p95_ms', 'queries', 'errors'):
+            if old.get(field) is None or new.get(field) is None:
+                continue
+            if field == 'p95_ms':
+                regression = new[field] > old[field] * (1 + threshold / 100.0)
+            elif field.endswith('_ms'):
+                regression = False
+            else:
+                regression = new[field] > old[field]
+            changes.append((name, field, old[field], new[field], regression))
+    for name in sorted(set(baseline) - set(results)):
+        changes.append((name, 'removed', None, None, False))
+    return changes
+
+
+def time_serializer(serializer_class, queryset, context, repeat):
+    """
+    Return the best time in seconds of REPEAT serializations of QUERYSET,
+    rows included, and the data of the last one
+    """
+    best = None
+    for i in range(repeat):
+        start = time.time()
+        data = serializer_class(queryset.all(), many=True,
+                                context=context).data
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, data
+
+
+def run_serializer_benchmark(rows=1000, repeat=5, names=None, log=None):
+    """
+    Serialize the first ROWS objects of each of SERIALIZER_BENCHMARKS, or
+    of the benchmarks NAMES, REPEAT times with the ModelSerializer and with
+    the ValuesSerializer. Return the {name: results} of the benchmarks
+    """
+    # flags resolved once per page by the views
+    context = {'unlocked_investigators': set(),
+               'favorite_investigators': set()}
+    renderer = JSONRenderer()
+    results = {}
+    for name, values_serializer_class, select_related, prefetch_related in \
+            SERIALIZER_BENCHMARKS:
+        if names and name not in names:
+            continue
+        serializer_class = values_serializer_class.serializer_class
+        queryset = serializer_class.Meta.model.objects.order_by('pk')
+        pks = list(queryset.values_list('pk', flat=True)[:rows])
+        queryset = queryset.filter(pk__in=pks)
+        model_time, model_data = time_serializer(
+            serializer_class, queryset.select_related(*select_related).
+            prefetch_related(*prefetch_related), context, repeat)
+        values_time, values_data = time_serializer(
+            values_serializer_class,
+            values_serializer_class.get_values_queryset(queryset), context,
+            repeat)
+        results[name] = {
+            'rows': len(pks),
+            'model_rows_per_s': len(pks) / model_time,
+            'values_rows_per_s': len(pks) / values_time,
+            'speedup': model_time / values_time,
+            'identical': renderer.render(model_data) ==
+            renderer.render(values_data),
+        }
+        if log is not None:
+            log(name, results[name])
+    return results
@@ -0,0 +1,94 @@
+import hashlib
+
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response
+from django.utils.encoding import force_bytes
+from django.utils.http import quote_etag
+
+from rest_framework.renderers import JSONRenderer
+
+from app_helpers.cache import get_table_generations
+
+from .pagination import CountedLimitOffsetPagination, KeysetPagination
+
+
+def make_etag(*parts):
+    """
+    Return the ETag of PARTS, unquoted
+    """
+    return hashlib.md5(force_bytes(repr(parts))).hexdigest()
+
+
+def make_data_etag(data):
+    """
+    Return the ETag of the serialized DATA, unquoted
+    """
+    return hashlib.md5(JSONRenderer().render(data)).hexdigest()
+
+
+class ConditionalGetMixin(object):
+    """
+    Answer 304 Not Modified when the If-None-Match header of a GET request
+    matches the ETag of the view, before the queryset is evaluated and
+    serialized. The ETag is made of the path, the user and the cheap
+    validator returned by get_etag_parts, or no ETag is sent when it
+    returns None
+    """
+
+    def get_etag_parts(self, request):
+        return None
+
+    def get_etag(self, request):
+        parts = self.get_etag_parts(request)
+        if parts is None:
+            return None
+        return make_etag(type(self).__name__, request.get_full_path(),
+                         request.user.pk, request.user.is_superuser, parts)
+
+    def get(self, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag is not None:
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return response
+        response = super(ConditionalGetMixin, self).get(
+            request, *args, **kwargs)
+        if etag is not None and response.status_code == 200 and \
+                not response.has_header('ETag'):
+            response['ETag'] = quote_etag(etag)
+        return response
+
+
+class LastChangedConditionalGetMixin(ConditionalGetMixin):
+    """
+    Validate the response with the latest last_changed_on and the number of
+    rows of the filtered queryset, read with one aggregate query, and the
+    sums of ETAG_SUM_FIELDS, the columns updated without last_changed_on.
+    Keyset pages, which run no COUNT, are validated with the values of
+    their own rows instead. The generations of the tables of
+    get_etag_related_models, the names and links read with the rows, are
+    part of the validator too. The number of rows of the aggregate is
+    reused by the pagination, so the ETag costs no query of its own
+    """
+    etag_sum_fields = ()
+    pagination_class = CountedLimitOffsetPagination
+    etag_count = None
+
+    def get_etag_related_models(self):
+        return ()
+
+    def get_etag_parts(self, request):
+        generations = get_table_generations(self.get_etag_related_models())
+        queryset = self.filter_queryset(self.get_queryset())
+        if isinstance(self.paginator, KeysetPagination):
+            return [list(self.paginator.get_page_queryset(
+                queryset, request).values_list(
+                    'pk', 'last_changed_on', *self.etag_sum_fields)),
+                generations]
+        aggregates = dict(
+            ('sum_%s' % field, Sum(field)) for field in self.etag_sum_fields)
+        aggregates.update(last_changed_on=Max('last_changed_on'),
+                          count=Count('pk'))
+        values = queryset.order_by().aggregate(**aggregates)
+        self.etag_count = values['count']
+        return [sorted(values.items()), generations]
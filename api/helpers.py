@@ -1,84 +1,49 @@
-from app.models_relations import MedicalExpertClinicalTrial, \
-                                 MedicalExpertEvent, \
-                                 MedicalExpertInstitution, \
-                                 MedicalExpertPublication
+from collections import OrderedDict
 
+from django.db.models import Case, Count, When
 
-def medical_expert_connections(medical_expert):
-    connections = []
-
-    connections_authors = MedicalExpertPublication.objects. \
-        filter(publication__in=MedicalExpertPublication.objects.
-               filter(medical_expert=medical_expert).exclude(publication=None).
-               values('publication')). \
-        exclude(medical_expert=medical_expert).values('medical_expert'). \
-        distinct().count()
-    if connections_authors > 0:
-        connections.append({'connection_type': 'authors',
-                            'label': 'Authors',
-                            'total': connections_authors})
-
-    connections_event_participants = MedicalExpertEvent.objects. \
-        filter(event__in=MedicalExpertEvent.objects.
-               filter(medical_expert=medical_expert).exclude(event=None).
-               values('event')). \
-        exclude(medical_expert=medical_expert).values('medical_expert'). \
-        distinct().count()
-    if connections_event_participants > 0:
-        connections.append({'connection_type': 'event_participants',
-                            'label': 'Event Participants',
-                            'total': connections_event_participants})
-
-    physicians_institutions_filter = {
-        'institution__institution_subtype__name__in':
-        ['Hospital', 'Hospital Department', 'Medical Practice'],
-        'position__name__in': ['Role Physician', 'Head of'],
-    }
-    connections_physicians = MedicalExpertInstitution.objects. \
-        filter(institution__in=MedicalExpertInstitution.objects.
-               filter(medical_expert=medical_expert).exclude(institution=None).
-               exclude(institution__institution_subtype=None).
-               exclude(position=None).
-               filter(**physicians_institutions_filter).
-               values('institution')). \
-        exclude(medical_expert=medical_expert).count()
-    if connections_physicians > 0:
-        connections.append({'connection_type': 'physicians',
-                            'label': 'Physicians',
-                            'total': connections_physicians})
+from app.models import MedicalExpert
+from app.models_relations import MedicalExpertConnectionAuthor, \
+                                 MedicalExpertConnectionCTCollaborator, \
+                                 MedicalExpertConnectionEventParticipant, \
+                                 MedicalExpertConnectionPhysician, \
+                                 MedicalExpertConnectionResearcher, \
+                                 MedicalExpertInstitution
+from client.models import FavoriteInvestigator, UnlockedInvestigator
 
-    esearchers_institutions_exclude = {
-            'institution__institution_subtype__name__in':
-            ['Hospital', 'Hospital Department', 'Medical Practice'],
-            'position__name__in': ['Role Physician', 'Head of'],
-        }
-    connections_researchers = MedicalExpertInstitution.objects. \
-        filter(institution__in=MedicalExpertInstitution.objects.
-               filter(medical_expert=medical_expert).exclude(institution=None).
-               exclude(institution__institution_subtype=None).
-               exclude(position=None).
-               exclude(**esearchers_institutions_exclude).
-               values('institution')). \
-        exclude(medical_expert=medical_expert).values('medical_expert'). \
-        distinct().count()
-    if connections_researchers > 0:
-        connections.append({'connection_type': 'researchers',
-                            'label': 'Researchers & Co',
-                            'total': connections_researchers})
 
-    connections_clinical_trial_collaborators = \
-        MedicalExpertClinicalTrial.objects. \
-        filter(clinical_trial__in=MedicalExpertClinicalTrial.objects.
-               filter(medical_expert=medical_expert).
-               exclude(clinical_trial=None).values('clinical_trial').
-               distinct()). \
-        exclude(medical_expert=medical_expert).values('medical_expert'). \
-        distinct().count()
-    if connections_clinical_trial_collaborators > 0:
-        connections.append({'connection_type': 'clinical_trial_collaborators',
-                            'label': 'Investigators',
-                            'total': connections_clinical_trial_collaborators})
+def medical_expert_connections(medical_expert):
+    connection_types = (
+        ('authors', 'Authors', MedicalExpertConnectionAuthor),
+        ('event_participants', 'Event Participants',
+         MedicalExpertConnectionEventParticipant),
+        ('physicians', 'Physicians', MedicalExpertConnectionPhysician),
+        ('researchers', 'Researchers & Co', MedicalExpertConnectionResearcher),
+        ('clinical_trial_collaborators', 'Investigators',
+         MedicalExpertConnectionCTCollaborator),
+    )
+    # count all the connection types in one query, with a subquery each
+    medical_expert_table = MedicalExpert._meta.db_table
+    select = OrderedDict()
+    for connection_type, label, connection_model in connection_types:
+        select[connection_type] = \
+            'SELECT COUNT(*) FROM {table} WHERE {table}.{column} = ' \
+            '{medical_expert_table}.id'.format(
+                table=connection_model._meta.db_table,
+                column=connection_model._meta.get_field(
+                    'medical_expert').column,
+                medical_expert_table=medical_expert_table)
+    totals = MedicalExpert.objects. \
+        filter(pk=getattr(medical_expert, 'pk', medical_expert)). \
+        extra(select=select).values(*select.keys()).first() or {}
 
+    connections = []
+    for connection_type, label, connection_model in connection_types:
+        total = totals.get(connection_type)
+        if total > 0:
+            connections.append({'connection_type': connection_type,
+                                'label': label,
+                                'total': total})
     return connections
 
 
@@ -87,43 +52,61 @@ def medical_expert_affiliations(medical_expert):
         'universities': ['University', 'University Department'],
         'hospitals': ['Hospital', 'Hospital Department', 'Medical Practice'],
     }
-    affiliations = []
-
     affiliations_universities_filter = {
         'institution__institution_subtype__name__in':
         institution_categories['universities']
     }
-    affiliations_universities = \
-        MedicalExpertInstitution.objects. \
-        filter(medical_expert=medical_expert).exclude(institution=None). \
-        exclude(institution__institution_subtype=None). \
-        filter(**affiliations_universities_filter).count()
-    affiliations.append({'affiliation_type': 'universities',
-                         'total': affiliations_universities})
-
     affiliations_hospitals_filter = {
         'institution__institution_subtype__name__in':
         institution_categories['hospitals']
     }
-    affiliations_hospitals = \
-        MedicalExpertInstitution.objects. \
+    # count all the institution categories in one pass, associations being
+    # the affiliations which are neither universities nor hospitals
+    totals = MedicalExpertInstitution.objects. \
         filter(medical_expert=medical_expert).exclude(institution=None). \
         exclude(institution__institution_subtype=None). \
-        filter(**affiliations_hospitals_filter).count()
-    affiliations.append({'affiliation_type': 'hospitals',
-                         'total': affiliations_hospitals})
-
-    affiliations_associations_exclude = {
-        'institution__institution_subtype__name__in':
-        institution_categories['universities'] +
-        institution_categories['hospitals']
-    }
-    affiliations_associations = \
-        MedicalExpertInstitution.objects. \
-        filter(medical_expert=medical_expert).exclude(institution=None). \
-        exclude(institution__institution_subtype=None). \
-        exclude(**affiliations_associations_exclude).count()
-    affiliations.append({'affiliation_type': 'associations',
-                         'total': affiliations_associations})
+        aggregate(
+            total=Count('pk'),
+            universities=Count(Case(When(then=1,
+                                         **affiliations_universities_filter))),
+            hospitals=Count(Case(When(then=1,
+                                      **affiliations_hospitals_filter))))
 
+    affiliations = [
+        {'affiliation_type': 'universities',
+         'total': totals['universities']},
+        {'affiliation_type': 'hospitals',
+         'total': totals['hospitals']},
+        {'affiliation_type': 'associations',
+         'total': totals['total'] - totals['universities'] -
+         totals['hospitals']},
+    ]
     return affiliations
+
+
+def medical_expert_profile_summary(medical_expert):
+    return {'affiliations': medical_expert_affiliations(medical_expert),
+            'connections': medical_expert_connections(medical_expert)}
+
+
+def medical_expert_investigator_flags(user, medical_experts):
+    """
+    Return the pks of MEDICAL_EXPERTS, instances or .values() rows,
+    unlocked and marked as favorite by USER, resolved with one query each
+    """
+    medical_experts_pks = [
+        medical_expert['pk'] if isinstance(medical_expert, dict)
+        else medical_expert.pk for medical_expert in medical_experts]
+    unlocked_investigators = set()
+    favorite_investigators = set()
+    if user and user.is_authenticated and medical_experts_pks:
+        unlocked_investigators = set(
+            UnlockedInvestigator.objects.
+            filter(user=user, investigator__in=medical_experts_pks).
+            values_list('investigator', flat=True))
+        favorite_investigators = set(
+            FavoriteInvestigator.objects.
+            filter(user=user, investigator__in=medical_experts_pks).
+            values_list('investigator', flat=True))
+    return {'unlocked_investigators': unlocked_investigators,
+            'favorite_investigators': favorite_investigators}
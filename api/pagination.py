@@ -0,0 +1,193 @@
+import json
+import operator
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.db.models import Q
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only pagination on the (ordering fields..., pk) tuple of the last
+    row of the page. Each page filters on that tuple instead of using an
+    OFFSET, so deep pages cost the same as the first one, and no COUNT is
+    run. NULLs are ordered as by MySQL and SQLite: first when ascending,
+    last when descending
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        rows = list(self.get_page_queryset(queryset, request))
+        self.has_next = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        return self.page
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the rows of QUERYSET on the page of REQUEST, and the first row
+        of the next page
+        """
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+
+        queryset = queryset.order_by(*[
+            '-%s' % field if descending else field
+            for field, descending in self.ordering])
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.get_cursor_filter(cursor))
+        return queryset[:self.page_size + 1]
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data)
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """
+        Return the (field, descending) ordering of QUERYSET, ending with the
+        primary key so that the cursor is unique
+        """
+        query = queryset.query
+        order_by = query.order_by or \
+            (query.get_meta().ordering if query.default_ordering else [])
+        ordering = []
+        for field in order_by:
+            descending = field.startswith('-')
+            field = field.lstrip('-')
+            if field in ('pk', query.get_meta().pk.name):
+                ordering.append(('pk', descending))
+                return ordering
+            ordering.append((field, descending))
+        ordering.append(('pk', False))
+        return ordering
+
+    def get_cursor_filter(self, cursor):
+        """
+        Return the condition selecting the rows ordered after CURSOR
+        """
+        conditions = []
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, cursor):
+            if value is None:
+                after = None if descending else \
+                    Q(**{'%s__isnull' % field: False})
+                same = Q(**{'%s__isnull' % field: True})
+            else:
+                if descending:
+                    after = Q(**{'%s__lt' % field: value}) | \
+                        Q(**{'%s__isnull' % field: True})
+                else:
+                    after = Q(**{'%s__gt' % field: value})
+                same = Q(**{field: value})
+            if after is not None:
+                conditions.append(equal & after)
+            equal &= same
+        return reduce(operator.or_, conditions)
+
+    def get_row_value(self, row, field):
+        if isinstance(row, dict):
+            return row[field]
+        value = row
+        for attr in field.split('__'):
+            value = getattr(value, attr, None)
+            if value is None:
+                break
+        if hasattr(value, '_meta'):
+            value = value.pk
+        return value
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        cursor = [self.get_row_value(self.page[-1], field)
+                  for field, descending in self.ordering]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param,
+                                   self.encode_cursor(cursor))
+
+    def encode_cursor(self, cursor):
+        data = {'ordering': ['-%s' % field if descending else field
+                             for field, descending in self.ordering],
+                'values': cursor}
+        return urlsafe_b64encode(
+            json.dumps(data, default=unicode).encode('utf-8'))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')).
+                              decode('utf-8'))
+            ordering = ['-%s' % field if descending else field
+                        for field, descending in self.ordering]
+            if data['ordering'] != ordering or \
+               len(data['values']) != len(ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return data['values']
+
+
+class CountedLimitOffsetPagination(LimitOffsetPagination):
+    """
+    LimitOffsetPagination reusing the number of rows counted by the view in
+    its ETAG_COUNT attribute, when set, instead of running a COUNT again
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        count = getattr(view, 'etag_count', None)
+        if count is None:
+            return super(CountedLimitOffsetPagination, self). \
+                paginate_queryset(queryset, request, view)
+        self.count = count
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+
+        self.offset = self.get_offset(request)
+        self.request = request
+        if self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+
+        if self.count == 0 or self.offset > self.count:
+            return []
+        return list(queryset[self.offset:self.offset + self.limit])
+
+
+class KeysetPaginationMixin(object):
+    """
+    Use KeysetPagination when the "pagination=cursor" query parameter is
+    given, the default pagination otherwise
+    """
+    pagination_query_param = 'pagination'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and \
+           self.request.query_params.get(
+               self.pagination_query_param) == 'cursor':
+            self._paginator = KeysetPagination()
+        return super(KeysetPaginationMixin, self).paginator
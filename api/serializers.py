@@ -1,3 +1,5 @@
+from collections import OrderedDict, defaultdict
+
 from rest_framework import serializers
 from rest_framework_constant.fields import ConstantField
 
@@ -5,6 +7,8 @@ from app.models import ClinicalTrial, Event, MedicalExpert, Publication
 from app.models_relations import MedicalExpertInstitutionCOI
 from client.models import Request
 
+from .helpers import medical_expert_investigator_flags
+
 
 class InvestigatorSerializer(serializers.ModelSerializer):
     country = serializers.StringRelatedField()
@@ -14,10 +18,16 @@ class InvestigatorSerializer(serializers.ModelSerializer):
         '_is_favorite_investigator')
 
     def _is_unlocked_investigator(self, obj):
+        unlocked_investigators = self.context.get('unlocked_investigators')
+        if unlocked_investigators is not None:
+            return obj.pk in unlocked_investigators
         user = self.context['request'].user
         return obj.is_unlocked_investigator(user)
 
     def _is_favorite_investigator(self, obj):
+        favorite_investigators = self.context.get('favorite_investigators')
+        if favorite_investigators is not None:
+            return obj.pk in favorite_investigators
         user = self.context['request'].user
         return obj.is_favorite_investigator(user)
 
@@ -91,6 +101,14 @@ class MedicalExpertAffiliationSerializer(serializers.Serializer):
         fields = ('affiliation_type', 'total')
 
 
+class MedicalExpertProfileSummarySerializer(serializers.Serializer):
+    affiliations = MedicalExpertAffiliationSerializer(many=True)
+    connections = MedicalExpertConnectionSerializer(many=True)
+
+    class Meta:
+        fields = ('affiliations', 'connections')
+
+
 class AffiliationSerializer(serializers.Serializer):
     position__name = serializers.CharField()
     institution__hospital_university = serializers.CharField()
@@ -239,6 +257,9 @@ class FavoriteMedicalExpertSerializer(serializers.ModelSerializer):
         '_is_unlocked_investigator')
 
     def _is_unlocked_investigator(self, obj):
+        unlocked_investigators = self.context.get('unlocked_investigators')
+        if unlocked_investigators is not None:
+            return obj.pk in unlocked_investigators
         user = self.context['request'].user
         return obj.is_unlocked_investigator(user)
 
@@ -279,10 +300,16 @@ class SpeakerSerializer(serializers.ModelSerializer):
         '_is_favorite_investigator')
 
     def _is_unlocked_investigator(self, obj):
+        unlocked_investigators = self.context.get('unlocked_investigators')
+        if unlocked_investigators is not None:
+            return obj.pk in unlocked_investigators
         user = self.context['request'].user
         return obj.is_unlocked_investigator(user)
 
     def _is_favorite_investigator(self, obj):
+        favorite_investigators = self.context.get('favorite_investigators')
+        if favorite_investigators is not None:
+            return obj.pk in favorite_investigators
         user = self.context['request'].user
         return obj.is_favorite_investigator(user)
 
@@ -304,3 +331,179 @@ class SpeakerSerializerSuperUser(SpeakerSerializer):
     superuser
     """
     is_unlocked_investigator = ConstantField(value=True)
+
+
+class ValuesSerializer(object):
+    """
+    Read-only serializer returning the data of the ModelSerializer
+    SERIALIZER_CLASS from .values() rows, without its per field dispatch.
+    Each of FIELDS is read from the row with the values() lookup of SOURCES
+    (the field name by default), from the ", " joined names of the many to
+    many field of MANY_TO_MANY_FIELDS, read with one query per page, from
+    the row values set by add_values, or from CONSTANTS
+    """
+    serializer_class = None
+    fields = ()
+    sources = {}
+    many_to_many_fields = {}
+    computed_fields = ()
+    constants = {}
+
+    def __init__(self, instance=None, many=True, context=None):
+        self.instance = instance
+        self.context = context or {}
+
+    @classmethod
+    def get_values_fields(cls):
+        """
+        Return the values() lookups of the rows
+        """
+        values_fields = ['pk']
+        for name in cls.fields:
+            if name not in cls.many_to_many_fields and \
+               name not in cls.computed_fields and name not in cls.constants:
+                values_fields.append(cls.sources.get(name, name))
+        return values_fields
+
+    @classmethod
+    def get_related_models(cls):
+        """
+        Return the models of the related lookups of SOURCES and of the many
+        to many fields, with their through models, in the order of FIELDS
+        """
+        model = cls.serializer_class.Meta.model
+        related_models = []
+        for name in cls.fields:
+            if name in cls.many_to_many_fields:
+                field = model._meta.get_field(cls.many_to_many_fields[name])
+                related_models += [field.related_model,
+                                   field.remote_field.through]
+            elif '__' in cls.sources.get(name, ''):
+                related_model = model
+                for field_name in cls.sources[name].split('__')[:-1]:
+                    related_model = related_model._meta. \
+                        get_field(field_name).related_model
+                related_models.append(related_model)
+        return related_models
+
+    @classmethod
+    def get_values_queryset(cls, queryset, extra_fields=()):
+        """
+        Return the values() rows of QUERYSET, with the lookups of
+        EXTRA_FIELDS too
+        """
+        values_fields = cls.get_values_fields()
+        values_fields += [field for field in extra_fields
+                          if field not in values_fields]
+        return queryset.prefetch_related(None).values(*values_fields)
+
+    def add_values(self, rows):
+        """
+        Set the values of the many to many, computed and constant fields on
+        ROWS
+        """
+        pks = [row['pk'] for row in rows]
+        model = self.serializer_class.Meta.model
+        for name, field_name in self.many_to_many_fields.items():
+            field = model._meta.get_field(field_name)
+            names = defaultdict(list)
+            if pks:
+                # ordered like the prefetched objects, by their Meta ordering
+                query_name = field.related_query_name()
+                for pk, related_name in field.related_model.objects. \
+                        filter(**{'%s__in' % query_name: pks}). \
+                        values_list(query_name, 'name'):
+                    names[pk].append(related_name)
+            for row in rows:
+                row[name] = ', '.join(names[row['pk']])
+        for name, value in self.constants.items():
+            for row in rows:
+                row[name] = value
+
+    def to_representation(self, rows):
+        rows = list(rows)
+        self.add_values(rows)
+        keys = [name if name in self.many_to_many_fields or
+                name in self.computed_fields or name in self.constants
+                else self.sources.get(name, name) for name in self.fields]
+        names = self.fields
+        return [OrderedDict(zip(names, [row[key] for key in keys]))
+                for row in rows]
+
+    @property
+    def data(self):
+        return self.to_representation(self.instance)
+
+
+class InvestigatorValuesSerializer(ValuesSerializer):
+    serializer_class = InvestigatorSerializer
+    fields = InvestigatorSerializer.Meta.fields
+    sources = {'country': 'country__name'}
+    many_to_many_fields = {'prop_therapeutic_areas': 'therapeutic_areas',
+                           'prop_specialties': 'specialties'}
+    computed_fields = ('is_unlocked_investigator', 'is_favorite_investigator')
+
+    def add_values(self, rows):
+        unlocked_investigators = self.context.get('unlocked_investigators')
+        favorite_investigators = self.context.get('favorite_investigators')
+        if unlocked_investigators is None or favorite_investigators is None:
+            flags = medical_expert_investigator_flags(
+                self.context['request'].user, rows)
+            unlocked_investigators = flags['unlocked_investigators']
+            favorite_investigators = flags['favorite_investigators']
+        for row in rows:
+            row['is_unlocked_investigator'] = \
+                row['pk'] in unlocked_investigators
+            row['is_favorite_investigator'] = \
+                row['pk'] in favorite_investigators
+        super(InvestigatorValuesSerializer, self).add_values(rows)
+
+
+class InvestigatorValuesSerializerSuperUser(InvestigatorValuesSerializer):
+    serializer_class = InvestigatorSerializerSuperUser
+    constants = {'is_unlocked_investigator': True}
+
+
+class SpeakerValuesSerializer(InvestigatorValuesSerializer):
+    serializer_class = SpeakerSerializer
+    # SpeakerSerializer lists 'is_unlocked_investigator' twice
+    fields = tuple(OrderedDict.fromkeys(SpeakerSerializer.Meta.fields))
+
+
+class SpeakerValuesSerializerSuperUser(SpeakerValuesSerializer):
+    serializer_class = SpeakerSerializerSuperUser
+    constants = {'is_unlocked_investigator': True}
+
+
+class FavoriteMedicalExpertValuesSerializer(InvestigatorValuesSerializer):
+    serializer_class = FavoriteMedicalExpertSerializer
+    fields = FavoriteMedicalExpertSerializer.Meta.fields
+
+
+class FavoriteMedicalExpertValuesSerializerSuperUser(
+      FavoriteMedicalExpertValuesSerializer):
+    serializer_class = FavoriteMedicalExpertSerializerSuperUser
+    constants = {'is_unlocked_investigator': True}
+
+
+class ClinicalTrialValuesSerializer(ValuesSerializer):
+    serializer_class = ClinicalTrialSerializer
+    fields = ClinicalTrialSerializer.Meta.fields
+    sources = {'recruitment_status': 'recruitment_status__name',
+               'study_type': 'study_type__name',
+               'enrollment': 'enrollment__name'}
+    many_to_many_fields = {'prop_conditions': 'condition',
+                           'prop_study_phases': 'study_phases'}
+
+
+class EventValuesSerializer(ValuesSerializer):
+    serializer_class = EventSerializer
+    fields = EventSerializer.Meta.fields
+    sources = {'event_subtype': 'event_subtype__name',
+               'country': 'country__name'}
+
+
+class PublicationValuesSerializer(ValuesSerializer):
+    serializer_class = PublicationSerializer
+    fields = PublicationSerializer.Meta.fields
+    sources = {'publication_subtype': 'publication_subtype__name'}
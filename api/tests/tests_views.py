@@ -1,14 +1,29 @@
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
 from collections import OrderedDict
 from datetime import datetime
+from StringIO import StringIO
+from unittest import skipUnless
 
+from django.apps import apps
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.core.files import File
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, router, transaction
 from django.db.models import Count, Sum
 from django.http import HttpRequest
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.urls import reverse
 
 from rest_framework import status
+from rest_framework.renderers import JSONRenderer
 
 from app.models import ActiveIngredient, ClinicalTrial, Event, \
                        Institution, Intervention, MedicalExpert, Publication
@@ -20,44 +35,67 @@ from app.models_relations import ClinicalTrialActiveIngredient, \
                                  MedicalExpertInstitution, \
                                  MedicalExpertInstitutionCOI, \
                                  MedicalExpertPublication
+from app.seed import BenchmarkDataSeeder
+from app_helpers.db_connections import check_connections, get_stats
+from app_helpers.instrumentation import RequestStats, get_fingerprint, \
+                                        serializer_timing
+from app_helpers.routers import LAGS_KEY, is_pinned, replica_reads, \
+                                select_replica
 from app_helpers.models import ClinicalTrialCondition, \
+                               ClinicalTrialEnrollment, \
                                ClinicalTrialInstitutionRelationshipType, \
-                               ClinicalTrialStudyPhase, Country, \
+                               ClinicalTrialRecruitmentStatus, \
+                               ClinicalTrialStudyPhase, \
+                               ClinicalTrialStudyType, Country, \
                                EventSubtype, InstitutionSubtype, \
                                MedicalExpertise, MedicalExpertEventPosition, \
                                MedicalExpertInstitutionNatureOfPayment, \
                                MedicalExpertInstitutionPosition, \
                                PersonGender, PublicationSubtype, Profession, \
                                TherapeuticArea
+from api import urls as api_urls
 from client.models import AuthorsRequest, CompanyCooperationRequest, \
                           FavoritesBaseDataRequest, \
                           FavoritesFullProfileRequest, FavoriteInvestigator, \
-                          MarketAccessRequest, OtherRequest, Request
+                          MarketAccessRequest, OtherRequest, Request, \
+                          UnlockedInvestigator
 
 
-from ..helpers import medical_expert_affiliations, medical_expert_connections
+from ..helpers import medical_expert_affiliations, \
+                      medical_expert_connections, \
+                      medical_expert_profile_summary
 from ..serializers import AffiliationSerializer, \
                           ClinicalTrialConditionTotalSerializer, \
                           ClinicalTrialSerializer, \
+                          ClinicalTrialValuesSerializer, \
                           CompanyCooperationsSerializer, \
                           CooperationInstitutionTotalAmountSerializer, \
                           CountryTotalSerializer, EventSerializer, \
                           EventSubTypeTotalSerializer, \
+                          EventValuesSerializer, \
                           FavoriteMedicalExpertSerializer, \
+                          FavoriteMedicalExpertValuesSerializer, \
+                          FavoriteMedicalExpertValuesSerializerSuperUser, \
                           InstitutionTotalSerializer, \
                           InterventionTotalSerializer, \
                           InvestigatorSerializer, \
+                          InvestigatorValuesSerializer, \
+                          InvestigatorValuesSerializerSuperUser, \
                           MedicalExpertAffiliationSerializer, \
                           MedicalExpertConnectionMedicalExpertSerializer, \
                           MedicalExpertConnectionSerializer, \
                           MedicalExpertEventPositionTotalSerializer, \
+                          MedicalExpertProfileSummarySerializer, \
                           NatureOfPaymentTotalAmountSerializer, \
                           ProfessionTotalSerializer, \
                           PublicationSerializer, \
                           PublicationSubTypeTotalSerializer, \
+                          PublicationValuesSerializer, \
                           PublicationYearTotalSerializer, RequestSerializer, \
-                          SpeakerSerializer, SpecialtyTotalSerializer, \
-                          StudyPhaseTotalSerializer
+                          SpeakerSerializer, SpeakerValuesSerializer, \
+                          SpeakerValuesSerializerSuperUser, \
+                          SpecialtyTotalSerializer, StudyPhaseTotalSerializer
+from ..views import InvestigatorCompanyCooperationsPerCompanyListView
 
 User = get_user_model()
 
@@ -129,6 +167,253 @@ class GetInvestigatorsTest(TestCase):
         self.assertEqual(response.data, serializer_data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_investigators_search(self):
+        for params, first_names in (
+                ({'q': 'eighth'}, ['Eighth_first']),
+                ({'q': 'th_LAST second'}, []),
+                ({'q': 'th_first'}, ['Fourth_first', 'Sixth_first',
+                                     'Eighth_first', 'Tenth_first',
+                                     'Twelfth_first']),
+                ({'last_name': 'th_l', 'first_name': 'ten'},
+                 ['Tenth_first'])):
+            response = client.get(reverse('get_investigators'),
+                                  dict(params, limit=10))
+            self.assertEqual(
+                [result['first_name'] for result in response.data['results']],
+                first_names)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class GetInvestigatorsListsQueriesTest(TestCase):
+    """ Test module for the queries of the investigators lists API """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user1234',
+                                             password='demo1234')
+        country = Country.objects.create(name='Austria')
+        specialty = MedicalExpertise.objects.create(name='specialty_1')
+        therapeutic_area = TherapeuticArea.objects.create(
+            name='Therapeutic Area 1')
+        for i in range(0, 12):
+            investigator = MedicalExpert.objects.create(
+                first_name='First_%s' % i, last_name='Last_%s' % i,
+                number_linked_clinical_trials=1, number_linked_events=1,
+                country=country)
+            investigator.specialties.add(specialty)
+            investigator.therapeutic_areas.add(therapeutic_area)
+            if i % 2:
+                UnlockedInvestigator.objects.create(user=self.user,
+                                                    investigator=investigator)
+            if i % 3:
+                FavoriteInvestigator.objects.create(user=self.user,
+                                                    investigator=investigator)
+        client.login(username='user1234', password='demo1234')
+
+    def get_flags_queries(self, url_name, limit):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse(url_name), {'limit': limit})
+        flags_queries = [
+            query for query in queries.captured_queries
+            if 'client_unlockedinvestigator' in query['sql'] or
+            'client_favoriteinvestigator' in query['sql']]
+        return response, flags_queries
+
+    def test_investigators_flags(self):
+        response, flags_queries = self.get_flags_queries(
+            'get_investigators', 12)
+        unlocked_investigators = set(
+            UnlockedInvestigator.objects.filter(user=self.user).
+            values_list('investigator__oid', flat=True))
+        favorite_investigators = set(
+            FavoriteInvestigator.objects.filter(user=self.user).
+            values_list('investigator__oid', flat=True))
+        for result in response.data['results']:
+            self.assertEqual(result['is_unlocked_investigator'],
+                             result['oid'] in unlocked_investigators)
+            self.assertEqual(result['is_favorite_investigator'],
+                             result['oid'] in favorite_investigators)
+        self.assertEqual(len(flags_queries), 2)
+
+    def test_investigators_lists_flags_queries(self):
+        for url_name in ('get_investigators', 'get_speakers',
+                         'get_favorite_investigators'):
+            response_small, flags_queries_small = self.get_flags_queries(
+                url_name, 2)
+            response_large, flags_queries_large = self.get_flags_queries(
+                url_name, 12)
+            self.assertEqual(len(response_small.data['results']), 2)
+            self.assertGreater(len(response_large.data['results']), 2)
+            self.assertEqual(len(flags_queries_small),
+                             len(flags_queries_large))
+
+    def test_investigators_lists_queries(self):
+        for url_name in ('get_investigators', 'get_speakers',
+                         'get_favorite_investigators'):
+            # the queries log is reset by each request, count them right away
+            with CaptureQueriesContext(connection) as queries:
+                response_small = client.get(reverse(url_name), {'limit': 2})
+            queries_small = len(queries)
+            with CaptureQueriesContext(connection) as queries:
+                response_large = client.get(reverse(url_name), {'limit': 12})
+            queries_large = len(queries)
+            self.assertGreater(len(response_large.data['results']),
+                               len(response_small.data['results']))
+            for result in response_large.data['results']:
+                self.assertEqual(result['country'], 'Austria')
+                self.assertEqual(result['prop_specialties'], 'specialty_1')
+                self.assertEqual(result['prop_therapeutic_areas'],
+                                 'Therapeutic Area 1')
+            self.assertGreater(queries_small, 0)
+            self.assertEqual(queries_small, queries_large)
+
+
+class GetInvestigatorsCursorPaginationTest(TestCase):
+    """ Test module for the cursor pagination of the investigators lists """
+
+    def setUp(self):
+        User.objects.create_user(username='user1234', password='demo1234')
+        countries = [Country.objects.create(name='Austria'),
+                     Country.objects.create(name='Germany'), None]
+        cities = ['Vienna', 'Graz', None, 'Vienna']
+        for i in range(0, 11):
+            MedicalExpert.objects.create(
+                first_name='First_%s' % i, last_name='Last_%s' % i,
+                city=cities[i % 4], country=countries[i % 3],
+                number_linked_clinical_trials=i % 5 + 1)
+        client.login(username='user1234', password='demo1234')
+
+    def get_pages(self, params):
+        oids = []
+        queries = []
+        url = reverse('get_investigators')
+        params = dict(params, pagination='cursor', limit=3)
+        while url:
+            with CaptureQueriesContext(connection) as captured_queries:
+                response = client.get(url, params)
+            queries.extend(query['sql'] for query in
+                           captured_queries.captured_queries)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(list(response.data), ['next', 'results'])
+            self.assertLessEqual(len(response.data['results']), 3)
+            oids.extend(result['oid'] for result in response.data['results'])
+            url = response.data['next']
+            params = {}
+        return oids, queries
+
+    def test_get_investigators_cursor_pagination(self):
+        for ordering, order_by in (
+                (None, ('pk',)),
+                ('city', ('city', 'pk')),
+                ('-city', ('-city', 'pk')),
+                ('country,-number_linked_clinical_trials',
+                 ('country__name', '-number_linked_clinical_trials', 'pk'))):
+            params = {'ordering': ordering} if ordering else {}
+            oids, queries = self.get_pages(params)
+            expected_oids = list(MedicalExpert.objects.
+                                 order_by(*order_by).
+                                 values_list('oid', flat=True))
+            self.assertEqual(oids, expected_oids)
+            self.assertFalse([query for query in queries
+                              if 'COUNT(' in query])
+
+    def test_get_investigators_invalid_cursor(self):
+        response = client.get(reverse('get_investigators'),
+                              {'pagination': 'cursor', 'cursor': 'invalid'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class GetInvestigatorsConditionalTest(TestCase):
+    """ Test module for the conditional GET of the investigators lists """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user1234',
+                                             password='demo1234')
+        self.investigators = [
+            MedicalExpert.objects.create(
+                first_name='First_%s' % i, last_name='Last_%s' % i,
+                number_linked_clinical_trials=1)
+            for i in range(0, 4)]
+        client.login(username='user1234', password='demo1234')
+
+    def assertNotModified(self, params, etag, not_modified=True):
+        response = client.get(reverse('get_investigators'), params,
+                              HTTP_IF_NONE_MATCH=etag)
+        if not_modified:
+            self.assertEqual(response.status_code,
+                             status.HTTP_304_NOT_MODIFIED)
+            self.assertFalse(response.content)
+        else:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_get_investigators_not_modified(self):
+        for params in ({}, {'pagination': 'cursor', 'limit': 2}):
+            response = client.get(reverse('get_investigators'), params)
+            etag = response['ETag']
+            with CaptureQueriesContext(connection) as queries:
+                self.assertNotModified(params, etag)
+            # the validator only, neither the page nor the flags
+            self.assertFalse([
+                query for query in queries.captured_queries
+                if 'client_' in query['sql'] or
+                'app_medicalexpert_specialties' in query['sql']])
+
+            # the investigators changes
+            self.investigators[0].first_name = 'Changed_%s' % len(params)
+            self.investigators[0].save()
+            response = self.assertNotModified(params, etag, False)
+            etag = response['ETag']
+            MedicalExpert.objects.filter(pk=self.investigators[0].pk). \
+                update(number_linked_clinical_trials=5)
+            response = self.assertNotModified(params, etag, False)
+            etag = response['ETag']
+
+            # the flags of the user
+            favorite = FavoriteInvestigator.objects.create(
+                user=self.user, investigator=self.investigators[0])
+            response = self.assertNotModified(params, etag, False)
+            etag = response['ETag']
+            favorite.delete()
+            response = self.assertNotModified(params, etag, False)
+            self.assertNotModified(params, response['ETag'])
+
+    def test_get_investigators_not_modified_related(self):
+        country = Country.objects.create(name='Austria')
+        specialty = MedicalExpertise.objects.create(name='Specialty')
+        self.investigators[0].country = country
+        self.investigators[0].save()
+        for params in ({}, {'pagination': 'cursor', 'limit': 2}):
+            etag = client.get(reverse('get_investigators'), params)['ETag']
+
+            # the links and the names do not change last_changed_on
+            self.investigators[0].specialties.add(specialty)
+            response = self.assertNotModified(params, etag, False)
+            self.assertEqual(response.data['results'][0]['prop_specialties'],
+                             'Specialty')
+            etag = response['ETag']
+            country.name = 'Changed_%s' % len(params)
+            country.save()
+            response = self.assertNotModified(params, etag, False)
+            self.assertEqual(response.data['results'][0]['country'],
+                             country.name)
+            etag = response['ETag']
+            specialty.app_medicalexpert_related.clear()
+            response = self.assertNotModified(params, etag, False)
+            self.assertEqual(response.data['results'][0]['prop_specialties'],
+                             '')
+            self.assertNotModified(params, response['ETag'])
+
+    def test_get_investigators_count(self):
+        # the rows counted for the ETag are reused by the pagination
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('get_investigators'))
+        self.assertEqual(response.data['count'], len(self.investigators))
+        self.assertEqual(len([
+            query for query in queries.captured_queries
+            if 'COUNT(' in query['sql'] and
+            'app_medicalexpert' in query['sql']]), 1)
+
 
 class GetInvestigatorsStatisticsTest(TestCase):
     """ Test module for GET investigators statistics API """
@@ -283,6 +568,7 @@ class GetSingleInvestigatorStatisticsTest(TestCase):
     current_year_minus_6 = current_year - 6
 
     def setUp(self):
+        cache.clear()
         User.objects.create_user(username='user1234', password='demo1234')
 
         self.investigator_1 = MedicalExpert.objects.create(
@@ -693,6 +979,94 @@ class GetSingleInvestigatorStatisticsTest(TestCase):
         self.assertEqual(response.data, serializer_data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_investigator_profile_summary(self):
+        # get API response
+        response = client.get(reverse(
+            'get_investigator_profile_summary',
+            kwargs={'pk': self.investigator_1.pk}))
+        with CaptureQueriesContext(connection) as queries:
+            medical_expert_profile_summary(self.investigator_1.pk)
+        # get data from db
+        serializer = MedicalExpertProfileSummarySerializer({
+            'affiliations': [
+                {'affiliation_type': 'universities', 'total': 3},
+                {'affiliation_type': 'hospitals', 'total': 1},
+                {'affiliation_type': 'associations', 'total': 4},
+            ],
+            'connections': [
+                {'connection_type': 'authors', 'label': 'Authors',
+                 'total': 1},
+                {'connection_type': 'event_participants',
+                 'label': 'Event Participants', 'total': 1},
+                {'connection_type': 'physicians', 'label': 'Physicians',
+                 'total': 1},
+                {'connection_type': 'researchers',
+                 'label': 'Researchers & Co', 'total': 1},
+                {'connection_type': 'clinical_trial_collaborators',
+                 'label': 'Investigators', 'total': 1},
+            ],
+        })
+
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_investigator_profile(self):
+        sections = ['connections', 'affiliations-universities',
+                    'clinical-trials-per-condition',
+                    'clinical-trials-per-sponsor',
+                    'clinical-trials-per-study-phase',
+                    'clinical-trials-per-intervention',
+                    'events-per-type', 'publications-per-year']
+        # get API response
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse(
+                'get_investigator_profile',
+                kwargs={'pk': self.investigator_1.pk}),
+                {'sections': ','.join(sections)})
+        clinical_trials_queries = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT DISTINCT') and
+            'app_medicalexpertclinicaltrial' in query['sql']]
+
+        self.assertEqual(list(response.data), sections)
+        self.assertEqual(len(clinical_trials_queries), 1)
+        for section in sections:
+            section_response = client.get(
+                '/api/investigator/%s/%s/' % (self.investigator_1.pk,
+                                              section))
+            self.assertEqual(response.data[section], section_response.data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_get_investigator_profile_section_params(self):
+        url = reverse('get_investigator_clinical_trials_per_condition',
+                      kwargs={'pk': self.investigator_1.pk})
+        section_response = client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse(
+                'get_investigator_profile',
+                kwargs={'pk': self.investigator_1.pk}),
+                {'sections': 'clinical-trials-per-condition,'
+                             'affiliations-universities',
+                 'page_size': 1, 'limit': 1, 'ordering': '-year',
+                 'institution__city': 'No city'})
+        # the cached response of the route is reused
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'app_helpers_clinicaltrialcondition' in query['sql']])
+        self.assertEqual(response.data['clinical-trials-per-condition'],
+                         section_response.data)
+        # the filters are forwarded to their section
+        self.assertEqual(response.data['affiliations-universities']['count'],
+                         0)
+
+    def test_get_investigator_profile_unknown_section(self):
+        response = client.get(reverse(
+            'get_investigator_profile',
+            kwargs={'pk': self.investigator_1.pk}),
+            {'sections': 'connections,unknown'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
     def test_get_investigator_affiliations_universities(self):
         # get API response
         response = client.get(reverse(
@@ -1055,6 +1429,100 @@ class GetSingleInvestigatorStatisticsTest(TestCase):
         self.assertEqual(response.data, serializer_data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_get_investigator_events_per_type_cached(self):
+        url = reverse('get_investigator_events_per_type',
+                      kwargs={'pk': self.investigator_1.pk})
+        response = client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            cached_response = client.get(url)
+        # the session and the user only
+        self.assertFalse([query for query in queries.captured_queries
+                          if 'app_' in query['sql']])
+        self.assertEqual(cached_response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_response.data, response.data)
+        response = client.get(
+            url, HTTP_IF_NONE_MATCH=cached_response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # a new event of the investigator bumps its generation
+        event_subtype = EventSubtype.objects.create(name='Subtype 3')
+        event = Event.objects.create(name='Event 4',
+                                     event_subtype=event_subtype)
+        medical_expert_event = MedicalExpertEvent.objects.create(
+            medical_expert=self.investigator_1, event=event)
+        response = client.get(
+            url, HTTP_IF_NONE_MATCH=cached_response['ETag'])
+        self.assertEqual(response.data['count'], 3)
+
+        MedicalExpertEvent.objects.filter(
+            pk=medical_expert_event.pk).delete()
+        response = client.get(url)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_get_investigator_clinical_trials_per_intervention_cached(self):
+        url = reverse('get_investigator_clinical_trials_per_intervention',
+                      kwargs={'pk': self.investigator_1.pk})
+        response = client.get(url)
+        self.assertEqual(response.data['count'], 2)
+
+        # the interventions of the clinical trials of the investigator
+        clinical_trial = MedicalExpertClinicalTrial.objects. \
+            filter(medical_expert=self.investigator_1).first().clinical_trial
+        intervention = Intervention.objects.create(name='Intervention 3')
+        ClinicalTrialIntervention.objects.create(
+            clinical_trial=clinical_trial, intervention=intervention)
+        response = client.get(url)
+        self.assertEqual(response.data['count'], 3)
+
+    def test_get_investigator_aggregates_cached_related_rows(self):
+        def get_results(name):
+            return client.get(reverse(name, kwargs={
+                'pk': self.investigator_1.pk})).data['results']
+
+        # the links and the fields of the related rows bump the generation
+        conditions = get_results(
+            'get_investigator_clinical_trials_per_condition')
+        study_phases = get_results(
+            'get_investigator_clinical_trials_per_study_phase')
+        clinical_trial = MedicalExpertClinicalTrial.objects. \
+            filter(medical_expert=self.investigator_1).first().clinical_trial
+        clinical_trial.condition.add(
+            ClinicalTrialCondition.objects.create(name='Condition 3'))
+        self.assertEqual(len(get_results(
+            'get_investigator_clinical_trials_per_condition')),
+            len(conditions) + 1)
+        for study_phase in clinical_trial.study_phases.all():
+            study_phase.clinicaltrial_set.clear()
+        self.assertNotEqual(get_results(
+            'get_investigator_clinical_trials_per_study_phase'),
+            study_phases)
+
+        get_results('get_investigator_events_per_type')
+        event = Event.objects.filter(
+            medicalexpertevent__medical_expert=self.investigator_1).first()
+        event.event_subtype = EventSubtype.objects.create(name='Subtype 3')
+        event.save()
+        self.assertIn('Subtype 3', [row['name'] for row in get_results(
+            'get_investigator_events_per_type')])
+
+        get_results('get_investigator_publications_per_year')
+        publication = Publication.objects.filter(
+            medicalexpertpublication__medical_expert=self.investigator_1). \
+            first()
+        publication.publication_year = self.current_year_minus_6
+        publication.save()
+        self.assertIn(str(self.current_year_minus_6), [
+            row['publication_year'] for row in get_results(
+                'get_investigator_publications_per_year')])
+
+    def test_get_investigator_cooperations_per_company_cache_key(self):
+        view = InvestigatorCompanyCooperationsPerCompanyListView(
+            kwargs={'pk': self.investigator_1.pk})
+        request = HttpRequest()
+        request.query_params = request.GET
+        self.assertTrue(view.get_cache_key(request).endswith(
+            ':%s' % self.current_year))
+
     def test_get_investigator_events(self):
         # get API response
         response = client.get(reverse(
@@ -1301,6 +1769,52 @@ class GetRequestsTest(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class GetRequestsDetailsTest(TestCase):
+    """ Test module for the details of the GET requests API """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user1234',
+                                             password='demo1234')
+        self.country = Country.objects.create(name='Austria')
+        self.publication_subtype = PublicationSubtype.objects.create(
+            name='Publication Type 1')
+        client.login(username='user1234', password='demo1234')
+
+    def add_requests(self):
+        request = AuthorsRequest.objects.create(
+            user=self.user, year_from=2015, year_to=2016,
+            topic_interest='Topic', favorites=True)
+        request.types_publication_interest.add(self.publication_subtype)
+        request.countries_interest.add(self.country)
+        request = MarketAccessRequest.objects.create(
+            user=self.user, topic_interest='Topic', favorites=False)
+        request.countries_interest.add(self.country)
+        CompanyCooperationRequest.objects.create(user=self.user,
+                                                 favorites=True)
+        OtherRequest.objects.create(user=self.user, favorites=False)
+
+    def get_requests(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('get_requests'), {'limit': 100})
+        return response, len(queries)
+
+    def test_get_requests_details(self):
+        self.add_requests()
+        response, queries = self.get_requests()
+        self.assertEqual(
+            [result['details'] for result in response.data['results']],
+            [request.details for request in
+             Request.objects.filter(user=self.user).order_by('pk')])
+        self.assertIn('Publication Type 1',
+                      response.data['results'][0]['details'][0]
+                      ['details_text'])
+
+        self.add_requests()
+        response, more_queries = self.get_requests()
+        self.assertEqual(len(response.data['results']), 8)
+        self.assertEqual(queries, more_queries)
+
+
 class GetSpeakersTest(TestCase):
     """ Test module for GET speakers API """
 
@@ -1501,3 +2015,546 @@ class GetSpeakersStatisticsTest(TestCase):
 
         self.assertEqual(response.data, serializer_data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+@override_settings(INSTRUMENTATION_CACHE='default',
+                   INSTRUMENTATION_FLUSH_INTERVAL=0)
+class QueryInstrumentationTest(TestCase):
+    """ Test module for the queries instrumentation of the API """
+
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user(username='user1234', password='demo1234')
+        for i in range(0, 3):
+            MedicalExpert.objects.create(
+                first_name='First_%s' % i, last_name='Last_%s' % i,
+                number_linked_clinical_trials=1)
+        client.login(username='user1234', password='demo1234')
+
+    def test_query_headers(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(reverse('get_investigators'))
+        self.assertEqual(response['X-Query-Count'], str(len(queries)))
+        self.assertEqual(response['X-Duplicate-Query-Count'], '0')
+        self.assertTrue(response['Server-Timing'].startswith(
+            'db;dur='))
+
+    def test_serializer_timing(self):
+        for url_name in ('get_investigators', 'get_investigators_per_country'):
+            response = client.get(reverse(url_name))
+            self.assertIn('serializer;dur=', response['Server-Timing'])
+
+        # the queries run by the serializer are not counted twice
+        start = time.time()
+        with RequestStats() as stats:
+            with serializer_timing():
+                list(MedicalExpert.objects.all())
+                time.sleep(0.01)
+        total_time = time.time() - start
+        self.assertEqual(stats.queries, 1)
+        self.assertGreaterEqual(stats.serializer_time, 0.009)
+        self.assertLessEqual(stats.serializer_time,
+                             total_time - stats.db_time)
+
+    def test_get_fingerprint(self):
+        self.assertEqual(
+            get_fingerprint("SELECT * FROM t WHERE id IN (%s, %s, %s) "
+                            "AND name = 'x' LIMIT 21"),
+            get_fingerprint("SELECT * FROM t WHERE id IN (%s) "
+                            "AND name = 'y' LIMIT 5"))
+
+    def test_report_slow_endpoints(self):
+        for url_name in ('get_investigators', 'get_speakers'):
+            client.get(reverse(url_name))
+        out = StringIO()
+        call_command('report_slow_endpoints', sort='queries', stdout=out)
+        lines = [line for line in out.getvalue().splitlines()
+                 if not line.startswith(' ')]
+        # the client may have served other views before
+        self.assertTrue(set(['get_investigators', 'get_speakers']).issubset(
+            line.split(':')[0] for line in lines))
+        self.assertIn('serializer', lines[0])
+
+
+class QueryPlanTestMixin(object):
+    """
+    Run every registered endpoint and collect the whole app tables scanned by
+    the plans of its queries, given by get_full_scans. The tables read by
+    an alias of the query, e.g. in a subquery, are checked too. The rows of
+    the endpoints are added to a seeded dataset, large enough for a scan to
+    cost more than an index to the optimizer
+    """
+
+    def setUp(self):
+        User.objects.create_user(username='user1234', password='demo1234')
+        country = Country.objects.create(name='Austria')
+        company = InstitutionSubtype.objects.create(name='Company')
+        hospital = InstitutionSubtype.objects.create(name='Hospital')
+        sponsor = ClinicalTrialInstitutionRelationshipType.objects.create(
+            name='Sponsor')
+        institution_position = MedicalExpertInstitutionPosition.objects. \
+            create(name='Role Physician')
+        event_position = MedicalExpertEventPosition.objects.create(
+            name='Position 1')
+        nature_of_payment = MedicalExpertInstitutionNatureOfPayment. \
+            objects.create(name='Nature of Payment 1')
+        condition = ClinicalTrialCondition.objects.create(name='Condition 1')
+        study_phase = ClinicalTrialStudyPhase.objects.create(name='Phase 1')
+        event_subtype = EventSubtype.objects.create(name='Subtype 1')
+        publication_subtype = PublicationSubtype.objects.create(
+            name='Publication Type 1')
+
+        self.investigators = []
+        for i in range(0, 10):
+            investigator = MedicalExpert.objects.create(
+                first_name='First_%s' % i, last_name='Last_%s' % i,
+                country=country)
+            institution = Institution.objects.create(
+                hospital_university='Institution %s' % i,
+                institution_subtype=company if i % 2 else hospital)
+            clinical_trial = ClinicalTrial.objects.create(
+                brief_public_title='Clinical Trial %s' % i)
+            clinical_trial.condition.add(condition)
+            clinical_trial.study_phases.add(study_phase)
+            intervention = Intervention.objects.create(
+                name='Intervention %s' % i)
+            event = Event.objects.create(name='Event %s' % i,
+                                         event_subtype=event_subtype)
+            publication = Publication.objects.create(
+                name='Publication %s' % i,
+                publication_subtype=publication_subtype,
+                publication_year=2015 + i % 3)
+            for connected in [investigator] + self.investigators[-2:]:
+                MedicalExpertInstitution.objects.create(
+                    medical_expert=connected, institution=institution,
+                    primary_affiliation=True, position=institution_position)
+                MedicalExpertInstitutionCOI.objects.create(
+                    medical_expert=connected, institution=institution,
+                    nature_of_payment=nature_of_payment,
+                    year=str(datetime.now().year), amount=100)
+                MedicalExpertClinicalTrial.objects.create(
+                    medical_expert=connected, clinical_trial=clinical_trial)
+                MedicalExpertEvent.objects.create(
+                    medical_expert=connected, event=event,
+                    position=event_position)
+                MedicalExpertPublication.objects.create(
+                    medical_expert=connected, publication=publication)
+            ClinicalTrialInstitution.objects.create(
+                clinical_trial=clinical_trial, institution=institution,
+                relationship_type=sponsor)
+            ClinicalTrialIntervention.objects.create(
+                clinical_trial=clinical_trial, intervention=intervention)
+            self.investigators.append(investigator)
+        FavoriteInvestigator.objects.create(
+            user=User.objects.get(), investigator=self.investigators[0])
+        BenchmarkDataSeeder({
+            'medical_experts': 1000, 'institutions': 200,
+            'clinical_trials': 500, 'interventions': 200,
+            'publications': 1000, 'events': 300}, batch_size=500).seed()
+        client.login(username='user1234', password='demo1234')
+
+    def get_tables(self, sql):
+        """
+        Return the {alias: table} of the tables of SQL
+        """
+        tables = dict((table, table)
+                      for table in re.findall(r'"(app_\w+)"', sql))
+        tables.update((alias, table) for table, alias in
+                      re.findall(r'"(app_\w+)" ([A-Z]\d+)\b', sql))
+        return tables
+
+    def test_endpoints_query_plans(self):
+        investigator = self.investigators[5]
+        full_scans = []
+        for pattern in api_urls.urlpatterns:
+            kwargs = {}
+            if 'pk' in pattern.regex.groupindex:
+                kwargs['pk'] = investigator.pk
+            url = reverse(pattern.name, kwargs=kwargs)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK, url)
+            for query in queries.captured_queries:
+                if query['sql'].startswith('SELECT'):
+                    full_scans.extend(
+                        '%s: %s\n    %s' % (pattern.name, scan, query['sql'])
+                        for scan in self.get_full_scans(query['sql']))
+        self.assertFalse(full_scans, '\n'.join(full_scans))
+
+
+@skipUnless(connection.vendor == 'sqlite',
+            'The plans are checked with the rule based planner of SQLite')
+class QueryPlanTest(QueryPlanTestMixin, TestCase):
+    """
+    Test module for the query plans of the API on SQLite: no query of a
+    registered endpoint may scan a whole app table or index, but a page
+    read in primary key order, which stops at its LIMIT
+    """
+
+    def get_full_scans(self, sql):
+        """
+        Return the app tables scanned by the plan of SQL
+        """
+        tables = self.get_tables(sql)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN %s' % sql)
+            details = [row[-1] for row in cursor.fetchall()]
+        # a page read in primary key order stops at its LIMIT
+        paged = ' LIMIT ' in sql and \
+            'USE TEMP B-TREE FOR ORDER BY' not in details
+        scans = []
+        for detail in details:
+            words = detail.replace('SCAN TABLE ', 'SCAN ').split()
+            if words[0] != 'SCAN' or words[1] not in tables:
+                continue
+            if paged and 'ORDER BY "%s"."id"' % words[1] in sql:
+                continue
+            scans.append(detail)
+        return scans
+
+
+@skipUnless(connection.vendor == 'mysql',
+            'The plans are checked with the EXPLAIN output of MySQL')
+class QueryPlanMySQLTest(QueryPlanTestMixin, TestCase):
+    """
+    Test module for the query plans of the API on MySQL: no query of a
+    registered endpoint may read a whole app table (type ALL), nor scan a
+    whole index, but a page read in primary key order, which stops at its
+    LIMIT
+    """
+
+    def get_full_scans(self, sql):
+        """
+        Return the app tables or indexes scanned by the plan of SQL
+        """
+        tables = self.get_tables(sql.replace('`', '"'))
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN %s' % sql)
+            columns = [column[0] for column in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+        scans = []
+        for row in rows:
+            if row['type'] not in ('ALL', 'index') or \
+                    row['table'] not in tables:
+                continue
+            if row['type'] == 'index' and row['key'] == 'PRIMARY' and \
+                    ' LIMIT ' in sql:
+                continue
+            scans.append('%s %s (%s)' % (
+                row['type'], row['table'], row['Extra']))
+        return scans
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1', 'replica_2'],
+                   REPLICA_SELECTION='round_robin')
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    Test module for the routing of the API reads to the replicas, two
+    SQLite databases standing in for them
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super(ReplicaRoutingTest, cls).setUpClass()
+        cls.replicas_dir = tempfile.mkdtemp()
+        for alias in ('replica_1', 'replica_2'):
+            connections.databases[alias] = {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': os.path.join(cls.replicas_dir, alias)}
+            with connections[alias].schema_editor() as editor:
+                for app_label in settings.REPLICA_APP_LABELS:
+                    for model in apps.get_app_config(app_label).get_models():
+                        editor.create_model(model)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in ('replica_1', 'replica_2'):
+            connections[alias].close()
+            del connections[alias]
+            del connections.databases[alias]
+        shutil.rmtree(cls.replicas_dir)
+        super(ReplicaRoutingTest, cls).tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='user1234',
+                                             password='demo1234')
+        for alias in ('default', 'replica_1', 'replica_2'):
+            MedicalExpert.objects.using(alias).bulk_create([MedicalExpert(
+                first_name=alias, last_name='Last',
+                number_linked_clinical_trials=1)])
+        client.login(username='user1234', password='demo1234')
+
+    def tearDown(self):
+        for alias in ('replica_1', 'replica_2'):
+            MedicalExpert.objects.using(alias).all().delete()
+
+    def get_investigators_database(self):
+        response = client.get(reverse('get_investigators'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data['results'][0]['first_name']
+
+    def test_get_investigators_round_robin(self):
+        self.assertEqual(
+            set([self.get_investigators_database(),
+                 self.get_investigators_database()]),
+            set(['replica_1', 'replica_2']))
+
+    def test_get_investigators_pinned_after_favorite(self):
+        FavoriteInvestigator.objects.create(
+            user=self.user, investigator=MedicalExpert.objects.get())
+        self.assertEqual(self.get_investigators_database(), 'default')
+        cache.clear()
+        self.assertNotEqual(self.get_investigators_database(), 'default')
+
+    def test_pinned_after_request(self):
+        # the signals of the Request subclasses have their own sender
+        OtherRequest.objects.create(user=self.user, description='Other',
+                                    favorites=False)
+        self.assertTrue(is_pinned(self.user.pk))
+
+    def test_cached_aggregate_read_from_primary(self):
+        investigator = MedicalExpert.objects.get()
+        clinical_trial = ClinicalTrial.objects.create(
+            brief_public_title='Clinical Trial')
+        clinical_trial.study_phases.add(
+            ClinicalTrialStudyPhase.objects.create(name='Phase 1'))
+        MedicalExpertClinicalTrial.objects.create(
+            medical_expert=investigator, clinical_trial=clinical_trial)
+        # the replicas do not have the clinical trial yet
+        cache.clear()
+        response = client.get(reverse(
+            'get_investigator_clinical_trials_per_study_phase',
+            kwargs={'pk': investigator.pk}))
+        self.assertEqual(
+            [result['study_phases__name']
+             for result in response.data['results']], ['Phase 1'])
+
+    def test_writes_and_atomic_blocks(self):
+        with replica_reads():
+            self.assertIn(router.db_for_read(MedicalExpert),
+                          ('replica_1', 'replica_2'))
+            self.assertEqual(router.db_for_read(User), 'default')
+            with transaction.atomic():
+                self.assertEqual(router.db_for_read(MedicalExpert),
+                                 'default')
+            self.assertEqual(router.db_for_write(MedicalExpert), 'default')
+            # the reads after a write see it
+            self.assertEqual(router.db_for_read(MedicalExpert), 'default')
+        self.assertEqual(router.db_for_read(MedicalExpert), 'default')
+
+    @override_settings(REPLICA_SELECTION='least_lag', REPLICA_MAX_LAG=30)
+    def test_least_lag(self):
+        cache.set(LAGS_KEY, {'replica_1': 20, 'replica_2': 2})
+        self.assertEqual(select_replica(), 'replica_2')
+        self.assertEqual(select_replica(), 'replica_2')
+        cache.set(LAGS_KEY, {'replica_1': None, 'replica_2': 60})
+        self.assertEqual(select_replica(), 'default')
+
+
+@override_settings(DB_CONN_MAX_USES=2, INSTRUMENTATION_CACHE='default',
+                   INSTRUMENTATION_FLUSH_INTERVAL=0)
+class ConnectionHealthTest(TransactionTestCase):
+    """
+    Test module for the health checks and stats of the persistent database
+    connections, checked outside of a transaction
+    """
+
+    def setUp(self):
+        User.objects.create_user(username='user1234', password='demo1234')
+        client.login(username='user1234', password='demo1234')
+        connection.uses = 0
+        cache.clear()
+
+    def get_stats_delta(self, before):
+        after = get_stats().get(connection.alias, {})
+        return dict((field, after.get(field, 0) - before.get(field, 0))
+                    for field in ('connects', 'reuses', 'closed_max_uses'))
+
+    def test_max_uses(self):
+        before = get_stats().get(connection.alias, {})
+        for i in range(0, 3):
+            response = client.get(reverse('get_investigators'))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_stats_delta(before),
+                         {'connects': 0, 'reuses': 2, 'closed_max_uses': 1})
+
+    def test_connect_time(self):
+        check_connections()
+        before = get_stats().get(connection.alias, {})
+        connection.get_new_connection(
+            connection.get_connection_params()).close()
+        self.assertEqual(self.get_stats_delta(before)['connects'], 1)
+        self.assertEqual(connection.uses, 1)
+
+    def test_report_db_connections(self):
+        client.get(reverse('get_investigators'))
+        out = StringIO()
+        call_command('report_db_connections', stdout=out)
+        self.assertIn('%s: 1 processes' % connection.alias, out.getvalue())
+
+
+class BenchmarkApiTest(TestCase):
+    """ Test module for the benchmark of the API routes """
+
+    def setUp(self):
+        User.objects.create_superuser(username='admin1234',
+                                      email='admin@example.com',
+                                      password='demo1234')
+        call_command('seed_benchmark_data', medical_experts=10,
+                     institutions=5, clinical_trials=5, interventions=3,
+                     publications=10, events=5, batch_size=100,
+                     stdout=StringIO())
+
+    def test_benchmark_api(self):
+        routes = ['get_investigators', 'get_investigator_profile']
+        with tempfile.NamedTemporaryFile(suffix='.json') as f:
+            out = StringIO()
+            call_command('benchmark_api', route=routes, repeat=2,
+                         save=f.name, stdout=out)
+            lines = out.getvalue().splitlines()
+            self.assertEqual([line.split(':')[0] for line in lines], routes)
+            self.assertNotIn('errors', out.getvalue())
+            results = json.load(f)
+            self.assertEqual(results['get_investigators']['requests'], 2)
+            self.assertTrue(results['get_investigator_profile']['queries'])
+
+            # one more query is a regression
+            results['get_investigators']['queries'] -= 1
+            f.seek(0)
+            f.truncate()
+            json.dump(results, f)
+            f.flush()
+            out = StringIO()
+            with self.assertRaises(CommandError):
+                call_command('benchmark_api', route=routes, repeat=2,
+                             baseline=f.name, fail_on_regression=True,
+                             stdout=out)
+            self.assertIn('get_investigators: queries', out.getvalue())
+            self.assertIn('REGRESSION', out.getvalue())
+
+    def test_benchmark_serializers(self):
+        out = StringIO()
+        call_command('benchmark_serializers', rows=10, repeat=1,
+                     serializer=['investigators', 'clinical_trials'],
+                     stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split(':')[0] for line in lines],
+                         ['investigators', 'clinical_trials'])
+        self.assertIn('rows/s', out.getvalue())
+        self.assertNotIn('DIFFERENT', out.getvalue())
+
+
+class ValuesSerializerTest(TestCase):
+    """ Test module for the serializers of .values() rows """
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='user1234',
+                                             password='demo1234')
+        country = Country.objects.create(name=u'\xd6sterreich')
+        specialties = [MedicalExpertise.objects.create(name=name)
+                       for name in ('Surgery', 'Cardiology')]
+        therapeutic_areas = [TherapeuticArea.objects.create(name=name)
+                             for name in ('Oncology', 'Neurology')]
+        self.medical_expert = MedicalExpert.objects.create(
+            first_name=u'J\xfcrgen', last_name='Last_1',
+            city='Vienna', country=country,
+            number_linked_clinical_trials=1, number_linked_events=1)
+        self.medical_expert.specialties.add(*specialties)
+        self.medical_expert.therapeutic_areas.add(*therapeutic_areas)
+        MedicalExpert.objects.create(
+            first_name='First_2', middle_name='Middle_2',
+            last_name='Last_2', number_linked_clinical_trials=1,
+            number_linked_events=1)
+        UnlockedInvestigator.objects.create(user=self.user,
+                                            investigator=self.medical_expert)
+
+        clinical_trial = ClinicalTrial.objects.create(
+            brief_public_title='Clinical Trial 1', start_date_year=2015,
+            recruitment_status=ClinicalTrialRecruitmentStatus.objects.
+            create(name='Completed'),
+            study_type=ClinicalTrialStudyType.objects.create(
+                name='Interventional'),
+            enrollment=ClinicalTrialEnrollment.objects.create(name='100'),
+            intervention='Drug')
+        clinical_trial.condition.add(
+            ClinicalTrialCondition.objects.create(name='Condition 2'),
+            ClinicalTrialCondition.objects.create(name='Condition 1'))
+        clinical_trial.study_phases.add(
+            ClinicalTrialStudyPhase.objects.create(name='Phase 2'))
+        ClinicalTrial.objects.create(brief_public_title='Clinical Trial 2')
+        Event.objects.create(
+            name='Event 1', start_date_year=2016, city='Vienna',
+            country=country,
+            event_subtype=EventSubtype.objects.create(name='Congress'))
+        Event.objects.create(name='Event 2')
+        Publication.objects.create(
+            name='Publication 1', publication_year=2017,
+            publication_subtype=PublicationSubtype.objects.create(
+                name='Journal Article'))
+        Publication.objects.create(name='Publication 2')
+        for model, relation_model, field in (
+                (ClinicalTrial, MedicalExpertClinicalTrial, 'clinical_trial'),
+                (Event, MedicalExpertEvent, 'event'),
+                (Publication, MedicalExpertPublication, 'publication')):
+            for obj in model.objects.all():
+                relation_model.objects.create(
+                    **{'medical_expert': self.medical_expert, field: obj})
+        client.login(username='user1234', password='demo1234')
+
+    def test_values_serializers(self):
+        request = HttpRequest()
+        request.user = self.user
+        renderer = JSONRenderer()
+        for values_serializer_class in (
+                InvestigatorValuesSerializer,
+                InvestigatorValuesSerializerSuperUser,
+                SpeakerValuesSerializer, SpeakerValuesSerializerSuperUser,
+                FavoriteMedicalExpertValuesSerializer,
+                FavoriteMedicalExpertValuesSerializerSuperUser,
+                ClinicalTrialValuesSerializer, EventValuesSerializer,
+                PublicationValuesSerializer):
+            serializer_class = values_serializer_class.serializer_class
+            queryset = serializer_class.Meta.model.objects.order_by('pk')
+            context = {'request': request}
+            data = serializer_class(queryset, many=True,
+                                    context=context).data
+            values_data = values_serializer_class(
+                values_serializer_class.get_values_queryset(queryset),
+                many=True, context=context).data
+            self.assertEqual(values_data, data)
+            self.assertEqual(renderer.render(values_data),
+                             renderer.render(data))
+
+    def test_values_serializers_lists(self):
+        for url_name, serializer_class, queryset in (
+                ('get_investigator_clinical_trials', ClinicalTrialSerializer,
+                 ClinicalTrial.objects.order_by('pk')),
+                ('get_investigator_events', EventSerializer,
+                 Event.objects.order_by('pk')),
+                ('get_investigator_publications', PublicationSerializer,
+                 Publication.objects.order_by('pk'))):
+            url = reverse(url_name, kwargs={'pk': self.medical_expert.pk})
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, {'limit': 1})
+            queries_small = len(queries)
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(url, {'limit': 2})
+            self.assertEqual(len(queries), queries_small)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.content, JSONRenderer().render(
+                OrderedDict([
+                    ('count', 2), ('next', None), ('previous', None),
+                    ('results', serializer_class(queryset, many=True).data)
+                ])))
+
+        response = client.get(reverse('get_investigators'),
+                              {'pagination': 'cursor', 'limit': 1})
+        self.assertEqual(response.data['results'][0]['prop_specialties'],
+                         'Cardiology, Surgery')
+        self.assertTrue(response.data['results'][0]
+                        ['is_unlocked_investigator'])
+        response = client.get(response.data['next'])
+        self.assertEqual(response.data['results'][0]['middle_name'],
+                         'Middle_2')
+        self.assertIsNone(response.data['next'])
@@ -77,6 +77,16 @@ urlpatterns = [
         views.InvestigatorAffiliationsAssociationsListView.as_view(),
         name='get_investigator_affiliations_associations'
     ),
+    url(
+        r'^investigator/(?P<pk>[0-9]+)/profile/$',
+        views.InvestigatorProfileView.as_view(),
+        name='get_investigator_profile'
+    ),
+    url(
+        r'^investigator/(?P<pk>[0-9]+)/profile-summary/$',
+        views.InvestigatorProfileSummaryView.as_view(),
+        name='get_investigator_profile_summary'
+    ),
     url(
         r'^investigator/(?P<pk>[0-9]+)/cooperations-per-company/$',
         views.InvestigatorCompanyCooperationsPerCompanyListView.as_view(),
@@ -1,47 +1,81 @@
+import copy
+from collections import OrderedDict
 from datetime import datetime
 
 import django_filters
+from django_filters.constants import EMPTY_VALUES
+from django.conf import settings
+from django.core.cache import cache
 from django.db.models import Count, Sum
+from django.http import QueryDict
+from django.utils.http import quote_etag
 
 from rest_framework import generics
+from rest_framework.exceptions import ValidationError
 from rest_framework.filters import OrderingFilter
 from rest_framework.pagination import PageNumberPagination
-
-from .helpers import medical_expert_affiliations, medical_expert_connections
+from rest_framework.request import clone_request
+from rest_framework.response import Response
+
+from .conditional import ConditionalGetMixin, \
+                         LastChangedConditionalGetMixin, make_data_etag
+from .helpers import medical_expert_affiliations, \
+                     medical_expert_connections, \
+                     medical_expert_investigator_flags, \
+                     medical_expert_profile_summary
+from .pagination import KeysetPagination, KeysetPaginationMixin
 from .serializers import AffiliationSerializer, \
                          ClinicalTrialConditionTotalSerializer, \
                          ClinicalTrialSerializer, \
+                         ClinicalTrialValuesSerializer, \
                          CompanyCooperationsSerializer, \
                          CooperationInstitutionTotalAmountSerializer, \
                          CountryTotalSerializer, EventSerializer, \
                          EventSubTypeTotalSerializer, \
+                         EventValuesSerializer, \
                          FavoriteMedicalExpertSerializer, \
                          FavoriteMedicalExpertSerializerSuperUser, \
+                         FavoriteMedicalExpertValuesSerializer, \
+                         FavoriteMedicalExpertValuesSerializerSuperUser, \
                          InstitutionTotalSerializer, \
                          InterventionTotalSerializer, \
                          InvestigatorSerializer, \
                          InvestigatorSerializerSuperUser, \
+                         InvestigatorValuesSerializer, \
+                         InvestigatorValuesSerializerSuperUser, \
                          MedicalExpertAffiliationSerializer, \
                          MedicalExpertConnectionMedicalExpertSerializer, \
                          MedicalExpertConnectionSerializer, \
                          MedicalExpertEventPositionTotalSerializer, \
+                         MedicalExpertProfileSummarySerializer, \
                          NatureOfPaymentTotalAmountSerializer, \
                          ProfessionTotalSerializer, \
                          PublicationSerializer, \
                          PublicationSubTypeTotalSerializer, \
+                         PublicationValuesSerializer, \
                          PublicationYearTotalSerializer, RequestSerializer, \
                          SpeakerSerializer, SpeakerSerializerSuperUser, \
+                         SpeakerValuesSerializer, \
+                         SpeakerValuesSerializerSuperUser, \
                          SpecialtyTotalSerializer, StudyPhaseTotalSerializer
-from app.models import ClinicalTrial, Event, MedicalExpert, Publication
+from app.models import ClinicalTrial, Event, MedicalExpert, \
+                       MedicalExpertRollup, MedicalExpertSearchDocument, \
+                       Publication
 from app.models_relations import ClinicalTrialInstitution, \
                                  ClinicalTrialIntervention, \
-                                 MedicalExpertClinicalTrial, \
+                                 MedicalExpertConnectionAuthor, \
+                                 MedicalExpertConnectionCTCollaborator, \
+                                 MedicalExpertConnectionEventParticipant, \
+                                 MedicalExpertConnectionPhysician, \
+                                 MedicalExpertConnectionResearcher, \
                                  MedicalExpertEvent, \
                                  MedicalExpertInstitution, \
-                                 MedicalExpertInstitutionCOI, \
-                                 MedicalExpertPublication
+                                 MedicalExpertInstitutionCOI
+from app_helpers.cache import get_generation, make_cache_key
+from app_helpers.instrumentation import TimedSerializer
 from app_helpers.models import ClinicalTrialCondition, EventSubtype, \
                                PublicationSubtype
+from app_helpers.routers import replica_reads
 from client.models import Request
 
 
@@ -82,20 +116,128 @@ class AliasedOrderingFilter(OrderingFilter):
         return ordering
 
 
+class MedicalExpertSearchFilter(django_filters.CharFilter):
+    """
+    Case and accent insensitive substring filter using the medical experts
+    search index, NAME being the MedicalExpertSearchDocument field to
+    match. With words=True every word of the value has to match
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.words = kwargs.pop('words', False)
+        super(MedicalExpertSearchFilter, self).__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        terms = value.split() if self.words else [value]
+        for term in terms:
+            qs = qs.filter(pk__in=MedicalExpertSearchDocument.objects.
+                           search(term, self.name))
+        return qs
+
+
+class InvestigatorFlagsMixin(object):
+    """
+    Resolve the 'is_unlocked_investigator' and 'is_favorite_investigator'
+    flags of the whole page once, after pagination, and pass them to the
+    serializer context
+    """
+    investigator_flags = None
+
+    def paginate_queryset(self, queryset):
+        page = super(InvestigatorFlagsMixin, self).paginate_queryset(queryset)
+        if page is not None:
+            self.investigator_flags = medical_expert_investigator_flags(
+                self.request.user, page)
+        return page
+
+    def get_serializer_context(self):
+        context = super(InvestigatorFlagsMixin, self). \
+            get_serializer_context()
+        if self.investigator_flags is not None:
+            context.update(self.investigator_flags)
+        return context
+
+    def get_etag_parts(self, request):
+        parts = super(InvestigatorFlagsMixin, self).get_etag_parts(request)
+        if parts is None or not request.user.is_authenticated:
+            return parts
+        # bumped when the user unlocks or marks an investigator as favorite
+        return [parts, get_generation('investigator_flags', request.user.pk)]
+
+
+class SerializerTimingMixin(object):
+    """
+    Time the data of the serializers of the view, sent in the Server-Timing
+    header by the QueryInstrumentationMiddleware
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        return TimedSerializer(super(SerializerTimingMixin, self).
+                               get_serializer(*args, **kwargs))
+
+
+class ValuesSerializerMixin(object):
+    """
+    List the page with VALUES_SERIALIZER_CLASS, a ValuesSerializer of the
+    .values() rows of the queryset, instead of serializing model instances
+    with the serializer_class, for the same data
+    """
+    values_serializer_class = None
+
+    def get_values_serializer_class(self):
+        return self.values_serializer_class
+
+    def get_etag_related_models(self):
+        return self.get_values_serializer_class().get_related_models()
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer_class = self.get_values_serializer_class()
+        ordering = []
+        if isinstance(self.paginator, KeysetPagination):
+            # the cursor is read from the ordering fields of the last row
+            ordering = [field for field, descending in
+                        self.paginator.get_ordering(queryset)]
+        queryset = serializer_class.get_values_queryset(queryset, ordering)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = TimedSerializer(serializer_class(
+                page, many=True, context=self.get_serializer_context()))
+            return self.get_paginated_response(serializer.data)
+
+        serializer = TimedSerializer(serializer_class(
+            queryset, many=True, context=self.get_serializer_context()))
+        return Response(serializer.data)
+
+
+class MedicalExpertRollupListView(SerializerTimingMixin,
+                                  generics.ListAPIView):
+    """
+    Totals of medical experts per dimension, read from the rollups
+    """
+    pagination_class = LargeResultsSetPagination
+    segment = None
+    dimension = None
+
+    def get_queryset(self):
+        queryset = MedicalExpertRollup.objects.totals(self.segment,
+                                                      self.dimension)
+        return queryset
+
+
 class InvestigatorFilter(django_filters.FilterSet):
-    first_name = django_filters.CharFilter(name="first_name",
-                                           lookup_expr='icontains')
-    middle_name = django_filters.CharFilter(name="middle_name",
-                                            lookup_expr='icontains')
-    last_name = django_filters.CharFilter(name="last_name",
-                                          lookup_expr='icontains')
-    city = django_filters.CharFilter(name="city", lookup_expr='icontains')
-    country = django_filters.CharFilter(name="country__name",
-                                        lookup_expr='icontains')
-    prop_therapeutic_areas = django_filters.CharFilter(
-        name="therapeutic_areas__name", lookup_expr='icontains', distinct=True)
-    prop_specialties = django_filters.CharFilter(
-        name="specialties__name", lookup_expr='icontains', distinct=True)
+    q = MedicalExpertSearchFilter(name="document", words=True)
+    first_name = MedicalExpertSearchFilter(name="first_name")
+    middle_name = MedicalExpertSearchFilter(name="middle_name")
+    last_name = MedicalExpertSearchFilter(name="last_name")
+    city = MedicalExpertSearchFilter(name="city")
+    country = MedicalExpertSearchFilter(name="country")
+    prop_therapeutic_areas = MedicalExpertSearchFilter(
+        name="therapeutic_areas")
+    prop_specialties = MedicalExpertSearchFilter(name="specialties")
 
     class Meta:
         model = MedicalExpert
@@ -107,8 +249,21 @@ class InvestigatorFilter(django_filters.FilterSet):
             'number_linked_institutions_coi')
 
 
-class InvestigatorsListView(generics.ListAPIView):
+# link counters updated without last_changed_on, validating the lists
+NUMBER_LINKED_FIELDS = (
+    'number_linked_clinical_trials', 'number_linked_events',
+    'number_linked_institutions', 'number_linked_publications',
+    'number_linked_institutions_subtype_company',
+    'number_linked_institutions_coi')
+
+
+class InvestigatorsListView(KeysetPaginationMixin, InvestigatorFlagsMixin,
+                            ValuesSerializerMixin,
+                            LastChangedConditionalGetMixin,
+                            generics.ListAPIView):
+    etag_sum_fields = NUMBER_LINKED_FIELDS
     serializer_class = InvestigatorSerializer
+    values_serializer_class = InvestigatorValuesSerializer
     filter_class = InvestigatorFilter
     filter_backends = (AliasedOrderingFilter,
                        django_filters.rest_framework.DjangoFilterBackend,)
@@ -129,42 +284,44 @@ class InvestigatorsListView(generics.ListAPIView):
             return InvestigatorSerializerSuperUser
         return super(InvestigatorsListView, self).get_serializer_class()
 
+    def get_values_serializer_class(self):
+        """
+        Return InvestigatorValuesSerializerSuperUser for superuser
+        """
+        if self.request.user.is_superuser:
+            return InvestigatorValuesSerializerSuperUser
+        return super(InvestigatorsListView, self). \
+            get_values_serializer_class()
+
     def get_queryset(self):
         queryset = MedicalExpert.objects.filter(
-            number_linked_clinical_trials__gt=0).order_by('pk')
+            number_linked_clinical_trials__gt=0). \
+            select_related('country'). \
+            prefetch_related('therapeutic_areas', 'specialties'). \
+            order_by('pk')
         return queryset
 
 
-class InvestigatorsPerCountryListView(generics.ListAPIView):
-    queryset = MedicalExpert.objects. \
-        filter(number_linked_clinical_trials__gt=0). \
-        exclude(country=None).values('country__name'). \
-        annotate(total=Count('country__name')). \
-        order_by('total', 'country__name')
+class InvestigatorsPerCountryListView(MedicalExpertRollupListView):
+    segment = MedicalExpertRollup.SEGMENT_INVESTIGATORS
+    dimension = MedicalExpertRollup.DIMENSION_COUNTRY
     serializer_class = CountryTotalSerializer
-    pagination_class = LargeResultsSetPagination
 
 
-class InvestigatorsPerProfessionListView(generics.ListAPIView):
-    queryset = MedicalExpert.objects. \
-        filter(number_linked_clinical_trials__gt=0).exclude(profession=None). \
-        values('profession__name').annotate(total=Count('profession__name')). \
-        order_by('total', 'profession__name')
+class InvestigatorsPerProfessionListView(MedicalExpertRollupListView):
+    segment = MedicalExpertRollup.SEGMENT_INVESTIGATORS
+    dimension = MedicalExpertRollup.DIMENSION_PROFESSION
     serializer_class = ProfessionTotalSerializer
-    pagination_class = LargeResultsSetPagination
 
 
-class InvestigatorsPerSpecialtyListView(generics.ListAPIView):
-    queryset = MedicalExpert.objects. \
-        filter(number_linked_clinical_trials__gt=0). \
-        exclude(specialties=None).values('specialties__name'). \
-        annotate(total=Count('specialties__name')). \
-        order_by('total', 'specialties__name')
+class InvestigatorsPerSpecialtyListView(MedicalExpertRollupListView):
+    segment = MedicalExpertRollup.SEGMENT_INVESTIGATORS
+    dimension = MedicalExpertRollup.DIMENSION_SPECIALTY
     serializer_class = SpecialtyTotalSerializer
-    pagination_class = LargeResultsSetPagination
 
 
-class InvestigatorConnectionsListView(generics.ListAPIView):
+class InvestigatorConnectionsListView(SerializerTimingMixin,
+                                      generics.ListAPIView):
     serializer_class = MedicalExpertConnectionSerializer
     pagination_class = LargeResultsSetPagination
 
@@ -174,15 +331,12 @@ class InvestigatorConnectionsListView(generics.ListAPIView):
 
 
 class InvestigatorConnectionsMedicalExpertsFilter(django_filters.FilterSet):
-    first_name = django_filters.CharFilter(name="first_name",
-                                           lookup_expr='icontains')
-    middle_name = django_filters.CharFilter(name="middle_name",
-                                            lookup_expr='icontains')
-    last_name = django_filters.CharFilter(name="last_name",
-                                          lookup_expr='icontains')
-    city = django_filters.CharFilter(name="city", lookup_expr='icontains')
-    country = django_filters.CharFilter(name="country__name",
-                                        lookup_expr='icontains')
+    q = MedicalExpertSearchFilter(name="document", words=True)
+    first_name = MedicalExpertSearchFilter(name="first_name")
+    middle_name = MedicalExpertSearchFilter(name="middle_name")
+    last_name = MedicalExpertSearchFilter(name="last_name")
+    city = MedicalExpertSearchFilter(name="city")
+    country = MedicalExpertSearchFilter(name="country")
 
     class Meta:
         model = MedicalExpert
@@ -190,7 +344,9 @@ class InvestigatorConnectionsMedicalExpertsFilter(django_filters.FilterSet):
             'first_name', 'middle_name', 'last_name', 'city', 'country')
 
 
-class InvestigatorConnectionsMedicalExpertsListView(generics.ListAPIView):
+class InvestigatorConnectionsMedicalExpertsListView(KeysetPaginationMixin,
+                                                    SerializerTimingMixin,
+                                                    generics.ListAPIView):
     serializer_class = MedicalExpertConnectionMedicalExpertSerializer
     filter_class = InvestigatorConnectionsMedicalExpertsFilter
     filter_backends = (OrderingFilter,
@@ -199,98 +355,44 @@ class InvestigatorConnectionsMedicalExpertsListView(generics.ListAPIView):
         'first_name', 'middle_name', 'last_name', 'city',
         ('country', 'country__name')
     )
-
-
-class InvestigatorConnectionsAuthorsListView(
-      InvestigatorConnectionsMedicalExpertsListView):
+    connection_model = None
 
     def get_queryset(self):
-        medical_experts = MedicalExpertPublication.objects. \
-            filter(publication__in=MedicalExpertPublication.objects.
-                   filter(medical_expert=self.kwargs['pk']).
-                   exclude(publication=None).values('publication')). \
-            exclude(medical_expert=self.kwargs['pk']). \
-            values('medical_expert').distinct()
+        medical_experts = self.connection_model.objects. \
+            filter(medical_expert=self.kwargs['pk']). \
+            values('connected_medical_expert')
         queryset = MedicalExpert.objects.filter(pk__in=medical_experts). \
-            order_by('pk')
+            select_related('country').order_by('pk')
         return queryset
 
 
-class InvestigatorConnectionsCTCollaboratorListView(
+class InvestigatorConnectionsAuthorsListView(
       InvestigatorConnectionsMedicalExpertsListView):
+    connection_model = MedicalExpertConnectionAuthor
 
-    def get_queryset(self):
-        medical_experts = MedicalExpertClinicalTrial.objects. \
-            filter(clinical_trial__in=MedicalExpertClinicalTrial.objects.
-                   filter(medical_expert=self.kwargs['pk']).
-                   exclude(clinical_trial=None).values('clinical_trial')). \
-            exclude(medical_expert=self.kwargs['pk']). \
-            values('medical_expert').distinct()
-        queryset = MedicalExpert.objects.filter(pk__in=medical_experts). \
-            order_by('pk')
-        return queryset
+
+class InvestigatorConnectionsCTCollaboratorListView(
+      InvestigatorConnectionsMedicalExpertsListView):
+    connection_model = MedicalExpertConnectionCTCollaborator
 
 
 class InvestigatorConnectionsEventParticipantListView(
       InvestigatorConnectionsMedicalExpertsListView):
-
-    def get_queryset(self):
-        medical_experts = MedicalExpertEvent.objects. \
-            filter(event__in=MedicalExpertEvent.objects.
-                   filter(medical_expert=self.kwargs['pk']).
-                   exclude(event=None).values('event')). \
-            exclude(medical_expert=self.kwargs['pk']). \
-            values('medical_expert').distinct()
-        queryset = MedicalExpert.objects.filter(pk__in=medical_experts). \
-            order_by('pk')
-        return queryset
+    connection_model = MedicalExpertConnectionEventParticipant
 
 
 class InvestigatorConnectionsPhysiciansListView(
       InvestigatorConnectionsMedicalExpertsListView):
-
-    def get_queryset(self):
-        physicians_institutions_filter = {
-            'institution__institution_subtype__name__in':
-            ['Hospital', 'Hospital Department', 'Medical Practice'],
-            'position__name__in': ['Role Physician', 'Head of'],
-        }
-        medical_experts = MedicalExpertInstitution.objects. \
-            filter(institution__in=MedicalExpertInstitution.objects.
-                   filter(medical_expert=self.kwargs['pk']).
-                   exclude(institution=None).
-                   filter(**physicians_institutions_filter).
-                   values('institution')). \
-            exclude(medical_expert=self.kwargs['pk']). \
-            values('medical_expert').distinct()
-        queryset = MedicalExpert.objects.filter(pk__in=medical_experts). \
-            order_by('pk')
-        return queryset
+    connection_model = MedicalExpertConnectionPhysician
 
 
 class InvestigatorConnectionsResearchersListView(
       InvestigatorConnectionsMedicalExpertsListView):
+    connection_model = MedicalExpertConnectionResearcher
 
-    def get_queryset(self):
-        researchers_institutions_exclude = {
-            'institution__institution_subtype__name__in':
-            ['Hospital', 'Hospital Department', 'Medical Practice'],
-            'position__name__in': ['Role Physician', 'Head of'],
-        }
-        medical_experts = MedicalExpertInstitution.objects. \
-            filter(institution__in=MedicalExpertInstitution.objects.
-                   filter(medical_expert=self.kwargs['pk']).
-                   exclude(institution=None).
-                   exclude(**researchers_institutions_exclude).
-                   values('institution')). \
-            exclude(medical_expert=self.kwargs['pk']). \
-            values('medical_expert').distinct()
-        queryset = MedicalExpert.objects.filter(pk__in=medical_experts). \
-            order_by('pk')
-        return queryset
 
-
-class InvestigatorAffiliationsPerInstitutionTypeListView(generics.ListAPIView):
+class InvestigatorAffiliationsPerInstitutionTypeListView(
+      SerializerTimingMixin, generics.ListAPIView):
     serializer_class = MedicalExpertAffiliationSerializer
 
     def get_queryset(self):
@@ -298,6 +400,14 @@ class InvestigatorAffiliationsPerInstitutionTypeListView(generics.ListAPIView):
         return queryset
 
 
+class InvestigatorProfileSummaryView(SerializerTimingMixin,
+                                     generics.RetrieveAPIView):
+    serializer_class = MedicalExpertProfileSummarySerializer
+
+    def get_object(self):
+        return medical_expert_profile_summary(self.kwargs['pk'])
+
+
 class InvestigatorAffiliationsFilter(django_filters.FilterSet):
     position__name = django_filters.CharFilter(
         name="position__name", lookup_expr='icontains')
@@ -323,7 +433,8 @@ class InvestigatorAffiliationsFilter(django_filters.FilterSet):
                   'institution__country__name')
 
 
-class InvestigatorAffiliationsListView(generics.ListAPIView):
+class InvestigatorAffiliationsListView(SerializerTimingMixin,
+                                       generics.ListAPIView):
     serializer_class = AffiliationSerializer
     filter_class = InvestigatorAffiliationsFilter
     filter_backends = (OrderingFilter,
@@ -405,10 +516,56 @@ class InvestigatorAffiliationsAssociationsListView(
         return queryset
 
 
-class InvestigatorCompanyCooperationsPerCompanyListView(generics.ListAPIView):
+class InvestigatorCachedAggregateMixin(SerializerTimingMixin,
+                                       ConditionalGetMixin):
+    """
+    Cache the response of the investigator aggregate for each query
+    parameters. The key holds the investigator generation, bumped when the
+    relations of the investigator, or the related rows and links read by
+    the aggregates, change. The ETag of the response is the
+    hash of the cached data, so that it changes only with the data. The
+    missing responses are read from the primary, a lagging replica would
+    cache the data before the writes which bumped the generation
+    """
+
+    def get_cache_key(self, request):
+        return make_cache_key(type(self).__name__, 'medical_expert',
+                              self.kwargs['pk'], request.query_params.lists())
+
+    def get_etag(self, request):
+        cached = cache.get(self.get_cache_key(request))
+        if cached is None:
+            return None
+        return cached[0]
+
+    def list(self, request, *args, **kwargs):
+        key = self.get_cache_key(request)
+        cached = cache.get(key)
+        if cached is not None:
+            etag, data = cached
+            response = Response(data)
+        else:
+            with replica_reads(enabled=False):
+                response = super(InvestigatorCachedAggregateMixin, self). \
+                    list(request, *args, **kwargs)
+            etag = make_data_etag(response.data)
+            cache.set(key, (etag, response.data),
+                      settings.INVESTIGATOR_CACHE_TIMEOUT)
+        response['ETag'] = quote_etag(etag)
+        return response
+
+
+class InvestigatorCompanyCooperationsPerCompanyListView(
+      InvestigatorCachedAggregateMixin, generics.ListAPIView):
     serializer_class = CooperationInstitutionTotalAmountSerializer
     pagination_class = LargeResultsSetPagination
 
+    def get_cache_key(self, request):
+        # the years of the aggregate move on with the current year
+        return '%s:%s' % (super(
+            InvestigatorCompanyCooperationsPerCompanyListView, self).
+            get_cache_key(request), datetime.now().year)
+
     def get_queryset(self):
         current_year = datetime.now().year
         years = (str(current_year), str(current_year - 1),
@@ -429,7 +586,7 @@ class InvestigatorCompanyCooperationsPerCompanyListView(generics.ListAPIView):
 
 
 class InvestigatorCompanyCooperationsPerNatureOfPaymentListView(
-      generics.ListAPIView):
+      InvestigatorCachedAggregateMixin, generics.ListAPIView):
     serializer_class = NatureOfPaymentTotalAmountSerializer
     pagination_class = LargeResultsSetPagination
 
@@ -460,7 +617,8 @@ class InvestigatorCompanyCooperationsFilter(django_filters.FilterSet):
                   'currency')
 
 
-class InvestigatorCompanyCooperationsListView(generics.ListAPIView):
+class InvestigatorCompanyCooperationsListView(SerializerTimingMixin,
+                                              generics.ListAPIView):
     serializer_class = CompanyCooperationsSerializer
     filter_class = InvestigatorCompanyCooperationsFilter
     filter_backends = (OrderingFilter,
@@ -480,32 +638,60 @@ class InvestigatorCompanyCooperationsListView(generics.ListAPIView):
         return queryset
 
 
-class InvestigatorClinicalTrialsPerConditionListView(generics.ListAPIView):
+class InvestigatorRelatedObjectsMixin(object):
+    """
+    Resolve the clinical trials, events and publications of the investigator.
+    InvestigatorProfileView sets related_objects to share the resolved ids
+    between its sections
+    """
+    related_objects = None
+
+    def get_related_objects(self, model, medical_expert_filter):
+        queryset = model.objects. \
+            filter(**{medical_expert_filter: self.kwargs['pk']}). \
+            values('pk').distinct()
+        if self.related_objects is None:
+            return queryset
+        if model not in self.related_objects:
+            self.related_objects[model] = \
+                list(queryset.values_list('pk', flat=True))
+        return self.related_objects[model]
+
+    def get_clinical_trials(self):
+        return self.get_related_objects(
+            ClinicalTrial, 'medicalexpertclinicaltrial__medical_expert')
+
+    def get_events(self):
+        return self.get_related_objects(
+            Event, 'medicalexpertevent__medical_expert')
+
+    def get_publications(self):
+        return self.get_related_objects(
+            Publication, 'medicalexpertpublication__medical_expert')
+
+
+class InvestigatorClinicalTrialsPerConditionListView(
+      InvestigatorCachedAggregateMixin, InvestigatorRelatedObjectsMixin,
+      generics.ListAPIView):
     serializer_class = ClinicalTrialConditionTotalSerializer
     pagination_class = LargeResultsSetPagination
 
     def get_queryset(self):
-        clinical_trials_filter = {
-            'medicalexpertclinicaltrial__medical_expert': self.kwargs['pk']
-        }
-        clinical_trials = ClinicalTrial.objects. \
-            filter(**clinical_trials_filter).distinct()
+        clinical_trials = self.get_clinical_trials()
         queryset = ClinicalTrialCondition.objects. \
             filter(clinicaltrial__in=clinical_trials).values('name'). \
             annotate(total=Count('name')).order_by('total', 'name')
         return queryset
 
 
-class InvestigatorClinicalTrialsPerSponsorListView(generics.ListAPIView):
+class InvestigatorClinicalTrialsPerSponsorListView(
+      InvestigatorCachedAggregateMixin, InvestigatorRelatedObjectsMixin,
+      generics.ListAPIView):
     serializer_class = InstitutionTotalSerializer
     pagination_class = LargeResultsSetPagination
 
     def get_queryset(self):
-        clinical_trials_filter = {
-            'medicalexpertclinicaltrial__medical_expert': self.kwargs['pk']
-        }
-        clinical_trials = ClinicalTrial.objects. \
-            filter(**clinical_trials_filter).distinct()
+        clinical_trials = self.get_clinical_trials()
         queryset = ClinicalTrialInstitution.objects. \
             filter(clinical_trial__in=clinical_trials). \
             exclude(relationship_type=None). \
@@ -517,18 +703,16 @@ class InvestigatorClinicalTrialsPerSponsorListView(generics.ListAPIView):
         return queryset
 
 
-class InvestigatorClinicalTrialsPerStudyPhaseListView(generics.ListAPIView):
+class InvestigatorClinicalTrialsPerStudyPhaseListView(
+      InvestigatorCachedAggregateMixin, InvestigatorRelatedObjectsMixin,
+      generics.ListAPIView):
     serializer_class = StudyPhaseTotalSerializer
     pagination_class = LargeResultsSetPagination
 
     def get_queryset(self):
-        clinical_trials_filter = {
-            'medicalexpertclinicaltrial__medical_expert': self.kwargs['pk']
-        }
-        clinical_trials = ClinicalTrial.objects. \
-            filter(**clinical_trials_filter).values('pk').distinct()
+        clinical_trials = self.get_clinical_trials()
         queryset = ClinicalTrial.objects. \
-            filter(pk__in=clinical_trials).exclude(study_phases=None). \
+            filter(pk__in=clinical_trials, study_phases__isnull=False). \
             values('study_phases__name'). \
             annotate(total=Count('study_phases__name')). \
             order_by('total', 'study_phases__name')
@@ -536,16 +720,13 @@ class InvestigatorClinicalTrialsPerStudyPhaseListView(generics.ListAPIView):
 
 
 class InvestigatorClinicalTrialsPerInterventionListView(
+      InvestigatorCachedAggregateMixin, InvestigatorRelatedObjectsMixin,
       generics.ListAPIView):
     serializer_class = InterventionTotalSerializer
     pagination_class = LargeResultsSetPagination
 
     def get_queryset(self):
-        clinical_trials_filter = {
-            'medicalexpertclinicaltrial__medical_expert': self.kwargs['pk']
-        }
-        clinical_trials = ClinicalTrial.objects. \
-            filter(**clinical_trials_filter).distinct()
+        clinical_trials = self.get_clinical_trials()
         queryset = ClinicalTrialIntervention.objects. \
             filter(clinical_trial__in=clinical_trials). \
             exclude(intervention=None). \
@@ -574,8 +755,11 @@ class InvestigatorClinicalTrialsFilter(django_filters.FilterSet):
                   'enrollment', 'intervention')
 
 
-class InvestigatorClinicalTrialsListView(generics.ListAPIView):
+class InvestigatorClinicalTrialsListView(ValuesSerializerMixin,
+                                         LastChangedConditionalGetMixin,
+                                         generics.ListAPIView):
     serializer_class = ClinicalTrialSerializer
+    values_serializer_class = ClinicalTrialValuesSerializer
     filter_class = InvestigatorClinicalTrialsFilter
     filter_backends = (AliasedOrderingFilter,
                        django_filters.rest_framework.DjangoFilterBackend)
@@ -595,23 +779,22 @@ class InvestigatorClinicalTrialsListView(generics.ListAPIView):
         return queryset
 
 
-class InvestigatorEventsPerTypeListView(generics.ListAPIView):
+class InvestigatorEventsPerTypeListView(InvestigatorCachedAggregateMixin,
+                                        InvestigatorRelatedObjectsMixin,
+                                        generics.ListAPIView):
     serializer_class = EventSubTypeTotalSerializer
     pagination_class = LargeResultsSetPagination
 
     def get_queryset(self):
-        events_filter = {
-            'medicalexpertevent__medical_expert': self.kwargs['pk']
-        }
-        events = Event.objects. \
-            filter(**events_filter).distinct()
+        events = self.get_events()
         queryset = EventSubtype.objects.filter(event__in=events). \
             values('name').annotate(total=Count('name')). \
             order_by('total', 'name')
         return queryset
 
 
-class InvestigatorEventsPerPositionListView(generics.ListAPIView):
+class InvestigatorEventsPerPositionListView(InvestigatorCachedAggregateMixin,
+                                            generics.ListAPIView):
     serializer_class = MedicalExpertEventPositionTotalSerializer
     pagination_class = LargeResultsSetPagination
 
@@ -638,8 +821,11 @@ class InvestigatorEventsFilter(django_filters.FilterSet):
                   'country')
 
 
-class InvestigatorEventsListView(generics.ListAPIView):
+class InvestigatorEventsListView(ValuesSerializerMixin,
+                                 LastChangedConditionalGetMixin,
+                                 generics.ListAPIView):
     serializer_class = EventSerializer
+    values_serializer_class = EventValuesSerializer
     filter_class = InvestigatorEventsFilter
     filter_backends = (AliasedOrderingFilter,
                        django_filters.rest_framework.DjangoFilterBackend)
@@ -657,16 +843,14 @@ class InvestigatorEventsListView(generics.ListAPIView):
         return queryset
 
 
-class InvestigatorPublicationsPerTypeListView(generics.ListAPIView):
+class InvestigatorPublicationsPerTypeListView(
+      InvestigatorCachedAggregateMixin, InvestigatorRelatedObjectsMixin,
+      generics.ListAPIView):
     serializer_class = PublicationSubTypeTotalSerializer
     pagination_class = LargeResultsSetPagination
 
     def get_queryset(self):
-        publications_filter = {
-            'medicalexpertpublication__medical_expert': self.kwargs['pk']
-        }
-        publications = Publication.objects. \
-            filter(**publications_filter).distinct()
+        publications = self.get_publications()
         queryset = PublicationSubtype.objects. \
             filter(publication__in=publications). \
             values('name').annotate(total=Count('name')). \
@@ -674,16 +858,14 @@ class InvestigatorPublicationsPerTypeListView(generics.ListAPIView):
         return queryset
 
 
-class InvestigatorPublicationsPerYearListView(generics.ListAPIView):
+class InvestigatorPublicationsPerYearListView(
+      InvestigatorCachedAggregateMixin, InvestigatorRelatedObjectsMixin,
+      generics.ListAPIView):
     serializer_class = PublicationYearTotalSerializer
     pagination_class = LargeResultsSetPagination
 
     def get_queryset(self):
-        publications_filter = {
-            'medicalexpertpublication__medical_expert': self.kwargs['pk']
-        }
-        publications = Publication.objects. \
-            filter(**publications_filter).values('pk').distinct()
+        publications = self.get_publications()
         queryset = Publication.objects. \
             filter(pk__in=publications).exclude(publication_year=None). \
             values('publication_year'). \
@@ -702,8 +884,11 @@ class InvestigatorPublicationsFilter(django_filters.FilterSet):
         fields = ('name', 'publication_year')
 
 
-class InvestigatorPublicationsListView(generics.ListAPIView):
+class InvestigatorPublicationsListView(ValuesSerializerMixin,
+                                       LastChangedConditionalGetMixin,
+                                       generics.ListAPIView):
     serializer_class = PublicationSerializer
+    values_serializer_class = PublicationValuesSerializer
     filter_class = InvestigatorPublicationsFilter
     filter_backends = (OrderingFilter,
                        django_filters.rest_framework.DjangoFilterBackend)
@@ -718,8 +903,99 @@ class InvestigatorPublicationsListView(generics.ListAPIView):
         return queryset
 
 
-class FavoriteInvestigatorsListView(generics.ListAPIView):
+class InvestigatorProfileView(generics.GenericAPIView):
+    """
+    Return the investigator sections selected by the comma separated
+    "sections" query parameter (all of them by default) in one response.
+    Each section is the response of the matching investigator route for
+    the query parameters of its filters only: the pagination and ordering
+    parameters are not forwarded, so each section is the first page of its
+    route and shares its cached responses
+    """
+    section_views = OrderedDict([
+        ('connections', InvestigatorConnectionsListView),
+        ('profile-summary', InvestigatorProfileSummaryView),
+        ('affiliations-per-institution-type',
+         InvestigatorAffiliationsPerInstitutionTypeListView),
+        ('affiliations-universities',
+         InvestigatorAffiliationsUniversitiesListView),
+        ('affiliations-hospitals', InvestigatorAffiliationsHospitalsListView),
+        ('affiliations-associations',
+         InvestigatorAffiliationsAssociationsListView),
+        ('cooperations-per-company',
+         InvestigatorCompanyCooperationsPerCompanyListView),
+        ('cooperations-per-nature-of-payment',
+         InvestigatorCompanyCooperationsPerNatureOfPaymentListView),
+        ('clinical-trials-per-condition',
+         InvestigatorClinicalTrialsPerConditionListView),
+        ('clinical-trials-per-sponsor',
+         InvestigatorClinicalTrialsPerSponsorListView),
+        ('clinical-trials-per-study-phase',
+         InvestigatorClinicalTrialsPerStudyPhaseListView),
+        ('clinical-trials-per-intervention',
+         InvestigatorClinicalTrialsPerInterventionListView),
+        ('events-per-type', InvestigatorEventsPerTypeListView),
+        ('events-per-position', InvestigatorEventsPerPositionListView),
+        ('publications-per-type', InvestigatorPublicationsPerTypeListView),
+        ('publications-per-year', InvestigatorPublicationsPerYearListView),
+    ])
+
+    def get_sections(self):
+        sections = self.request.query_params.get('sections')
+        if not sections:
+            return list(self.section_views)
+        sections = [section.strip() for section in sections.split(',')
+                    if section.strip()]
+        unknown_sections = [section for section in sections
+                            if section not in self.section_views]
+        if unknown_sections:
+            raise ValidationError({'sections': [
+                'Unknown section: %s' % section
+                for section in unknown_sections]})
+        return sections
+
+    def get_section_request(self, request, view_class):
+        """
+        Return a copy of REQUEST with the query parameters of the filters of
+        VIEW_CLASS only
+        """
+        filter_class = getattr(view_class, 'filter_class', None)
+        names = set(filter_class.base_filters) if filter_class else set()
+        http_request = copy.copy(request._request)
+        http_request.GET = QueryDict(mutable=True)
+        for name, values in request.query_params.lists():
+            if name in names:
+                http_request.GET.setlist(name, values)
+        section_request = clone_request(request, request.method)
+        section_request._request = http_request
+        return section_request
+
+    def get(self, request, *args, **kwargs):
+        related_objects = {}
+        data = OrderedDict()
+        for section in self.get_sections():
+            view_class = self.section_views[section]
+            section_request = self.get_section_request(request, view_class)
+            view = view_class(
+                request=section_request, args=args, kwargs=kwargs,
+                format_kwarg=self.format_kwarg)
+            view.related_objects = related_objects
+            if hasattr(view, 'list'):
+                response = view.list(section_request, *args, **kwargs)
+            else:
+                response = view.retrieve(section_request, *args, **kwargs)
+            data[section] = response.data
+        return Response(data)
+
+
+class FavoriteInvestigatorsListView(KeysetPaginationMixin,
+                                    InvestigatorFlagsMixin,
+                                    ValuesSerializerMixin,
+                                    LastChangedConditionalGetMixin,
+                                    generics.ListAPIView):
+    etag_sum_fields = NUMBER_LINKED_FIELDS
     serializer_class = FavoriteMedicalExpertSerializer
+    values_serializer_class = FavoriteMedicalExpertValuesSerializer
     filter_class = InvestigatorFilter
     filter_backends = (AliasedOrderingFilter,
                        django_filters.rest_framework.DjangoFilterBackend,)
@@ -741,10 +1017,22 @@ class FavoriteInvestigatorsListView(generics.ListAPIView):
         return super(FavoriteInvestigatorsListView, self). \
             get_serializer_class()
 
+    def get_values_serializer_class(self):
+        """
+        Return FavoriteMedicalExpertValuesSerializerSuperUser for superuser
+        """
+        if self.request.user.is_superuser:
+            return FavoriteMedicalExpertValuesSerializerSuperUser
+        return super(FavoriteInvestigatorsListView, self). \
+            get_values_serializer_class()
+
     def get_queryset(self):
         queryset = MedicalExpert.objects. \
             filter(number_linked_clinical_trials__gt=0,
-                   favoriteinvestigator__user=self.request.user).order_by('pk')
+                   favoriteinvestigator__user=self.request.user). \
+            select_related('country'). \
+            prefetch_related('therapeutic_areas', 'specialties'). \
+            order_by('pk')
         return queryset
 
 
@@ -764,7 +1052,7 @@ class RequestFilter(django_filters.FilterSet):
                   'get_status_display')
 
 
-class RequestsListView(generics.ListAPIView):
+class RequestsListView(SerializerTimingMixin, generics.ListAPIView):
     serializer_class = RequestSerializer
     filter_class = RequestFilter
     filter_backends = (AliasedOrderingFilter,
@@ -779,21 +1067,23 @@ class RequestsListView(generics.ListAPIView):
             order_by('pk')
         return queryset
 
+    def paginate_queryset(self, queryset):
+        page = super(RequestsListView, self).paginate_queryset(queryset)
+        if page is not None:
+            Request.objects.preload_details(page)
+        return page
+
 
 class SpeakerFilter(django_filters.FilterSet):
-    first_name = django_filters.CharFilter(name="first_name",
-                                           lookup_expr='icontains')
-    middle_name = django_filters.CharFilter(name="middle_name",
-                                            lookup_expr='icontains')
-    last_name = django_filters.CharFilter(name="last_name",
-                                          lookup_expr='icontains')
-    city = django_filters.CharFilter(name="city", lookup_expr='icontains')
-    country = django_filters.CharFilter(name="country__name",
-                                        lookup_expr='icontains')
-    prop_therapeutic_areas = django_filters.CharFilter(
-        name="therapeutic_areas__name", lookup_expr='icontains', distinct=True)
-    prop_specialties = django_filters.CharFilter(
-        name="specialties__name", lookup_expr='icontains', distinct=True)
+    q = MedicalExpertSearchFilter(name="document", words=True)
+    first_name = MedicalExpertSearchFilter(name="first_name")
+    middle_name = MedicalExpertSearchFilter(name="middle_name")
+    last_name = MedicalExpertSearchFilter(name="last_name")
+    city = MedicalExpertSearchFilter(name="city")
+    country = MedicalExpertSearchFilter(name="country")
+    prop_therapeutic_areas = MedicalExpertSearchFilter(
+        name="therapeutic_areas")
+    prop_specialties = MedicalExpertSearchFilter(name="specialties")
 
     class Meta:
         model = MedicalExpert
@@ -805,8 +1095,12 @@ class SpeakerFilter(django_filters.FilterSet):
             'number_linked_institutions_coi')
 
 
-class SpeakersListView(generics.ListAPIView):
+class SpeakersListView(KeysetPaginationMixin, InvestigatorFlagsMixin,
+                       ValuesSerializerMixin, LastChangedConditionalGetMixin,
+                       generics.ListAPIView):
+    etag_sum_fields = NUMBER_LINKED_FIELDS
     serializer_class = SpeakerSerializer
+    values_serializer_class = SpeakerValuesSerializer
     filter_class = SpeakerFilter
     filter_backends = (AliasedOrderingFilter,
                        django_filters.rest_framework.DjangoFilterBackend,)
@@ -827,36 +1121,36 @@ class SpeakersListView(generics.ListAPIView):
             return SpeakerSerializerSuperUser
         return super(SpeakersListView, self).get_serializer_class()
 
+    def get_values_serializer_class(self):
+        """
+        Return SpeakerValuesSerializerSuperUser for superuser
+        """
+        if self.request.user.is_superuser:
+            return SpeakerValuesSerializerSuperUser
+        return super(SpeakersListView, self).get_values_serializer_class()
+
     def get_queryset(self):
         queryset = MedicalExpert.objects.filter(
-            number_linked_events__gt=0).order_by('pk')
+            number_linked_events__gt=0). \
+            select_related('country'). \
+            prefetch_related('therapeutic_areas', 'specialties'). \
+            order_by('pk')
         return queryset
 
 
-class SpeakersPerCountryListView(generics.ListAPIView):
-    queryset = MedicalExpert.objects. \
-        filter(number_linked_events__gt=0). \
-        exclude(country=None).values('country__name'). \
-        annotate(total=Count('country__name')). \
-        order_by('total', 'country__name')
+class SpeakersPerCountryListView(MedicalExpertRollupListView):
+    segment = MedicalExpertRollup.SEGMENT_SPEAKERS
+    dimension = MedicalExpertRollup.DIMENSION_COUNTRY
     serializer_class = CountryTotalSerializer
-    pagination_class = LargeResultsSetPagination
 
 
-class SpeakersPerProfessionListView(generics.ListAPIView):
-    queryset = MedicalExpert.objects. \
-        filter(number_linked_events__gt=0).exclude(profession=None). \
-        values('profession__name').annotate(total=Count('profession__name')). \
-        order_by('total', 'profession__name')
+class SpeakersPerProfessionListView(MedicalExpertRollupListView):
+    segment = MedicalExpertRollup.SEGMENT_SPEAKERS
+    dimension = MedicalExpertRollup.DIMENSION_PROFESSION
     serializer_class = ProfessionTotalSerializer
-    pagination_class = LargeResultsSetPagination
 
 
-class SpeakersPerSpecialtyListView(generics.ListAPIView):
-    queryset = MedicalExpert.objects. \
-        filter(number_linked_events__gt=0). \
-        exclude(specialties=None).values('specialties__name'). \
-        annotate(total=Count('specialties__name')). \
-        order_by('total', 'specialties__name')
+class SpeakersPerSpecialtyListView(MedicalExpertRollupListView):
+    segment = MedicalExpertRollup.SEGMENT_SPEAKERS
+    dimension = MedicalExpertRollup.DIMENSION_SPECIALTY
     serializer_class = SpecialtyTotalSerializer
-    pagination_class = LargeResultsSetPagination
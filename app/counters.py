@@ -0,0 +1,277 @@
+"""
+Maintenance of the number_linked_* counters of MedicalExpert, ClinicalTrial
+and Institution.
+
+The relation models mark the counters of the objects they link as dirty
+with mark_counters_dirty. Inside deferred_counters (entered for each
+request by DeferredCountersMiddleware) the dirty counters are collected
+and recomputed once when the block exits, with one grouped COUNT and one
+bulk UPDATE per counter. Outside of it they are recomputed right away.
+The connections of the medical experts marked as dirty with
+mark_connections_dirty are refreshed the same way, once per connection
+model.
+"""
+import logging
+import sys
+import threading
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.db.models import Count
+from django.utils import six
+
+from app_helpers.bulk import bulk_update
+
+logger = logging.getLogger(__name__)
+
+
+class LinkCounter(object):
+    """
+    FIELD of MODEL_NAME counting the RELATION_MODEL_NAME rows linked
+    through RELATION_FIELD and matching FILTERS
+    """
+
+    def __init__(self, model_name, field, relation_model_name,
+                 relation_field, filters=None):
+        self.model_name = model_name
+        self.field = field
+        self.relation_model_name = relation_model_name
+        self.relation_field = relation_field
+        self.filters = filters or {}
+
+    @property
+    def model(self):
+        return apps.get_model('app', self.model_name)
+
+    @property
+    def relation_model(self):
+        return apps.get_model('app', self.relation_model_name)
+
+    def get_counts(self, pks=None):
+        """
+        Return the {pk: count} of the objects having linked rows, limited to
+        PKS when given
+        """
+        relations = self.relation_model.objects.filter(**self.filters)
+        if pks is not None:
+            relations = relations.filter(
+                **{'%s__in' % self.relation_field: pks})
+        else:
+            relations = relations.exclude(**{self.relation_field: None})
+        return dict(relations.values_list(self.relation_field).
+                    annotate(total=Count('pk')).order_by())
+
+
+# the counters updated by each update_number_linked_<name> method
+LINK_COUNTERS = {
+    ('MedicalExpert', 'clinical_trials'): (
+        LinkCounter('MedicalExpert', 'number_linked_clinical_trials',
+                    'MedicalExpertClinicalTrial', 'medical_expert'),
+    ),
+    ('MedicalExpert', 'institutions'): (
+        LinkCounter('MedicalExpert', 'number_linked_institutions',
+                    'MedicalExpertInstitution', 'medical_expert'),
+        LinkCounter('MedicalExpert',
+                    'number_linked_institutions_primary_affiliation',
+                    'MedicalExpertInstitution', 'medical_expert',
+                    {'primary_affiliation': True}),
+        LinkCounter('MedicalExpert',
+                    'number_linked_institutions_subtype_company',
+                    'MedicalExpertInstitution', 'medical_expert',
+                    {'institution__institution_subtype__name': 'Company'}),
+    ),
+    ('MedicalExpert', 'institutions_coi'): (
+        LinkCounter('MedicalExpert', 'number_linked_institutions_coi',
+                    'MedicalExpertInstitutionCOI', 'medical_expert'),
+    ),
+    ('MedicalExpert', 'events'): (
+        LinkCounter('MedicalExpert', 'number_linked_events',
+                    'MedicalExpertEvent', 'medical_expert'),
+    ),
+    ('MedicalExpert', 'publications'): (
+        LinkCounter('MedicalExpert', 'number_linked_publications',
+                    'MedicalExpertPublication', 'medical_expert'),
+    ),
+    ('ClinicalTrial', 'medical_experts'): (
+        LinkCounter('ClinicalTrial', 'number_linked_medical_experts',
+                    'MedicalExpertClinicalTrial', 'clinical_trial'),
+    ),
+    ('ClinicalTrial', 'interventions'): (
+        LinkCounter('ClinicalTrial', 'number_linked_interventions',
+                    'ClinicalTrialIntervention', 'clinical_trial'),
+    ),
+    ('ClinicalTrial', 'institutions'): (
+        LinkCounter('ClinicalTrial', 'number_linked_institutions',
+                    'ClinicalTrialInstitution', 'clinical_trial'),
+    ),
+    ('Institution', 'medical_experts'): (
+        LinkCounter('Institution', 'number_linked_medical_experts',
+                    'MedicalExpertInstitution', 'institution'),
+    ),
+    ('Institution', 'medical_experts_coi'): (
+        LinkCounter('Institution', 'number_linked_medical_experts_coi',
+                    'MedicalExpertInstitutionCOI', 'institution'),
+    ),
+    ('Institution', 'institutions'): (
+        LinkCounter('Institution', 'number_linked_institutions',
+                    'InstitutionInstitution', 'institution'),
+    ),
+}
+
+# the counter name of the dirty connections of a connection model
+CONNECTIONS = 'connections'
+
+# MedicalExpert counters deciding the investigators and speakers rollups
+ROLLUP_COUNTERS = ('number_linked_clinical_trials', 'number_linked_events')
+
+_state = threading.local()
+
+
+def update_link_counter(link_counter, pks, chunk_size=1000):
+    """
+    Recompute LINK_COUNTER for PKS, writing only the rows which drifted.
+    Return the {pk: (old value, new value)} of those rows
+    """
+    model = link_counter.model
+    field = link_counter.field
+    pks = sorted(set(pk for pk in pks if pk))
+    drifted = {}
+    for i in range(0, len(pks), chunk_size):
+        chunk = pks[i:i + chunk_size]
+        counts = link_counter.get_counts(chunk)
+        for pk, value in model._base_manager.filter(pk__in=chunk). \
+                values_list('pk', field):
+            if value != counts.get(pk, 0):
+                drifted[pk] = (value, counts.get(pk, 0))
+    if not drifted:
+        return drifted
+
+    values = dict((pk, new) for pk, (old, new) in drifted.items())
+    if model_is_medical_expert(model) and field in ROLLUP_COUNTERS:
+        # medical experts entering or leaving the investigators/speakers
+        flipped = [pk for pk, (old, new) in drifted.items()
+                   if (old > 0) != (new > 0)]
+        update_rollups(model, flipped,
+                       lambda: bulk_update(model, field, values, chunk_size))
+    else:
+        bulk_update(model, field, values, chunk_size)
+    return drifted
+
+
+def model_is_medical_expert(model):
+    return model is apps.get_model('app', 'MedicalExpert')
+
+
+def update_rollups(model, pks, update):
+    """
+    Call UPDATE and move the medical experts PKS between the rollups
+    """
+    if not pks:
+        return update()
+    MedicalExpertRollup = apps.get_model('app', 'MedicalExpertRollup')
+    medical_experts = model.objects.filter(pk__in=pks)
+    totals = MedicalExpertRollup.objects.compute_totals(medical_experts)
+    update()
+    deltas = Counter(MedicalExpertRollup.objects.compute_totals(
+        medical_experts))
+    deltas.subtract(totals)
+    MedicalExpertRollup.objects.apply_deltas(deltas)
+
+
+def get_link_counters(model_name=None, field=None):
+    """
+    Return the link counters, limited to MODEL_NAME and FIELD when given
+    """
+    return [link_counter
+            for key in sorted(LINK_COUNTERS)
+            for link_counter in LINK_COUNTERS[key]
+            if model_name in (None, link_counter.model_name) and
+            field in (None, link_counter.field)]
+
+
+def rebuild_link_counter(link_counter, min_pk=None, max_pk=None,
+                         chunk_size=1000):
+    """
+    Recompute LINK_COUNTER for all the objects, or those between MIN_PK and
+    MAX_PK, CHUNK_SIZE objects at a time. Yield the rows which drifted of
+    each chunk
+    """
+    objects = link_counter.model._base_manager.order_by('pk')
+    if min_pk is not None:
+        objects = objects.filter(pk__gte=min_pk)
+    if max_pk is not None:
+        objects = objects.filter(pk__lte=max_pk)
+    last_pk = None
+    while True:
+        chunk = objects if last_pk is None else \
+            objects.filter(pk__gt=last_pk)
+        pks = list(chunk.values_list('pk', flat=True)[:chunk_size])
+        if not pks:
+            return
+        yield update_link_counter(link_counter, pks, chunk_size)
+        last_pk = pks[-1]
+
+
+def update_counters(dirty):
+    """
+    Recompute the counters and refresh the connections of DIRTY, a
+    {(model name, counter name): pks} dict
+    """
+    for (model_name, counter), pks in dirty.items():
+        if counter == CONNECTIONS:
+            apps.get_model('app', model_name).objects.refresh(pks)
+            continue
+        for link_counter in LINK_COUNTERS[(model_name, counter)]:
+            update_link_counter(link_counter, pks)
+
+
+def mark_counters_dirty(model, pks, *counters):
+    """
+    Mark the COUNTERS (the names of the update_number_linked_* methods,
+    without prefix) of the MODEL objects PKS as dirty
+    """
+    pks = [pk for pk in pks if pk]
+    if not pks:
+        return
+    dirty = defaultdict(set)
+    if getattr(_state, 'dirty', None) is not None:
+        dirty = _state.dirty
+    for counter in counters:
+        dirty[(model.__name__, counter)].update(pks)
+    if getattr(_state, 'dirty', None) is None:
+        update_counters(dirty)
+
+
+def mark_connections_dirty(connection_models, medical_experts):
+    """
+    Mark the connections of CONNECTION_MODELS from and to MEDICAL_EXPERTS
+    as dirty
+    """
+    for connection_model in connection_models:
+        mark_counters_dirty(connection_model, medical_experts, CONNECTIONS)
+
+
+@contextmanager
+def deferred_counters():
+    """
+    Collect the counters marked as dirty in the block and recompute them
+    once when it exits. Nested blocks are merged into the outermost one
+    """
+    if getattr(_state, 'dirty', None) is not None:
+        yield
+        return
+    _state.dirty = defaultdict(set)
+    try:
+        yield
+    except Exception:
+        exc_info = sys.exc_info()
+        dirty, _state.dirty = _state.dirty, None
+        # rows may have been committed before the error
+        try:
+            update_counters(dirty)
+        except Exception:
+            logger.exception('Failed to update the dirty counters')
+        six.reraise(*exc_info)
+    dirty, _state.dirty = _state.dirty, None
+    update_counters(dirty)
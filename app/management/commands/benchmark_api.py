@@ -0,0 +1,128 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from api.benchmark import diff_results, run_benchmark
+from app.models import MedicalExpert
+
+
+class Command(BaseCommand):
+    help = 'Request every API route with the test client and report the ' \
+           'latency percentiles and the number of queries of each, ' \
+           'optionally compared to a baseline saved with --save'
+
+    linked_fields = ('number_linked_clinical_trials',
+                     'number_linked_institutions',
+                     'number_linked_publications', 'number_linked_events')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username',
+                            help='User making the requests, the first '
+                                 'superuser by default')
+        parser.add_argument('--pk', type=int, action='append', dest='pks',
+                            help='Investigator requested by the routes of '
+                                 'an investigator, the most linked ones by '
+                                 'default')
+        parser.add_argument('--route', action='append', dest='routes',
+                            help='Only request this route name')
+        parser.add_argument('--repeat', type=int, default=20,
+                            help='Number of requests per url')
+        parser.add_argument('--warmup', type=int, default=1,
+                            help='Number of requests per url before the '
+                                 'measured ones')
+        parser.add_argument('--cold', action='store_true',
+                            help='Clear the cache before each request')
+        parser.add_argument('--save', help='Write the results to this JSON '
+                                           'file')
+        parser.add_argument('--baseline',
+                            help='Compare the results to this JSON file')
+        parser.add_argument('--threshold', type=float, default=20,
+                            help='Percentage of p95 increase reported as a '
+                                 'regression')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error on regressions')
+
+    def handle(self, *args, **options):
+        user = self.get_user(options['username'])
+        pks = options['pks'] or self.get_most_linked_pks()
+        if not pks:
+            raise CommandError('No medical experts, run seed_benchmark_data '
+                               'first')
+
+        # the test client requests the testserver host
+        with override_settings(
+                ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['testserver']):
+            results = run_benchmark(
+                user, pks, repeat=options['repeat'],
+                warmup=options['warmup'], cold=options['cold'],
+                names=options['routes'], log=self.log_results)
+
+        if options['save']:
+            with open(options['save'], 'w') as results_file:
+                json.dump(results, results_file, indent=2, sort_keys=True)
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+            if options['routes']:
+                baseline = dict((name, route_results) for name, route_results
+                                in baseline.items()
+                                if name in options['routes'])
+            regressions = self.log_changes(
+                diff_results(baseline, results, options['threshold']))
+            if regressions and options['fail_on_regression']:
+                raise CommandError('%d regressions' % regressions)
+
+    def get_user(self, username):
+        User = get_user_model()
+        try:
+            if username:
+                return User.objects.get(username=username)
+            return User.objects.filter(is_superuser=True, is_active=True). \
+                order_by('pk')[:1].get()
+        except User.DoesNotExist:
+            raise CommandError('No user %s' % (username or 'superuser'))
+
+    def get_most_linked_pks(self):
+        pks = []
+        for field in self.linked_fields:
+            pk = MedicalExpert.objects.order_by('-%s' % field, 'pk'). \
+                values_list('pk', flat=True).first()
+            if pk is not None and pk not in pks:
+                pks.append(pk)
+        return pks
+
+    def log_results(self, name, results):
+        if not results['requests']:
+            self.stdout.write('%s: %d errors' % (name, results['errors']))
+            return
+        self.stdout.write(
+            '%s: %d requests, p50 %.1f ms, p95 %.1f ms, p99 %.1f ms, max '
+            '%.1f ms, %s queries (max %s)%s' % (
+                name, results['requests'], results['p50_ms'],
+                results['p95_ms'], results['p99_ms'], results['max_ms'],
+                results['queries'], results['max_queries'],
+                ', %d errors' % results['errors']
+                if results['errors'] else ''))
+
+    def log_changes(self, changes):
+        regressions = 0
+        for name, field, old, new, regression in changes:
+            if old is None:
+                self.stdout.write('%s: %s' % (name, field))
+                continue
+            if old == new:
+                continue
+            regressions += regression
+            self.stdout.write('%s: %s %s -> %s%s%s' % (
+                name, field, self.format_value(old), self.format_value(new),
+                ' (%+.0f%%)' % (100.0 * (new - old) / old) if old else '',
+                ' REGRESSION' if regression else ''))
+        return regressions
+
+    def format_value(self, value):
+        if isinstance(value, float):
+            return '%.1f' % value
+        return str(value)
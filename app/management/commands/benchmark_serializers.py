@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import run_serializer_benchmark
+
+
+class Command(BaseCommand):
+    help = 'Compare the rows per second of the ModelSerializers of the list ' \
+           'routes and of the ValuesSerializers returning the same data, ' \
+           'and check that both render the same JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000,
+                            help='Number of objects serialized')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of serializations, the fastest one '
+                                 'is reported')
+        parser.add_argument('--serializer', action='append', dest='names',
+                            help='Only run this benchmark')
+
+    def handle(self, *args, **options):
+        results = run_serializer_benchmark(
+            rows=options['rows'], repeat=options['repeat'],
+            names=options['names'], log=self.log_results)
+        different = [name for name, name_results in sorted(results.items())
+                     if not name_results['identical']]
+        if different:
+            raise CommandError('Different JSON: %s' % ', '.join(different))
+
+    def log_results(self, name, results):
+        if not results['rows']:
+            self.stdout.write('%s: no rows' % name)
+            return
+        self.stdout.write(
+            '%s: %d rows, model serializer %.0f rows/s, values serializer '
+            '%.0f rows/s (%.1fx)%s' % (
+                name, results['rows'], results['model_rows_per_s'],
+                results['values_rows_per_s'], results['speedup'],
+                '' if results['identical'] else ', DIFFERENT JSON'))
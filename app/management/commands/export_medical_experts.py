@@ -0,0 +1,24 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app.resources import MedicalExpertExportResource
+
+
+class Command(BaseCommand):
+    help = 'Export the medical experts to a csv or xlsx file, in chunks ' \
+           'of medical experts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of medical experts loaded at a time')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in ('csv', 'xlsx'):
+            raise CommandError('Unsupported file format: %s' % path)
+        with open(path, 'wb') as f:
+            MedicalExpertExportResource().export_to_file(
+                f, file_format, chunk_size=options['chunk_size'])
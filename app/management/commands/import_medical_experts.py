@@ -0,0 +1,31 @@
+import os
+
+import tablib
+from django.core.management.base import BaseCommand, CommandError
+
+from app.resources import MedicalExpertResource
+
+
+class Command(BaseCommand):
+    help = 'Import a medical experts spreadsheet (csv, xls or xlsx) with ' \
+           'bulk queries, matching the existing medical experts by oid'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of rows imported at a time')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format not in ('csv', 'xls', 'xlsx'):
+            raise CommandError('Unsupported file format: %s' % path)
+        with open(path, 'r' if file_format == 'csv' else 'rb') as f:
+            dataset = tablib.Dataset().load(f.read(), format=file_format)
+        try:
+            totals = MedicalExpertResource().bulk_import_data(
+                dataset, chunk_size=options['chunk_size'])
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write('%d new, %d updated, %d unchanged medical experts'
+                          % (totals['new'], totals['update'], totals['skip']))
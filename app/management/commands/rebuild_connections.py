@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from app.models_relations import MedicalExpertConnectionAuthor, \
+                                 MedicalExpertConnectionCTCollaborator, \
+                                 MedicalExpertConnectionEventParticipant, \
+                                 MedicalExpertConnectionPhysician, \
+                                 MedicalExpertConnectionResearcher
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the connections between medical experts from the ' \
+           'clinical trials, events, institutions and publications'
+
+    connection_models = (
+        MedicalExpertConnectionAuthor,
+        MedicalExpertConnectionCTCollaborator,
+        MedicalExpertConnectionEventParticipant,
+        MedicalExpertConnectionPhysician,
+        MedicalExpertConnectionResearcher,
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of source medical experts processed '
+                                 'at a time')
+
+    def handle(self, *args, **options):
+        for connection_model in self.connection_models:
+            total = connection_model.objects.rebuild(
+                chunk_size=options['chunk_size'])
+            self.stdout.write('%s: %d connections' % (
+                connection_model._meta.verbose_name_plural, total))
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app.counters import get_link_counters, rebuild_link_counter
+
+
+class Command(BaseCommand):
+    help = 'Recompute the number_linked_* counters of the medical experts, ' \
+           'clinical trials and institutions, and report the rows which ' \
+           'drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model',
+                            choices=['MedicalExpert', 'ClinicalTrial',
+                                     'Institution'],
+                            help='Only recompute the counters of this model')
+        parser.add_argument('--counter',
+                            help='Only recompute this counter field, e.g. '
+                                 'number_linked_events')
+        parser.add_argument('--min-pk', type=int,
+                            help='Only recompute the objects from this pk')
+        parser.add_argument('--max-pk', type=int,
+                            help='Only recompute the objects up to this pk')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of objects processed at a time')
+
+    def handle(self, *args, **options):
+        link_counters = get_link_counters(options['model'],
+                                          options['counter'])
+        if not link_counters:
+            raise CommandError('No counter matches %s%s' % (
+                options['counter'],
+                ' on %s' % options['model'] if options['model'] else ''))
+
+        for link_counter in link_counters:
+            total = 0
+            for drifted in rebuild_link_counter(
+                    link_counter, options['min_pk'], options['max_pk'],
+                    options['chunk_size']):
+                total += len(drifted)
+                if options['verbosity'] > 1:
+                    for pk, (old, new) in sorted(drifted.items()):
+                        self.stdout.write('%s %d %s: %d -> %d' % (
+                            link_counter.model_name, pk, link_counter.field,
+                            old, new))
+            self.stdout.write('%s.%s: %d rows drifted' % (
+                link_counter.model_name, link_counter.field, total))
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from app.models import MedicalExpertRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the investigators and speakers rollups from the ' \
+           'medical experts'
+
+    def handle(self, *args, **options):
+        total = MedicalExpertRollup.objects.rebuild()
+        self.stdout.write('Rebuilt %d rollups' % total)
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from app.models import MedicalExpertSearchDocument
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the medical experts search documents and trigrams'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of medical experts indexed at a '
+                                 'time')
+
+    def handle(self, *args, **options):
+        total = MedicalExpertSearchDocument.objects.rebuild(
+            chunk_size=options['chunk_size'])
+        self.stdout.write('Indexed %d medical experts' % total)
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app_helpers.db_connections import get_flushed_stats
+
+
+class Command(BaseCommand):
+    help = 'Report the connections opened and reused per database, from ' \
+           'the stats flushed by the ConnectionHealthMiddleware of the ' \
+           'running processes'
+
+    def handle(self, *args, **options):
+        stats = get_flushed_stats(settings.INSTRUMENTATION_CACHE)
+        if not stats:
+            self.stdout.write('No connections recorded')
+            return
+        for alias in sorted(stats):
+            alias_stats = stats[alias]
+            connects = alias_stats.get('connects', 0)
+            reuses = alias_stats.get('reuses', 0)
+            self.stdout.write(
+                '%s: %d processes, %d connects (%.1f ms avg), %d reuses '
+                '(%.0f%% of the requests), %d closed after max uses, %d '
+                'closed unusable' % (
+                    alias, alias_stats['processes'], connects,
+                    alias_stats.get('connect_ms', 0) / connects
+                    if connects else 0,
+                    reuses,
+                    100.0 * reuses / (connects + reuses)
+                    if connects + reuses else 0,
+                    alias_stats.get('closed_max_uses', 0),
+                    alias_stats.get('closed_unusable', 0)))
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand
+
+from app.models import MedicalExpert, MedicalExpertSearchDocument
+from app.resources import MedicalExpertResource
+
+
+class Command(BaseCommand):
+    help = 'Report the pairs of medical experts which are likely ' \
+           'duplicates, according to the similar matches rules of the import'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of medical experts matched at a '
+                                 'time')
+
+    def handle(self, *args, **options):
+        resource = MedicalExpertResource()
+        fields = sorted(set(
+            field for fields, threshold in
+            resource.similar_matches_rules +
+            resource.similar_matches_rules_full_match_search
+            for field in fields))
+        documents = MedicalExpertSearchDocument.objects.order_by(
+            'medical_expert')
+        chunk_size = options['chunk_size']
+        last_pk = None
+        total = 0
+        while True:
+            chunk = documents if last_pk is None else \
+                documents.filter(medical_expert__gt=last_pk)
+            rows = list(chunk.values('medical_expert', *fields)[:chunk_size])
+            if not rows:
+                break
+            last_pk = rows[-1]['medical_expert']
+            similar = resource.find_similar_matches(
+                [dict((field, row[field]) for field in fields)
+                 for row in rows])
+            pairs = []
+            for row, matches in zip(rows, similar):
+                # each pair is found from both sides, report it once
+                pairs.extend((row['medical_expert'], medical_expert, score)
+                             for medical_expert, score in matches
+                             if medical_expert > row['medical_expert'])
+            oids = dict(MedicalExpert.objects.filter(
+                pk__in=set(pk for pair in pairs for pk in pair[:2])).
+                values_list('pk', 'oid'))
+            for medical_expert, duplicate, score in pairs:
+                self.stdout.write('%s\t%s\t%.2f' % (
+                    oids[medical_expert], oids[duplicate], score))
+            total += len(pairs)
+        self.stdout.write('%d likely duplicates' % total)
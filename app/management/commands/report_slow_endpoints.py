@@ -0,0 +1,70 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app_helpers.instrumentation import QUERIES_BUCKETS, TIME_BUCKETS, \
+                                        get_flushed_histograms, get_percentile
+
+
+class Command(BaseCommand):
+    help = 'Report the views with the most queries, database or ' \
+           'serializer time or duplicate queries, from the histograms ' \
+           'flushed by the QueryInstrumentationMiddleware of the running ' \
+           'processes'
+
+    sort_keys = {
+        'time': lambda histogram: histogram['total_ms'] /
+        histogram['requests'],
+        'db': lambda histogram: histogram['db_ms'] / histogram['requests'],
+        'serializer': lambda histogram: histogram['serializer_ms'] /
+        histogram['requests'],
+        'queries': lambda histogram: float(histogram['queries']) /
+        histogram['requests'],
+        'duplicates': lambda histogram: float(histogram['duplicates']) /
+        histogram['requests'],
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sort', choices=sorted(self.sort_keys),
+                            default='time',
+                            help='Average per request to sort the views by')
+        parser.add_argument('--limit', type=int, default=10,
+                            help='Number of views reported')
+
+    def handle(self, *args, **options):
+        histograms = get_flushed_histograms(settings.INSTRUMENTATION_CACHE)
+        if not histograms:
+            self.stdout.write('No requests recorded')
+            return
+        sort_key = self.sort_keys[options['sort']]
+        view_names = sorted(histograms, reverse=True,
+                            key=lambda view_name: sort_key(
+                                histograms[view_name]))
+        for view_name in view_names[:options['limit']]:
+            histogram = histograms[view_name]
+            requests = histogram['requests']
+            self.stdout.write(
+                '%s: %d requests, %.1f ms avg (p50 %s, p95 %s), db %.1f ms '
+                'avg, serializer %.1f ms avg, %.1f queries avg (p95 %s, max '
+                '%d), %.1f duplicates avg' % (
+                    view_name, requests, histogram['total_ms'] / requests,
+                    self.format_bound(TIME_BUCKETS, histogram['time_buckets'],
+                                      50, 'ms'),
+                    self.format_bound(TIME_BUCKETS, histogram['time_buckets'],
+                                      95, 'ms'),
+                    histogram['db_ms'] / requests,
+                    histogram['serializer_ms'] / requests,
+                    float(histogram['queries']) / requests,
+                    self.format_bound(QUERIES_BUCKETS,
+                                      histogram['queries_buckets'], 95, ''),
+                    histogram['max_queries'],
+                    float(histogram['duplicates']) / requests))
+            fingerprints = sorted(histogram['fingerprints'].items(),
+                                  key=lambda item: -item[1])
+            for fingerprint, count in fingerprints[:3]:
+                self.stdout.write('    %dx %s' % (count, fingerprint[:200]))
+
+    def format_bound(self, buckets, counts, percentile, unit):
+        bound = get_percentile(buckets, counts, percentile)
+        if bound is None:
+            return '> %d%s' % (buckets[-1], unit)
+        return '<= %d%s' % (bound, unit)
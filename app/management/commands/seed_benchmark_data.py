@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from app.seed import BenchmarkDataSeeder
+
+
+class Command(BaseCommand):
+    help = 'Insert synthetic medical experts, institutions, clinical ' \
+           'trials, interventions, publications and events linked through ' \
+           'all the relation tables, for benchmarks. Do not run it on a ' \
+           'production database'
+
+    volumes = (
+        ('medical_experts', 1000),
+        ('institutions', 200),
+        ('clinical_trials', 500),
+        ('interventions', 200),
+        ('publications', 2000),
+        ('events', 300),
+    )
+
+    def add_arguments(self, parser):
+        for name, default in self.volumes:
+            parser.add_argument('--%s' % name.replace('_', '-'), type=int,
+                                default=default,
+                                help='Number of %s inserted' %
+                                     name.replace('_', ' '))
+        parser.add_argument('--alpha', type=float, default=1.5,
+                            help='Shape of the Pareto distribution of the '
+                                 'number of links per object, the lower the '
+                                 'more skewed')
+        parser.add_argument('--mean-degree', type=float, default=5,
+                            help='Average number of links per object and '
+                                 'relation')
+        parser.add_argument('--max-degree', type=int, default=200,
+                            help='Maximum number of links per object and '
+                                 'relation')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Seed of the random generator')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Number of rows inserted at a time')
+
+    def handle(self, *args, **options):
+        seeder = BenchmarkDataSeeder(
+            dict((name, options[name]) for name, default in self.volumes),
+            alpha=options['alpha'], mean_degree=options['mean_degree'],
+            max_degree=options['max_degree'],
+            seed=options['seed'], batch_size=options['batch_size'],
+            log=self.stdout.write)
+        seeder.seed()
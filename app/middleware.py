@@ -0,0 +1,123 @@
+import logging
+import time
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+from app_helpers.db_connections import check_connections, flush_stats
+from app_helpers.instrumentation import RequestStats, ViewHistograms, \
+                                        flush_histograms
+from app_helpers.routers import replica_reads
+from counters import deferred_counters
+
+logger = logging.getLogger(__name__)
+
+
+class DeferredCountersMiddleware(object):
+    """
+    Recompute the number_linked_* counters marked as dirty during a request
+    once, when the view has returned
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with deferred_counters():
+            return self.get_response(request)
+
+
+class QueryInstrumentationMiddleware(object):
+    """
+    Record the queries of each request and send their number and time in the
+    X-Query-Count, X-Duplicate-Query-Count and Server-Timing headers, with
+    the time of the serializers of the view, see TimedSerializer. The
+    requests are added to the rolling histograms of their view, flushed to
+    the INSTRUMENTATION_CACHE every INSTRUMENTATION_FLUSH_INTERVAL seconds
+    for the report_slow_endpoints command
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.histograms = ViewHistograms(settings.INSTRUMENTATION_WINDOW)
+        self.flushed_on = time.time()
+
+    def __call__(self, request):
+        start = time.time()
+        with RequestStats() as stats:
+            response = self.get_response(request)
+        total_time = time.time() - start
+
+        response['X-Query-Count'] = str(stats.queries)
+        response['X-Duplicate-Query-Count'] = str(stats.duplicates)
+        # app is the time spent outside of the database and the serializers
+        response['Server-Timing'] = \
+            'db;dur=%.1f;desc="%d queries", serializer;dur=%.1f, ' \
+            'app;dur=%.1f, total;dur=%.1f' % (
+                stats.db_time * 1000, stats.queries,
+                stats.serializer_time * 1000,
+                (total_time - stats.db_time - stats.serializer_time) * 1000,
+                total_time * 1000)
+
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is not None:
+            self.histograms.add(resolver_match.view_name, total_time, stats)
+        if time.time() - self.flushed_on > \
+                settings.INSTRUMENTATION_FLUSH_INTERVAL:
+            self.flushed_on = time.time()
+            try:
+                flush_histograms(self.histograms,
+                                 settings.INSTRUMENTATION_CACHE)
+            except Exception:
+                logger.exception('Failed to flush the query histograms')
+        return response
+
+
+class ConnectionHealthMiddleware(object):
+    """
+    Check the persistent database connections before each request, see
+    app_helpers.db_connections. Their stats are flushed to the
+    INSTRUMENTATION_CACHE every INSTRUMENTATION_FLUSH_INTERVAL seconds for
+    the report_db_connections command
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.flushed_on = time.time()
+
+    def __call__(self, request):
+        check_connections()
+        response = self.get_response(request)
+        if time.time() - self.flushed_on > \
+                settings.INSTRUMENTATION_FLUSH_INTERVAL:
+            self.flushed_on = time.time()
+            try:
+                flush_stats(settings.INSTRUMENTATION_CACHE)
+            except Exception:
+                logger.exception('Failed to flush the connection stats')
+        return response
+
+
+class ReplicaRoutingMiddleware(object):
+    """
+    Route the reads of the GET requests of the api app to a replica, see
+    app_helpers.routers
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        enabled = self.is_read_only(request)
+        user_pk = request.user.pk if enabled else None
+        with replica_reads(enabled, user_pk):
+            return self.get_response(request)
+
+    def is_read_only(self, request):
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        return match.func.__module__ == 'api.views'
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2026-10-18 08:21
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+SEGMENTS = (
+    ('investigators', 'number_linked_clinical_trials'),
+    ('speakers', 'number_linked_events'),
+)
+
+DIMENSIONS = (
+    ('country', 'country', 'country__name'),
+    ('profession', 'profession', 'profession__name'),
+    ('specialty', 'specialties', 'specialties__name'),
+)
+
+
+def backfill_rollups(apps, schema_editor):
+    """
+    Compute the rollups of the existing medical experts, as
+    MedicalExpertRollup.objects.rebuild at the time of this migration
+    """
+    MedicalExpert = apps.get_model('app', 'MedicalExpert')
+    MedicalExpertRollup = apps.get_model('app', 'MedicalExpertRollup')
+    rollups = []
+    for segment, counter_field in SEGMENTS:
+        medical_experts = MedicalExpert.objects.filter(
+            **{'%s__gt' % counter_field: 0})
+        for dimension, field, name_field in DIMENSIONS:
+            rows = medical_experts.exclude(**{field: None}). \
+                values(name_field).annotate(total=Count(name_field)). \
+                order_by()
+            rollups.extend(
+                MedicalExpertRollup(segment=segment, dimension=dimension,
+                                    name=row[name_field], total=row['total'])
+                for row in rows)
+    MedicalExpertRollup.objects.bulk_create(rollups, batch_size=100)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0003_auto_20180105_0548'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicalExpertRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('segment', models.CharField(choices=[('investigators', 'Investigators'), ('speakers', 'Speakers')], max_length=20)),
+                ('dimension', models.CharField(choices=[('country', 'Country'), ('profession', 'Profession'), ('specialty', 'Specialty')], max_length=20)),
+                ('name', models.CharField(max_length=255)),
+                ('total', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='medicalexpertrollup',
+            unique_together=set([('segment', 'dimension', 'name')]),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
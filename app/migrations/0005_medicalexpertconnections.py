@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2026-10-18 08:25
+from __future__ import unicode_literals
+
+from collections import defaultdict
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+PHYSICIAN_SUBTYPES = ['Hospital', 'Hospital Department', 'Medical Practice']
+PHYSICIAN_POSITIONS = ['Role Physician', 'Head of']
+
+
+def get_physician_links(links):
+    return links.filter(
+        institution__institution_subtype__name__in=PHYSICIAN_SUBTYPES,
+        position__name__in=PHYSICIAN_POSITIONS)
+
+
+def get_researcher_links(links):
+    return links.exclude(institution__institution_subtype=None). \
+        exclude(position=None). \
+        exclude(institution__institution_subtype__name__in=PHYSICIAN_SUBTYPES,
+                position__name__in=PHYSICIAN_POSITIONS)
+
+
+# (connection model, relation model, relation field, source links)
+CONNECTIONS = (
+    ('MedicalExpertConnectionAuthor', 'MedicalExpertPublication',
+     'publication', None),
+    ('MedicalExpertConnectionEventParticipant', 'MedicalExpertEvent',
+     'event', None),
+    ('MedicalExpertConnectionPhysician', 'MedicalExpertInstitution',
+     'institution', get_physician_links),
+    ('MedicalExpertConnectionResearcher', 'MedicalExpertInstitution',
+     'institution', get_researcher_links),
+    ('MedicalExpertConnectionCTCollaborator', 'MedicalExpertClinicalTrial',
+     'clinical_trial', None),
+)
+
+
+def backfill_connections(apps, schema_editor, batch_size=500):
+    """
+    Compute the connections of the existing medical experts, as
+    MedicalExpertConnectionQuerySet.rebuild at the time of this migration
+    """
+    for connection_name, relation_name, field, get_source_links in \
+            CONNECTIONS:
+        connection_model = apps.get_model('app', connection_name)
+        links = apps.get_model('app', relation_name).objects. \
+            exclude(**{field: None}).exclude(medical_expert=None)
+        source_links = get_source_links(links) if get_source_links \
+            else links
+
+        objects_medical_experts = defaultdict(set)
+        for obj, medical_expert in \
+                links.values_list(field, 'medical_expert').distinct():
+            objects_medical_experts[obj].add(medical_expert)
+        medical_experts_objects = defaultdict(set)
+        for obj, medical_expert in \
+                source_links.values_list(field, 'medical_expert').distinct():
+            medical_experts_objects[medical_expert].add(obj)
+
+        connections = []
+        for medical_expert in sorted(medical_experts_objects):
+            connected_medical_experts = set()
+            for obj in medical_experts_objects[medical_expert]:
+                connected_medical_experts |= objects_medical_experts[obj]
+            connected_medical_experts.discard(medical_expert)
+            connections.extend(
+                connection_model(medical_expert_id=medical_expert,
+                                 connected_medical_expert_id=connected)
+                for connected in sorted(connected_medical_experts))
+            if len(connections) >= batch_size:
+                connection_model.objects.bulk_create(connections,
+                                                     batch_size=batch_size)
+                connections = []
+        connection_model.objects.bulk_create(connections,
+                                             batch_size=batch_size)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_medicalexpertrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicalExpertConnectionAuthor',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('connected_medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='app_medicalexpertconnectionauthor_related', to='app.MedicalExpert')),
+                ('medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.MedicalExpert')),
+            ],
+            options={
+                'abstract': False,
+                'verbose_name': 'Medical Expert - Connection (Author)',
+                'verbose_name_plural': 'Medical Experts - Connections (Authors)',
+            },
+        ),
+        migrations.CreateModel(
+            name='MedicalExpertConnectionCTCollaborator',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('connected_medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='app_medicalexpertconnectionctcollaborator_related', to='app.MedicalExpert')),
+                ('medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.MedicalExpert')),
+            ],
+            options={
+                'abstract': False,
+                'verbose_name': 'Medical Expert - Connection (CT Collaborator)',
+                'verbose_name_plural': 'Medical Experts - Connections (CT Collaborators)',
+            },
+        ),
+        migrations.CreateModel(
+            name='MedicalExpertConnectionEventParticipant',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('connected_medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='app_medicalexpertconnectioneventparticipant_related', to='app.MedicalExpert')),
+                ('medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.MedicalExpert')),
+            ],
+            options={
+                'abstract': False,
+                'verbose_name': 'Medical Expert - Connection (Event Participant)',
+                'verbose_name_plural': 'Medical Experts - Connections (Event Participants)',
+            },
+        ),
+        migrations.CreateModel(
+            name='MedicalExpertConnectionPhysician',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('connected_medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='app_medicalexpertconnectionphysician_related', to='app.MedicalExpert')),
+                ('medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.MedicalExpert')),
+            ],
+            options={
+                'abstract': False,
+                'verbose_name': 'Medical Expert - Connection (Physician)',
+                'verbose_name_plural': 'Medical Experts - Connections (Physicians)',
+            },
+        ),
+        migrations.CreateModel(
+            name='MedicalExpertConnectionResearcher',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('connected_medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='app_medicalexpertconnectionresearcher_related', to='app.MedicalExpert')),
+                ('medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='app.MedicalExpert')),
+            ],
+            options={
+                'abstract': False,
+                'verbose_name': 'Medical Expert - Connection (Researcher)',
+                'verbose_name_plural': 'Medical Experts - Connections (Researchers)',
+            },
+        ),
+        migrations.AlterUniqueTogether(
+            name='medicalexpertconnectionresearcher',
+            unique_together=set([('medical_expert', 'connected_medical_expert')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='medicalexpertconnectionphysician',
+            unique_together=set([('medical_expert', 'connected_medical_expert')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='medicalexpertconnectioneventparticipant',
+            unique_together=set([('medical_expert', 'connected_medical_expert')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='medicalexpertconnectionctcollaborator',
+            unique_together=set([('medical_expert', 'connected_medical_expert')]),
+        ),
+        migrations.AlterUniqueTogether(
+            name='medicalexpertconnectionauthor',
+            unique_together=set([('medical_expert', 'connected_medical_expert')]),
+        ),
+        migrations.RunPython(backfill_connections, migrations.RunPython.noop),
+    ]
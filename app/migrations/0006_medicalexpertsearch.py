@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2026-10-18 08:38
+from __future__ import unicode_literals
+
+import unicodedata
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils.encoding import force_text
+
+
+DOCUMENT_FIELDS = ('first_name', 'middle_name', 'last_name', 'city',
+                   'country', 'therapeutic_areas', 'specialties')
+
+
+def normalize_search_text(text):
+    text = unicodedata.normalize('NFKD', force_text(text or ''))
+    text = u''.join(char for char in text if not unicodedata.combining(char))
+    return u' '.join(text.lower().split())
+
+
+def get_trigrams(text):
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def backfill_search_index(apps, schema_editor, chunk_size=500):
+    """
+    Index the existing medical experts, as
+    MedicalExpertSearchDocument.objects.rebuild at the time of this
+    migration
+    """
+    MedicalExpert = apps.get_model('app', 'MedicalExpert')
+    MedicalExpertSearchDocument = apps.get_model(
+        'app', 'MedicalExpertSearchDocument')
+    MedicalExpertSearchTrigram = apps.get_model(
+        'app', 'MedicalExpertSearchTrigram')
+    medical_experts = list(MedicalExpert.objects.order_by('pk').
+                           values_list('pk', flat=True))
+    for i in range(0, len(medical_experts), chunk_size):
+        documents = []
+        for medical_expert in MedicalExpert.objects. \
+                filter(pk__in=medical_experts[i:i + chunk_size]). \
+                select_related('country'). \
+                prefetch_related('therapeutic_areas', 'specialties'):
+            document = MedicalExpertSearchDocument(
+                medical_expert_id=medical_expert.pk,
+                first_name=normalize_search_text(medical_expert.first_name),
+                middle_name=normalize_search_text(
+                    medical_expert.middle_name),
+                last_name=normalize_search_text(medical_expert.last_name),
+                city=normalize_search_text(medical_expert.city),
+                country=normalize_search_text(
+                    medical_expert.country.name
+                    if medical_expert.country else None),
+                therapeutic_areas=normalize_search_text(u' '.join(
+                    therapeutic_area.name for therapeutic_area in
+                    medical_expert.therapeutic_areas.all())),
+                specialties=normalize_search_text(u' '.join(
+                    specialty.name for specialty in
+                    medical_expert.specialties.all())))
+            document.document = u' '.join(
+                getattr(document, field) for field in DOCUMENT_FIELDS
+                if getattr(document, field))
+            documents.append(document)
+        MedicalExpertSearchDocument.objects.bulk_create(documents,
+                                                        batch_size=100)
+        MedicalExpertSearchTrigram.objects.bulk_create([
+            MedicalExpertSearchTrigram(
+                medical_expert_id=indexed_document.medical_expert_id,
+                trigram=trigram)
+            for indexed_document in documents
+            for trigram in get_trigrams(indexed_document.document)],
+            batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_medicalexpertconnections'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicalExpertSearchDocument',
+            fields=[
+                ('medical_expert', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='app.MedicalExpert')),
+                ('first_name', models.TextField(blank=True)),
+                ('middle_name', models.TextField(blank=True)),
+                ('last_name', models.TextField(blank=True)),
+                ('city', models.TextField(blank=True)),
+                ('country', models.TextField(blank=True)),
+                ('therapeutic_areas', models.TextField(blank=True)),
+                ('specialties', models.TextField(blank=True)),
+                ('document', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MedicalExpertSearchTrigram',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.MedicalExpert')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='medicalexpertsearchtrigram',
+            index_together=set([('trigram', 'medical_expert')]),
+        ),
+        migrations.RunPython(backfill_search_index,
+                             migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2026-10-18 09:36
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_medicalexpertsearch'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='clinicaltrialinstitution',
+            index_together=set([('institution', 'clinical_trial'), ('clinical_trial', 'relationship_type', 'institution')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='clinicaltrialintervention',
+            index_together=set([('clinical_trial', 'intervention')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='medicalexpert',
+            index_together=set([('number_linked_clinical_trials', 'id'), ('number_linked_events', 'id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='medicalexpertclinicaltrial',
+            index_together=set([('medical_expert', 'clinical_trial'), ('clinical_trial', 'medical_expert')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='medicalexpertevent',
+            index_together=set([('event', 'medical_expert'), ('medical_expert', 'event')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='medicalexpertinstitution',
+            index_together=set([('institution', 'medical_expert'), ('medical_expert', 'institution')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='medicalexpertinstitutioncoi',
+            index_together=set([('institution', 'medical_expert'), ('medical_expert', 'year')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='medicalexpertpublication',
+            index_together=set([('publication', 'medical_expert'), ('medical_expert', 'publication')]),
+        ),
+    ]
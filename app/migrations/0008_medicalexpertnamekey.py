@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2026-10-18 10:29
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def get_name_keys(name):
+    if len(name) < 3:
+        return set([name]) if name else set()
+    return set(name[i:i + 3] for i in range(len(name) - 2))
+
+
+def backfill_name_keys(apps, schema_editor):
+    """
+    Compute the name keys from the normalized last names of the search
+    documents
+    """
+    MedicalExpertSearchDocument = apps.get_model(
+        'app', 'MedicalExpertSearchDocument')
+    MedicalExpertNameKey = apps.get_model('app', 'MedicalExpertNameKey')
+    name_keys = []
+    for medical_expert, last_name in MedicalExpertSearchDocument.objects. \
+            order_by('medical_expert'). \
+            values_list('medical_expert', 'last_name').iterator():
+        name_keys.extend(
+            MedicalExpertNameKey(medical_expert_id=medical_expert, key=key)
+            for key in get_name_keys(last_name))
+        if len(name_keys) >= 500:
+            MedicalExpertNameKey.objects.bulk_create(name_keys,
+                                                     batch_size=500)
+            name_keys = []
+    MedicalExpertNameKey.objects.bulk_create(name_keys, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_relations_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicalExpertNameKey',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=3)),
+                ('medical_expert', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app.MedicalExpert')),
+            ],
+        ),
+        migrations.AlterIndexTogether(
+            name='medicalexpertnamekey',
+            index_together=set([('key', 'medical_expert')]),
+        ),
+        migrations.RunPython(backfill_name_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2026-10-18 16:02
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models.functions import Length
+
+
+SOUNDEX_CODES = dict(
+    (letter, code) for letters, code in (
+        ('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'),
+        ('mn', '5'), ('r', '6'))
+    for letter in letters)
+
+
+def get_phonetic_key(name):
+    letters = [letter for letter in name if u'a' <= letter <= u'z']
+    if not letters:
+        return None
+    code = letters[0].upper()
+    last = SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter)
+        if digit and digit != last:
+            code += digit
+        if letter not in u'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+def backfill_phonetic_keys(apps, schema_editor):
+    """
+    Compute the phonetic keys from the normalized last names of the search
+    documents
+    """
+    MedicalExpertSearchDocument = apps.get_model(
+        'app', 'MedicalExpertSearchDocument')
+    MedicalExpertNameKey = apps.get_model('app', 'MedicalExpertNameKey')
+    name_keys = []
+    for medical_expert, last_name in MedicalExpertSearchDocument.objects. \
+            order_by('medical_expert'). \
+            values_list('medical_expert', 'last_name').iterator():
+        key = get_phonetic_key(last_name)
+        if key:
+            name_keys.append(MedicalExpertNameKey(
+                medical_expert_id=medical_expert, key=key))
+        if len(name_keys) >= 500:
+            MedicalExpertNameKey.objects.bulk_create(name_keys,
+                                                     batch_size=500)
+            name_keys = []
+    MedicalExpertNameKey.objects.bulk_create(name_keys, batch_size=500)
+
+
+def delete_phonetic_keys(apps, schema_editor):
+    MedicalExpertNameKey = apps.get_model('app', 'MedicalExpertNameKey')
+    MedicalExpertNameKey.objects.annotate(length=Length('key')). \
+        filter(length=4).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_medicalexpertnamekey'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='medicalexpertnamekey',
+            name='key',
+            field=models.CharField(max_length=4),
+        ),
+        migrations.RunPython(backfill_phonetic_keys, delete_phonetic_keys),
+    ]
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.10 on 2026-10-18 17:40
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+# the many to many fields whose tables lost their indexes when SQLite
+# rebuilt them in 0003_auto_20180105_0548
+MANY_TO_MANY_FIELDS = (
+    ('ClinicalTrial', 'condition'),
+    ('ClinicalTrial', 'study_phases'),
+    ('ClinicalTrial', 'therapeutic_area'),
+    ('Intervention', 'drug_class'),
+)
+
+
+def create_many_to_many_indexes(apps, schema_editor):
+    """
+    Create the unique index of the links and the index of the related
+    column of the many to many tables, when the table has none leading with
+    their columns
+    """
+    connection = schema_editor.connection
+    quote_name = schema_editor.quote_name
+    for model_name, field_name in MANY_TO_MANY_FIELDS:
+        field = apps.get_model('app', model_name)._meta.get_field(field_name)
+        table = field.remote_field.through._meta.db_table
+        columns = [field.m2m_column_name(), field.m2m_reverse_name()]
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, table).values()
+        leading_columns = set(
+            constraint['columns'][0] for constraint in constraints
+            if constraint['columns'] and
+            (constraint['index'] or constraint['unique']))
+        if columns[0] not in leading_columns:
+            schema_editor.execute('CREATE UNIQUE INDEX %s ON %s (%s, %s)' % (
+                quote_name('%s_%s_uniq' % (table, columns[0])),
+                quote_name(table), quote_name(columns[0]),
+                quote_name(columns[1])))
+        if columns[1] not in leading_columns:
+            schema_editor.execute('CREATE INDEX %s ON %s (%s)' % (
+                quote_name('%s_%s_idx' % (table, columns[1])),
+                quote_name(table), quote_name(columns[1])))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_medicalexpertnamekey_phonetic'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_many_to_many_indexes,
+                             migrations.RunPython.noop),
+    ]
@@ -1,6 +1,16 @@
 from __future__ import unicode_literals
-from django.db import models
+import math
+import unicodedata
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from django.db import models, transaction
+from django.db.models import Count, F
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+                                     pre_save
+from django.dispatch import receiver
+from django.utils.encoding import force_text
 from app_helpers import models as helper_models
+from app_helpers.cache import bump_table_generations
 from datetime import datetime
 
 
@@ -480,9 +490,56 @@ class MedicalExpertAbstract(helper_models.OIDModel):
                    'specialties', 'city', 'country')
 
 
+class MedicalExpertQuerySet(models.QuerySet):
+    def delete(self, *args, **kwargs):
+        # remove the deleted medical experts from the rollups
+        totals = MedicalExpertRollup.objects.compute_totals(self)
+        deleted = super(MedicalExpertQuerySet, self).delete(*args, **kwargs)
+        MedicalExpertRollup.objects.apply_deltas(
+            dict((key, -total) for key, total in totals.items()))
+        return deleted
+
+
 class MedicalExpert(MedicalExpertAbstract):
+    objects = MedicalExpertQuerySet.as_manager()
+
     class Meta:
         ordering = ('first_name', 'last_name')
+        # the investigators and speakers lists filter on the counters and
+        # page on the id
+        index_together = (('number_linked_clinical_trials', 'id'),
+                          ('number_linked_events', 'id'))
+
+    rollup_fields = ('country', 'profession', 'number_linked_clinical_trials',
+                     'number_linked_events')
+    search_fields = ('first_name', 'middle_name', 'last_name', 'city',
+                     'country')
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        update_rollups = update_fields is None or \
+            bool(set(update_fields) & set(self.rollup_fields))
+        old_rollup_state = None
+        if update_rollups and self.pk:
+            old_rollup_state = MedicalExpert.objects.filter(pk=self.pk). \
+                values_list('number_linked_clinical_trials',
+                            'number_linked_events', 'country',
+                            'profession').first()
+        super(MedicalExpert, self).save(*args, **kwargs)
+        if update_rollups:
+            MedicalExpertRollup.objects.update_medical_expert(
+                self, old_rollup_state)
+        if update_fields is None or \
+           set(update_fields) & set(self.search_fields):
+            MedicalExpertSearchDocument.objects.refresh([self.pk])
+
+    def delete(self, *args, **kwargs):
+        totals = MedicalExpertRollup.objects.compute_totals(
+            MedicalExpert.objects.filter(pk=self.pk))
+        deleted = super(MedicalExpert, self).delete(*args, **kwargs)
+        MedicalExpertRollup.objects.apply_deltas(
+            dict((key, -total) for key, total in totals.items()))
+        return deleted
 
     def __unicode__(self):
         if self.middle_name:
@@ -603,6 +660,631 @@ class MedicalExpert(MedicalExpertAbstract):
         return False
 
 
+class MedicalExpertRollupQuerySet(models.QuerySet):
+    def compute_totals(self, medical_experts):
+        """
+        Return the number of MEDICAL_EXPERTS per (segment, dimension, name)
+        """
+        totals = Counter()
+        for segment, counter_field in MedicalExpertRollup.SEGMENTS:
+            segment_medical_experts = medical_experts.filter(
+                **{'%s__gt' % counter_field: 0})
+            for dimension, field, name_field in MedicalExpertRollup.DIMENSIONS:
+                rows = segment_medical_experts.exclude(**{field: None}). \
+                    values(name_field).annotate(total=Count(name_field)). \
+                    order_by()
+                for row in rows:
+                    totals[(segment, dimension, row[name_field])] += \
+                        row['total']
+        return totals
+
+    def apply_deltas(self, deltas):
+        for (segment, dimension, name), delta in deltas.items():
+            if not delta:
+                continue
+            updated = self.filter(segment=segment, dimension=dimension,
+                                  name=name). \
+                update(total=F('total') + delta)
+            if not updated and delta > 0:
+                rollup, created = self.get_or_create(
+                    segment=segment, dimension=dimension, name=name)
+                self.filter(pk=rollup.pk).update(total=F('total') + delta)
+
+    def update_medical_expert(self, medical_expert, old_rollup_state):
+        """
+        Move MEDICAL_EXPERT between the rollups after it was saved.
+        OLD_ROLLUP_STATE is the (number_linked_clinical_trials,
+        number_linked_events, country, profession) tuple stored before the
+        save, or None for a new medical expert
+        """
+        old_segments = set()
+        old_country = old_profession = None
+        if old_rollup_state:
+            old_segments = MedicalExpertRollup.get_segments(
+                *old_rollup_state[:2])
+            old_country, old_profession = old_rollup_state[2:]
+        new_segments = MedicalExpertRollup.get_segments(
+            medical_expert.number_linked_clinical_trials,
+            medical_expert.number_linked_events)
+        new_country = medical_expert.country_id
+        new_profession = medical_expert.profession_id
+        if (old_segments, old_country, old_profession) == \
+           (new_segments, new_country, new_profession):
+            return
+
+        countries = dict(helper_models.Country.objects.filter(
+            pk__in=[pk for pk in (old_country, new_country) if pk]).
+            values_list('pk', 'name'))
+        professions = dict(helper_models.Profession.objects.filter(
+            pk__in=[pk for pk in (old_profession, new_profession) if pk]).
+            values_list('pk', 'name'))
+        specialties = []
+        if old_segments != new_segments and old_rollup_state:
+            specialties = list(medical_expert.specialties.
+                               values_list('name', flat=True))
+
+        deltas = Counter()
+        for segments, country, profession, delta in (
+                (old_segments, old_country, old_profession, -1),
+                (new_segments, new_country, new_profession, 1)):
+            for segment in segments:
+                if country:
+                    deltas[(segment, MedicalExpertRollup.DIMENSION_COUNTRY,
+                            countries[country])] += delta
+                if profession:
+                    deltas[(segment,
+                            MedicalExpertRollup.DIMENSION_PROFESSION,
+                            professions[profession])] += delta
+                for specialty in specialties:
+                    deltas[(segment, MedicalExpertRollup.DIMENSION_SPECIALTY,
+                            specialty)] += delta
+        self.apply_deltas(deltas)
+
+    def rename(self, dimension, old_name, new_name):
+        """
+        Move the totals of the DIMENSION rollups of OLD_NAME to NEW_NAME
+        """
+        rollups = self.filter(dimension=dimension, name=old_name)
+        deltas = dict(((segment, dimension, new_name), total)
+                      for segment, total in
+                      rollups.values_list('segment', 'total'))
+        with transaction.atomic():
+            rollups.delete()
+            self.apply_deltas(deltas)
+
+    def rebuild(self):
+        totals = self.compute_totals(MedicalExpert.objects.all())
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create([
+                MedicalExpertRollup(segment=segment, dimension=dimension,
+                                    name=name, total=total)
+                for (segment, dimension, name), total in totals.items()])
+        return len(totals)
+
+    def totals(self, segment, dimension):
+        """
+        Return the medical experts totals of SEGMENT per DIMENSION, in the
+        format of the former GROUP BY queries
+        """
+        name_field = dict((dimension, name_field) for dimension, field,
+                          name_field in MedicalExpertRollup.DIMENSIONS)[
+                              dimension]
+        rollups = self.filter(segment=segment, dimension=dimension,
+                              total__gt=0). \
+            values_list('name', 'total').order_by('total', 'name')
+        return [{name_field: name, 'total': total}
+                for name, total in rollups]
+
+
+class MedicalExpertRollup(models.Model):
+    """
+    Number of investigators and speakers per country, profession and
+    specialty, maintained when the medical experts change
+    """
+    SEGMENT_INVESTIGATORS = 'investigators'
+    SEGMENT_SPEAKERS = 'speakers'
+
+    SEGMENT_CHOICES = (
+        (SEGMENT_INVESTIGATORS, 'Investigators'),
+        (SEGMENT_SPEAKERS, 'Speakers'),
+    )
+
+    SEGMENTS = (
+        (SEGMENT_INVESTIGATORS, 'number_linked_clinical_trials'),
+        (SEGMENT_SPEAKERS, 'number_linked_events'),
+    )
+
+    DIMENSION_COUNTRY = 'country'
+    DIMENSION_PROFESSION = 'profession'
+    DIMENSION_SPECIALTY = 'specialty'
+
+    DIMENSION_CHOICES = (
+        (DIMENSION_COUNTRY, 'Country'),
+        (DIMENSION_PROFESSION, 'Profession'),
+        (DIMENSION_SPECIALTY, 'Specialty'),
+    )
+
+    DIMENSIONS = (
+        (DIMENSION_COUNTRY, 'country', 'country__name'),
+        (DIMENSION_PROFESSION, 'profession', 'profession__name'),
+        (DIMENSION_SPECIALTY, 'specialties', 'specialties__name'),
+    )
+
+    # the rollups are keyed by the name of these lookups
+    DIMENSION_MODELS = {
+        helper_models.Country: DIMENSION_COUNTRY,
+        helper_models.Profession: DIMENSION_PROFESSION,
+        helper_models.MedicalExpertise: DIMENSION_SPECIALTY,
+    }
+
+    segment = models.CharField(max_length=20, choices=SEGMENT_CHOICES)
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    name = models.CharField(max_length=255)
+    total = models.IntegerField(default=0)
+
+    objects = MedicalExpertRollupQuerySet.as_manager()
+
+    class Meta:
+        unique_together = (('segment', 'dimension', 'name'),)
+
+    def __unicode__(self):
+        return u'%s - %s - %s' % (self.segment, self.dimension, self.name)
+
+    @classmethod
+    def get_segments(cls, number_linked_clinical_trials,
+                     number_linked_events):
+        segments = set()
+        if number_linked_clinical_trials > 0:
+            segments.add(cls.SEGMENT_INVESTIGATORS)
+        if number_linked_events > 0:
+            segments.add(cls.SEGMENT_SPEAKERS)
+        return segments
+
+
+@receiver(m2m_changed, sender=MedicalExpert.specialties.through)
+def update_medical_expert_rollup_specialties(sender, instance, action,
+                                             reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    links = sender.objects.all()
+    if reverse:
+        links = links.filter(medicalexpertise=instance.pk)
+        if pk_set is not None:
+            links = links.filter(medicalexpert__in=pk_set)
+    else:
+        links = links.filter(medicalexpert=instance.pk)
+        if pk_set is not None:
+            links = links.filter(medicalexpertise__in=pk_set)
+    delta = 1 if action == 'post_add' else -1
+    deltas = Counter()
+    for number_linked_clinical_trials, number_linked_events, specialty in \
+            links.values_list('medicalexpert__number_linked_clinical_trials',
+                              'medicalexpert__number_linked_events',
+                              'medicalexpertise__name'):
+        for segment in MedicalExpertRollup.get_segments(
+                number_linked_clinical_trials, number_linked_events):
+            deltas[(segment, MedicalExpertRollup.DIMENSION_SPECIALTY,
+                    specialty)] += delta
+    MedicalExpertRollup.objects.apply_deltas(deltas)
+
+
+@receiver(pre_save, sender=helper_models.Country)
+@receiver(pre_save, sender=helper_models.Profession)
+@receiver(pre_save, sender=helper_models.MedicalExpertise)
+def remember_medical_expert_rollup_name(sender, instance, **kwargs):
+    instance._rollup_name = None
+    if instance.pk:
+        instance._rollup_name = sender.objects.filter(pk=instance.pk). \
+            values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=helper_models.Country)
+@receiver(post_save, sender=helper_models.Profession)
+@receiver(post_save, sender=helper_models.MedicalExpertise)
+def rename_medical_expert_rollups(sender, instance, **kwargs):
+    old_name = getattr(instance, '_rollup_name', None)
+    if old_name is not None and old_name != instance.name:
+        MedicalExpertRollup.objects.rename(
+            MedicalExpertRollup.DIMENSION_MODELS[sender], old_name,
+            instance.name)
+
+
+@receiver(post_delete, sender=helper_models.Country)
+@receiver(post_delete, sender=helper_models.Profession)
+@receiver(post_delete, sender=helper_models.MedicalExpertise)
+def delete_medical_expert_rollups(sender, instance, **kwargs):
+    # the medical experts are unlinked without signals
+    MedicalExpertRollup.objects.filter(
+        dimension=MedicalExpertRollup.DIMENSION_MODELS[sender],
+        name=instance.name).delete()
+
+
+def normalize_search_text(text):
+    """
+    Return TEXT lowercased, without accents and with single spaces
+    """
+    text = unicodedata.normalize('NFKD', force_text(text or ''))
+    text = u''.join(char for char in text if not unicodedata.combining(char))
+    return u' '.join(text.lower().split())
+
+
+def get_trigrams(text):
+    return set(text[i:i + 3] for i in range(len(text) - 2))
+
+
+def get_name_keys(name):
+    """
+    Return the blocking keys of the normalized NAME: its trigrams, or the
+    name itself when it is shorter than a trigram
+    """
+    if len(name) < 3:
+        return set([name]) if name else set()
+    return get_trigrams(name)
+
+
+SOUNDEX_CODES = dict(
+    (letter, code) for letters, code in (
+        ('bfpv', '1'), ('cgjkqsxz', '2'), ('dt', '3'), ('l', '4'),
+        ('mn', '5'), ('r', '6'))
+    for letter in letters)
+
+
+def get_phonetic_key(name):
+    """
+    Return the Soundex code of the normalized NAME, the same for the names
+    differing by similar sounding letters such as 'meier' and 'meyer', or
+    None when it has no letter. The codes are uppercase and four characters
+    long, so they are stored with the name keys without matching a trigram
+    """
+    letters = [letter for letter in name if u'a' <= letter <= u'z']
+    if not letters:
+        return None
+    code = letters[0].upper()
+    last = SOUNDEX_CODES.get(letters[0])
+    for letter in letters[1:]:
+        digit = SOUNDEX_CODES.get(letter)
+        if digit and digit != last:
+            code += digit
+        # the same codes separated by h or w are coded once
+        if letter not in u'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+class MedicalExpertSearchDocumentQuerySet(models.QuerySet):
+    def build_documents(self, medical_experts):
+        documents = []
+        for medical_expert in medical_experts:
+            document = MedicalExpertSearchDocument(
+                medical_expert=medical_expert,
+                first_name=normalize_search_text(medical_expert.first_name),
+                middle_name=normalize_search_text(
+                    medical_expert.middle_name),
+                last_name=normalize_search_text(medical_expert.last_name),
+                city=normalize_search_text(medical_expert.city),
+                country=normalize_search_text(
+                    medical_expert.country.name
+                    if medical_expert.country else None),
+                therapeutic_areas=normalize_search_text(u' '.join(
+                    therapeutic_area.name for therapeutic_area in
+                    medical_expert.therapeutic_areas.all())),
+                specialties=normalize_search_text(u' '.join(
+                    specialty.name for specialty in
+                    medical_expert.specialties.all())))
+            document.document = u' '.join(
+                getattr(document, field) for field in
+                MedicalExpertSearchDocument.document_fields
+                if getattr(document, field))
+            documents.append(document)
+        return documents
+
+    def refresh(self, medical_experts, chunk_size=1000):
+        """
+        Rebuild the search documents and trigrams of MEDICAL_EXPERTS,
+        CHUNK_SIZE medical experts at a time
+        """
+        medical_experts = sorted(set(pk for pk in medical_experts if pk))
+        for i in range(0, len(medical_experts), chunk_size):
+            chunk = medical_experts[i:i + chunk_size]
+            documents = self.build_documents(
+                MedicalExpert.objects.filter(pk__in=chunk).
+                select_related('country').
+                prefetch_related('therapeutic_areas', 'specialties'))
+            with transaction.atomic():
+                self.filter(medical_expert__in=chunk).delete()
+                MedicalExpertSearchTrigram.objects. \
+                    filter(medical_expert__in=chunk).delete()
+                MedicalExpertNameKey.objects. \
+                    filter(medical_expert__in=chunk).delete()
+                self.bulk_create(documents)
+                MedicalExpertSearchTrigram.objects.bulk_create([
+                    MedicalExpertSearchTrigram(
+                        medical_expert_id=document.medical_expert_id,
+                        trigram=trigram)
+                    for document in documents
+                    for trigram in get_trigrams(document.document)],
+                    batch_size=chunk_size)
+                MedicalExpertNameKey.objects.bulk_create([
+                    MedicalExpertNameKey(
+                        medical_expert_id=document.medical_expert_id,
+                        key=key)
+                    for document in documents
+                    for key in get_name_keys(document.last_name) |
+                    set([get_phonetic_key(document.last_name)]) - set([None])],
+                    batch_size=chunk_size)
+
+    def rebuild(self, chunk_size=1000):
+        medical_experts = list(MedicalExpert.objects.order_by('pk').
+                               values_list('pk', flat=True))
+        self.refresh(medical_experts, chunk_size=chunk_size)
+        return len(medical_experts)
+
+    def search(self, text, field='document'):
+        """
+        Return the medical expert ids whose FIELD contains TEXT. The
+        documents are narrowed with the trigrams index first, except for
+        texts shorter than a trigram
+        """
+        text = normalize_search_text(text)
+        documents = self.filter(**{'%s__contains' % field: text})
+        trigrams = get_trigrams(text)
+        if trigrams:
+            candidates = MedicalExpertSearchTrigram.objects. \
+                filter(trigram__in=trigrams).values('medical_expert'). \
+                annotate(total=Count('trigram', distinct=True)). \
+                filter(total=len(trigrams)).order_by()
+            documents = documents.filter(
+                medical_expert__in=candidates.values('medical_expert'))
+        return documents.values('medical_expert')
+
+    def get_blocking_candidates(self, texts, threshold, chunk_size=1000,
+                                max_key_frequency=1000):
+        """
+        Return the {text: medical expert ids} whose last name shares enough
+        name keys with each of TEXTS, last names, to possibly be similar at
+        THRESHOLD, or sounds like it, querying the keys of all the TEXTS
+        together.
+
+        A last name sharing at least min_shared of the n keys of a text
+        has one of its n - min_shared + 1 rarest keys, so only the medical
+        experts having these are loaded. Keys of more than
+        MAX_KEY_FREQUENCY medical experts are skipped, except the rarest
+        one of a text, so that common trigrams do not load most of the table.
+        A substitution in a short name can change all its trigrams, as in
+        'meier' and 'meyer', so the last names having the phonetic key of a
+        text are candidates too, whatever their frequency
+        """
+        texts_keys = dict((text, get_name_keys(text)) for text in texts)
+        texts_phonetic_keys = dict(
+            (text, get_phonetic_key(text)) for text in texts)
+        all_keys = sorted(set().union(*texts_keys.values())) \
+            if texts_keys else []
+        frequencies = {}
+        for i in range(0, len(all_keys), chunk_size):
+            frequencies.update(
+                MedicalExpertNameKey.objects.
+                filter(key__in=all_keys[i:i + chunk_size]).
+                values_list('key').annotate(total=Count('medical_expert')).
+                order_by())
+
+        texts_min_shared = {}
+        texts_blocking_keys = {}
+        for text, keys in texts_keys.items():
+            # a single edit changes up to three trigrams, so similar names
+            # may share only a small part of them
+            min_shared = max(1, int(math.ceil(len(keys) * (1 - threshold))))
+            rarest_keys = [
+                key for key in sorted(keys, key=lambda key: (
+                    frequencies.get(key, 0), key))[:len(keys) - min_shared + 1]
+                if key in frequencies]
+            texts_min_shared[text] = min_shared
+            texts_blocking_keys[text] = [
+                key for key in rarest_keys
+                if frequencies[key] <= max_key_frequency] or rarest_keys[:1]
+
+        blocking_keys = sorted(
+            set().union(*texts_blocking_keys.values()) |
+            set(texts_phonetic_keys.values()) - set([None])) \
+            if texts_blocking_keys else []
+        keys_medical_experts = defaultdict(set)
+        for i in range(0, len(blocking_keys), chunk_size):
+            for medical_expert, key in MedicalExpertNameKey.objects. \
+                    filter(key__in=blocking_keys[i:i + chunk_size]). \
+                    values_list('medical_expert', 'key'):
+                keys_medical_experts[key].add(medical_expert)
+
+        # count the keys the candidates share with the texts
+        all_candidates = sorted(set().union(*keys_medical_experts.values())) \
+            if keys_medical_experts else []
+        medical_experts_keys = defaultdict(set)
+        for i in range(0, len(all_candidates), chunk_size):
+            for medical_expert, key in MedicalExpertNameKey.objects.filter(
+                    medical_expert__in=all_candidates[i:i + chunk_size],
+                    key__in=all_keys).values_list('medical_expert', 'key'):
+                medical_experts_keys[medical_expert].add(key)
+
+        candidates = {}
+        for text, keys in texts_keys.items():
+            candidates[text] = set(
+                medical_expert
+                for key in texts_blocking_keys[text]
+                for medical_expert in keys_medical_experts[key]
+                if len(medical_experts_keys[medical_expert] & keys) >=
+                texts_min_shared[text])
+            if texts_phonetic_keys[text]:
+                candidates[text] |= \
+                    keys_medical_experts[texts_phonetic_keys[text]]
+        return candidates
+
+    def find_similar(self, rows, rules, blocking_rules, chunk_size=1000):
+        """
+        Return the [(medical expert id, score)] similar to each of ROWS,
+        dicts of the medical expert fields. A medical expert is similar when
+        the similarity of the (fields, threshold) RULES are all reached. Only
+        the candidates whose last name shares name keys with the
+        BLOCKING_RULES fields of the row, its last name, are scored,
+        instead of all the medical experts
+        """
+        blocking_fields = [field for fields, threshold in blocking_rules
+                           for field in fields]
+        blocking_threshold = min(threshold for fields, threshold in
+                                 blocking_rules)
+        rows = [dict((field, normalize_search_text(value))
+                     for field, value in row.items()) for row in rows]
+        blocking_texts = [
+            u' '.join(row.get(field, '') for field in blocking_fields).strip()
+            for row in rows]
+        candidates = self.get_blocking_candidates(
+            set(blocking_texts), blocking_threshold, chunk_size)
+
+        all_candidates = sorted(set().union(*candidates.values())) \
+            if candidates else []
+        rule_fields = sorted(set(field for fields, threshold in rules
+                                 for field in fields))
+        documents = {}
+        for i in range(0, len(all_candidates), chunk_size):
+            for document in self.filter(
+                    medical_expert__in=all_candidates[i:i + chunk_size]). \
+                    values('medical_expert', *rule_fields):
+                documents[document['medical_expert']] = document
+
+        similar = []
+        for row, blocking_text in zip(rows, blocking_texts):
+            matches = []
+            for medical_expert in candidates.get(blocking_text, ()):
+                document = documents.get(medical_expert)
+                if document is None:
+                    continue
+                scores = []
+                for fields, threshold in rules:
+                    score = SequenceMatcher(
+                        None,
+                        u' '.join(row.get(field, '') for field in fields),
+                        u' '.join(document[field] for field in fields)). \
+                        ratio()
+                    if score < threshold:
+                        break
+                    scores.append(score)
+                else:
+                    matches.append(
+                        (medical_expert, sum(scores) / len(scores)))
+            similar.append(sorted(matches, key=lambda match: -match[1]))
+        return similar
+
+
+class MedicalExpertSearchDocument(models.Model):
+    """
+    Normalized text of the medical expert searchable fields, kept in sync
+    when the medical expert, its country, therapeutic areas or specialties
+    change
+    """
+    medical_expert = models.OneToOneField(MedicalExpert, primary_key=True)
+    first_name = models.TextField(blank=True)
+    middle_name = models.TextField(blank=True)
+    last_name = models.TextField(blank=True)
+    city = models.TextField(blank=True)
+    country = models.TextField(blank=True)
+    therapeutic_areas = models.TextField(blank=True)
+    specialties = models.TextField(blank=True)
+    document = models.TextField(blank=True)
+
+    objects = MedicalExpertSearchDocumentQuerySet.as_manager()
+
+    document_fields = ('first_name', 'middle_name', 'last_name', 'city',
+                       'country', 'therapeutic_areas', 'specialties')
+
+    def __unicode__(self):
+        return self.document
+
+
+class MedicalExpertSearchTrigram(models.Model):
+    """
+    Trigrams of the medical experts search documents
+    """
+    medical_expert = models.ForeignKey(MedicalExpert)
+    trigram = models.CharField(max_length=3)
+
+    class Meta:
+        index_together = (('trigram', 'medical_expert'),)
+
+
+class MedicalExpertNameKey(models.Model):
+    """
+    Blocking keys of the medical experts last names, their trigrams and
+    phonetic key, matched to find the similar medical experts
+    """
+    medical_expert = models.ForeignKey(MedicalExpert)
+    key = models.CharField(max_length=4)
+
+    class Meta:
+        index_together = (('key', 'medical_expert'),)
+
+
+@receiver(m2m_changed, sender=MedicalExpert.specialties.through)
+@receiver(m2m_changed, sender=MedicalExpert.therapeutic_areas.through)
+def update_medical_expert_search_documents(sender, instance, action,
+                                           reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            MedicalExpertSearchDocument.objects.refresh([instance.pk])
+        return
+    if action in ('post_add', 'post_remove'):
+        MedicalExpertSearchDocument.objects.refresh(pk_set)
+    elif action == 'pre_clear':
+        # remember the medical experts, they are unlinked on post_clear
+        instance._search_medical_experts = list(
+            instance.app_medicalexpert_related.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        MedicalExpertSearchDocument.objects.refresh(
+            getattr(instance, '_search_medical_experts', []))
+
+
+@receiver(post_save, sender=helper_models.Country)
+@receiver(post_save, sender=helper_models.MedicalExpertise)
+@receiver(post_save, sender=helper_models.TherapeuticArea)
+def update_medical_expert_search_documents_names(sender, instance, created,
+                                                 **kwargs):
+    if created:
+        return
+    if sender is helper_models.Country:
+        medical_experts = instance.medicalexpert_set
+    else:
+        medical_experts = instance.app_medicalexpert_related
+    MedicalExpertSearchDocument.objects.refresh(
+        medical_experts.values_list('pk', flat=True))
+
+
+# the names and links read with the rows of the API lists, whose changes do
+# not change the last_changed_on of the rows
+@receiver(m2m_changed, sender=MedicalExpert.specialties.through)
+@receiver(m2m_changed, sender=MedicalExpert.therapeutic_areas.through)
+@receiver(m2m_changed, sender=ClinicalTrial.condition.through)
+@receiver(m2m_changed, sender=ClinicalTrial.study_phases.through)
+def bump_link_generations(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_table_generations([sender])
+
+
+@receiver([post_save, post_delete], sender=helper_models.Country)
+@receiver([post_save, post_delete], sender=helper_models.MedicalExpertise)
+@receiver([post_save, post_delete], sender=helper_models.TherapeuticArea)
+@receiver([post_save, post_delete],
+          sender=helper_models.ClinicalTrialCondition)
+@receiver([post_save, post_delete],
+          sender=helper_models.ClinicalTrialStudyPhase)
+@receiver([post_save, post_delete],
+          sender=helper_models.ClinicalTrialRecruitmentStatus)
+@receiver([post_save, post_delete],
+          sender=helper_models.ClinicalTrialStudyType)
+@receiver([post_save, post_delete],
+          sender=helper_models.ClinicalTrialEnrollment)
+@receiver([post_save, post_delete], sender=helper_models.EventSubtype)
+@receiver([post_save, post_delete], sender=helper_models.PublicationSubtype)
+def bump_lookup_generations(sender, **kwargs):
+    bump_table_generations([sender])
+
+
 class PublicationAbstract(helper_models.OIDModel):
     name = models.CharField(max_length=1024)
     original_name = models.CharField(max_length=1024, null=True, blank=True)
@@ -705,3 +1387,8 @@ class MedicalDevice(MedicalDeviceAbstract):
 
     def __unicode__(self):
         return u'%s' % (self.device_name)
+
+
+# registers the relation models, whose receivers keep the counters and the
+# connections of the models above up to date
+import models_relations  # noqa
@@ -1,7 +1,58 @@
-from django.db import models
+from collections import defaultdict
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_save, pre_save
+from django.dispatch import receiver
 from models import ActiveIngredient, ClinicalTrial, Event, Institution, \
                    Intervention, MedicalExpert, Publication
 from app_helpers import models as helper_models
+from app_helpers.cache import bump_generations
+from counters import mark_connections_dirty, mark_counters_dirty
+
+
+# institution subtypes and positions qualifying a physician affiliation
+PHYSICIAN_SUBTYPES = ['Hospital', 'Hospital Department', 'Medical Practice']
+PHYSICIAN_POSITIONS = ['Role Physician', 'Head of']
+
+
+def get_linked_pks(queryset, field):
+    """
+    Return the distinct pks of the FIELD objects linked by QUERYSET
+    """
+    return list(queryset.exclude(**{field: None}).order_by().
+                values_list(field, flat=True).distinct())
+
+
+def invalidate_medical_experts(medical_experts):
+    """
+    Invalidate the investigator aggregates cached for MEDICAL_EXPERTS
+    """
+    bump_generations('medical_expert', medical_experts)
+
+
+def invalidate_clinical_trials(clinical_trials):
+    """
+    Invalidate the investigator aggregates cached for the medical experts
+    linked to CLINICAL_TRIALS
+    """
+    clinical_trials = [pk for pk in clinical_trials if pk]
+    if clinical_trials:
+        invalidate_medical_experts(get_linked_pks(
+            MedicalExpertClinicalTrial.objects.filter(
+                clinical_trial__in=clinical_trials), 'medical_expert'))
+
+
+def get_saved_values(instance, *fields):
+    """
+    Return the values of FIELDS stored for INSTANCE, None for a new
+    instance, so that the objects it linked before a change are updated
+    too
+    """
+    values = None
+    if instance.pk is not None:
+        values = type(instance)._base_manager.filter(pk=instance.pk). \
+            values_list(*fields).first()
+    return values or (None,) * len(fields)
 
 
 class MedicalExpertInstitutionAbstract(models.Model):
@@ -24,20 +75,12 @@ class MedicalExpertInstitutionAbstract(models.Model):
 
 class MedicalExpertInstitutionQuerySet(models.QuerySet):
     def delete(self, *args, **kwargs):
-        medical_experts = []
-        institutions = []
-        for obj in self:
-            medical_expert = obj.medical_expert
-            institution = obj.institution
-            if medical_expert and medical_expert not in medical_experts:
-                medical_experts.append(medical_expert)
-            if institution and institution not in institutions:
-                institutions.append(institution)
-        super(MedicalExpertInstitutionQuerySet, self).delete(*args, **kwargs)
-        for medical_expert in medical_experts:
-            medical_expert.update_number_linked_institutions()
-        for institution in institutions:
-            institution.update_number_linked_medical_experts()
+        medical_experts = get_linked_pks(self, 'medical_expert')
+        institutions = get_linked_pks(self, 'institution')
+        deleted = super(MedicalExpertInstitutionQuerySet, self).delete(
+            *args, **kwargs)
+        MedicalExpertInstitution.update_related(medical_experts, institutions)
+        return deleted
 
 
 class MedicalExpertInstitution(MedicalExpertInstitutionAbstract):
@@ -46,6 +89,8 @@ class MedicalExpertInstitution(MedicalExpertInstitutionAbstract):
     class Meta:
         verbose_name = 'Medical Expert - Institution'
         verbose_name_plural = 'Medical Experts - Institutions'
+        index_together = (('medical_expert', 'institution'),
+                          ('institution', 'medical_expert'))
 
     def prop_institution_oid(self):
         return self.institution.oid
@@ -64,25 +109,35 @@ class MedicalExpertInstitution(MedicalExpertInstitutionAbstract):
     prop_institution_hospital_university.short_description = \
         'Institution Hospital/University/Etc'
 
+    @staticmethod
+    def update_related(medical_experts, institutions):
+        """
+        Mark the counters and the connections of MEDICAL_EXPERTS and the
+        counters of INSTITUTIONS as dirty
+        """
+        mark_counters_dirty(MedicalExpert, medical_experts, 'institutions')
+        mark_connections_dirty((MedicalExpertConnectionPhysician,
+                                MedicalExpertConnectionResearcher),
+                               medical_experts)
+        mark_counters_dirty(Institution, institutions, 'medical_experts')
+
     def save(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
+        saved_medical_expert_id, saved_institution_id = get_saved_values(
+            self, 'medical_expert', 'institution')
         super(MedicalExpertInstitution, self).save(*args, **kwargs)
         if not ignore_update_related:
-            if self.medical_expert:
-                self.medical_expert.update_number_linked_institutions()
-            if self.institution:
-                self.institution.update_number_linked_medical_experts()
+            self.update_related(
+                [saved_medical_expert_id, self.medical_expert_id],
+                [saved_institution_id, self.institution_id])
 
     def delete(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
-        medical_expert = self.medical_expert
-        institution = self.institution
+        medical_expert_id = self.medical_expert_id
+        institution_id = self.institution_id
         super(MedicalExpertInstitution, self).delete(*args, **kwargs)
         if not ignore_update_related:
-            if medical_expert:
-                medical_expert.update_number_linked_institutions()
-            if institution:
-                institution.update_number_linked_medical_experts()
+            self.update_related([medical_expert_id], [institution_id])
 
 
 class MedicalExpertInstitutionCOIAbstract(models.Model):
@@ -110,30 +165,26 @@ class MedicalExpertInstitutionCOIAbstract(models.Model):
     unique_together_reference = (('institution', 'medical_expert'),)
 
 
-class MedicalExpertInstitutionQuerySet(models.QuerySet):
+class MedicalExpertInstitutionCOIQuerySet(models.QuerySet):
     def delete(self, *args, **kwargs):
-        medical_experts = []
-        institutions = []
-        for obj in self:
-            medical_expert = obj.medical_expert
-            institution = obj.institution
-            if medical_expert and medical_expert not in medical_experts:
-                medical_experts.append(medical_expert)
-            if institution and institution not in institutions:
-                institutions.append(institution)
-        super(MedicalExpertInstitutionQuerySet, self).delete(*args, **kwargs)
-        for medical_expert in medical_experts:
-            medical_expert.update_number_linked_institutions()
-        for institution in institutions:
-            institution.update_number_linked_medical_experts()
+        medical_experts = get_linked_pks(self, 'medical_expert')
+        institutions = get_linked_pks(self, 'institution')
+        deleted = super(MedicalExpertInstitutionCOIQuerySet, self).delete(
+            *args, **kwargs)
+        invalidate_medical_experts(medical_experts)
+        MedicalExpertInstitutionCOI.update_related(medical_experts,
+                                                   institutions)
+        return deleted
 
 
 class MedicalExpertInstitutionCOI(MedicalExpertInstitutionCOIAbstract):
-    objects = MedicalExpertInstitutionQuerySet.as_manager()
+    objects = MedicalExpertInstitutionCOIQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Medical Expert - Institution (COI)'
         verbose_name_plural = 'Medical Experts - Institutions (COI)'
+        index_together = (('medical_expert', 'year'),
+                          ('institution', 'medical_expert'))
 
     def prop_institution_oid(self):
         return self.institution.oid
@@ -152,25 +203,36 @@ class MedicalExpertInstitutionCOI(MedicalExpertInstitutionCOIAbstract):
     prop_institution_hospital_university.short_description = \
         'Institution Hospital/University/Etc'
 
+    @staticmethod
+    def update_related(medical_experts, institutions):
+        """
+        Mark the counters of MEDICAL_EXPERTS and INSTITUTIONS as dirty
+        """
+        mark_counters_dirty(MedicalExpert, medical_experts,
+                            'institutions_coi')
+        mark_counters_dirty(Institution, institutions, 'medical_experts_coi')
+
     def save(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
+        saved_medical_expert_id, saved_institution_id = get_saved_values(
+            self, 'medical_expert', 'institution')
         super(MedicalExpertInstitutionCOI, self).save(*args, **kwargs)
-        if not ignore_update_related:
-            if self.medical_expert:
-                self.medical_expert.update_number_linked_institutions_coi()
-            if self.institution:
-                self.institution.update_number_linked_medical_experts_coi()
+        medical_experts = [saved_medical_expert_id, self.medical_expert_id]
+        invalidate_medical_experts(medical_experts)
+        if not ignore_update_related and \
+           (saved_medical_expert_id, saved_institution_id) != \
+           (self.medical_expert_id, self.institution_id):
+            self.update_related(medical_experts,
+                                [saved_institution_id, self.institution_id])
 
     def delete(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
-        medical_expert = self.medical_expert
-        institution = self.institution
+        medical_expert_id = self.medical_expert_id
+        institution_id = self.institution_id
         super(MedicalExpertInstitutionCOI, self).delete(*args, **kwargs)
+        invalidate_medical_experts([medical_expert_id])
         if not ignore_update_related:
-            if medical_expert:
-                medical_expert.update_number_linked_institutions_coi()
-            if institution:
-                institution.update_number_linked_medical_experts_coi()
+            self.update_related([medical_expert_id], [institution_id])
 
 
 class MedicalExpertClinicalTrialAbstract(models.Model):
@@ -190,20 +252,14 @@ class MedicalExpertClinicalTrialAbstract(models.Model):
 
 class MedicalExpertClinicalTrialQuerySet(models.QuerySet):
     def delete(self, *args, **kwargs):
-        medical_experts = []
-        clinical_trials = []
-        for obj in self:
-            medical_expert = obj.medical_expert
-            clinical_trial = obj.clinical_trial
-            if medical_expert and medical_expert not in medical_experts:
-                medical_experts.append(medical_expert)
-            if clinical_trial and clinical_trial not in clinical_trials:
-                clinical_trials.append(clinical_trial)
-        super(MedicalExpertClinicalTrialQuerySet, self).delete(*args, **kwargs)
-        for medical_expert in medical_experts:
-            medical_expert.update_number_linked_clinical_trials()
-        for clinical_trial in clinical_trials:
-            clinical_trial.update_number_linked_medical_experts()
+        medical_experts = get_linked_pks(self, 'medical_expert')
+        clinical_trials = get_linked_pks(self, 'clinical_trial')
+        deleted = super(MedicalExpertClinicalTrialQuerySet, self).delete(
+            *args, **kwargs)
+        invalidate_medical_experts(medical_experts)
+        MedicalExpertClinicalTrial.update_related(medical_experts,
+                                                  clinical_trials)
+        return deleted
 
 
 class MedicalExpertClinicalTrial(MedicalExpertClinicalTrialAbstract):
@@ -212,6 +268,8 @@ class MedicalExpertClinicalTrial(MedicalExpertClinicalTrialAbstract):
     class Meta:
         verbose_name = 'Medical Expert - Clinical Trial'
         verbose_name_plural = 'Medical Experts - Clinical Trials'
+        index_together = (('medical_expert', 'clinical_trial'),
+                          ('clinical_trial', 'medical_expert'))
 
     def prop_clinical_trial_oid(self):
         return self.clinical_trial.oid
@@ -227,25 +285,39 @@ class MedicalExpertClinicalTrial(MedicalExpertClinicalTrialAbstract):
                           self.clinical_trial.condition.all()])
     prop_clinical_trial_condition.short_description = 'CT Condition'
 
+    @staticmethod
+    def update_related(medical_experts, clinical_trials):
+        """
+        Mark the counters and the connections of MEDICAL_EXPERTS and the
+        counters of CLINICAL_TRIALS as dirty
+        """
+        mark_counters_dirty(MedicalExpert, medical_experts, 'clinical_trials')
+        mark_connections_dirty((MedicalExpertConnectionCTCollaborator,),
+                               medical_experts)
+        mark_counters_dirty(ClinicalTrial, clinical_trials, 'medical_experts')
+
     def save(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
+        saved_medical_expert_id, saved_clinical_trial_id = get_saved_values(
+            self, 'medical_expert', 'clinical_trial')
         super(MedicalExpertClinicalTrial, self).save(*args, **kwargs)
-        if not ignore_update_related:
-            if self.medical_expert:
-                self.medical_expert.update_number_linked_clinical_trials()
-            if self.clinical_trial:
-                self.clinical_trial.update_number_linked_medical_experts()
+        medical_experts = [saved_medical_expert_id, self.medical_expert_id]
+        invalidate_medical_experts(medical_experts)
+        if not ignore_update_related and \
+           (saved_medical_expert_id, saved_clinical_trial_id) != \
+           (self.medical_expert_id, self.clinical_trial_id):
+            self.update_related(
+                medical_experts,
+                [saved_clinical_trial_id, self.clinical_trial_id])
 
     def delete(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
-        medical_expert = self.medical_expert
-        clinical_trial = self.clinical_trial
+        medical_expert_id = self.medical_expert_id
+        clinical_trial_id = self.clinical_trial_id
         super(MedicalExpertClinicalTrial, self).delete(*args, **kwargs)
+        invalidate_medical_experts([medical_expert_id])
         if not ignore_update_related:
-            if medical_expert:
-                medical_expert.update_number_linked_clinical_trials()
-            if clinical_trial:
-                clinical_trial.update_number_linked_medical_experts()
+            self.update_related([medical_expert_id], [clinical_trial_id])
 
 
 class MedicalExpertPublicationAbstract(models.Model):
@@ -265,14 +337,12 @@ class MedicalExpertPublicationAbstract(models.Model):
 
 class MedicalExpertPublicationQuerySet(models.QuerySet):
     def delete(self, *args, **kwargs):
-        medical_experts = []
-        for obj in self:
-            medical_expert = obj.medical_expert
-            if medical_expert and medical_expert not in medical_experts:
-                medical_experts.append(medical_expert)
-        super(MedicalExpertPublicationQuerySet, self).delete(*args, **kwargs)
-        for medical_expert in medical_experts:
-            medical_expert.update_number_linked_publications()
+        medical_experts = get_linked_pks(self, 'medical_expert')
+        deleted = super(MedicalExpertPublicationQuerySet, self).delete(
+            *args, **kwargs)
+        invalidate_medical_experts(medical_experts)
+        MedicalExpertPublication.update_related(medical_experts)
+        return deleted
 
 
 class MedicalExpertPublication(MedicalExpertPublicationAbstract):
@@ -281,6 +351,8 @@ class MedicalExpertPublication(MedicalExpertPublicationAbstract):
     class Meta:
         verbose_name = 'Medical Expert - Publication'
         verbose_name_plural = 'Medical Experts - Publications'
+        index_together = (('medical_expert', 'publication'),
+                          ('publication', 'medical_expert'))
 
     def prop_publication_oid(self):
         return self.publication.oid
@@ -298,20 +370,34 @@ class MedicalExpertPublication(MedicalExpertPublicationAbstract):
         return self.publication.publication_year
     prop_publication_year.short_description = 'Publication Year'
 
+    @staticmethod
+    def update_related(medical_experts):
+        """
+        Mark the counters and the connections of MEDICAL_EXPERTS as dirty
+        """
+        mark_counters_dirty(MedicalExpert, medical_experts, 'publications')
+        mark_connections_dirty((MedicalExpertConnectionAuthor,),
+                               medical_experts)
+
     def save(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
+        saved_medical_expert_id, saved_publication_id = get_saved_values(
+            self, 'medical_expert', 'publication')
         super(MedicalExpertPublication, self).save(*args, **kwargs)
-        if not ignore_update_related:
-            if self.medical_expert:
-                self.medical_expert.update_number_linked_publications()
+        medical_experts = [saved_medical_expert_id, self.medical_expert_id]
+        invalidate_medical_experts(medical_experts)
+        if not ignore_update_related and \
+           (saved_medical_expert_id, saved_publication_id) != \
+           (self.medical_expert_id, self.publication_id):
+            self.update_related(medical_experts)
 
     def delete(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
-        medical_expert = self.medical_expert
+        medical_expert_id = self.medical_expert_id
         super(MedicalExpertPublication, self).delete(*args, **kwargs)
+        invalidate_medical_experts([medical_expert_id])
         if not ignore_update_related:
-            if medical_expert:
-                medical_expert.update_number_linked_publications()
+            self.update_related([medical_expert_id])
 
 
 class MedicalExpertEventAbstract(models.Model):
@@ -333,14 +419,12 @@ class MedicalExpertEventAbstract(models.Model):
 
 class MedicalExpertEventQuerySet(models.QuerySet):
     def delete(self, *args, **kwargs):
-        medical_experts = []
-        for obj in self:
-            medical_expert = obj.medical_expert
-            if medical_expert and medical_expert not in medical_experts:
-                medical_experts.append(medical_expert)
-        super(MedicalExpertEventQuerySet, self).delete(*args, **kwargs)
-        for medical_expert in medical_experts:
-            medical_expert.update_number_linked_events()
+        medical_experts = get_linked_pks(self, 'medical_expert')
+        deleted = super(MedicalExpertEventQuerySet, self).delete(
+            *args, **kwargs)
+        invalidate_medical_experts(medical_experts)
+        MedicalExpertEvent.update_related(medical_experts)
+        return deleted
 
 
 class MedicalExpertEvent(MedicalExpertEventAbstract):
@@ -349,6 +433,8 @@ class MedicalExpertEvent(MedicalExpertEventAbstract):
     class Meta:
         verbose_name = 'Medical Expert - Event'
         verbose_name_plural = 'Medical Experts - Events'
+        index_together = (('medical_expert', 'event'),
+                          ('event', 'medical_expert'))
 
     def prop_event_oid(self):
         return self.event.oid
@@ -366,20 +452,34 @@ class MedicalExpertEvent(MedicalExpertEventAbstract):
         return self.event.country
     prop_event_country.short_description = 'Event Country'
 
+    @staticmethod
+    def update_related(medical_experts):
+        """
+        Mark the counters and the connections of MEDICAL_EXPERTS as dirty
+        """
+        mark_counters_dirty(MedicalExpert, medical_experts, 'events')
+        mark_connections_dirty((MedicalExpertConnectionEventParticipant,),
+                               medical_experts)
+
     def save(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
+        saved_medical_expert_id, saved_event_id = get_saved_values(
+            self, 'medical_expert', 'event')
         super(MedicalExpertEvent, self).save(*args, **kwargs)
-        if not ignore_update_related:
-            if self.medical_expert:
-                self.medical_expert.update_number_linked_events()
+        medical_experts = [saved_medical_expert_id, self.medical_expert_id]
+        invalidate_medical_experts(medical_experts)
+        if not ignore_update_related and \
+           (saved_medical_expert_id, saved_event_id) != \
+           (self.medical_expert_id, self.event_id):
+            self.update_related(medical_experts)
 
     def delete(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
-        medical_expert = self.medical_expert
+        medical_expert_id = self.medical_expert_id
         super(MedicalExpertEvent, self).delete(*args, **kwargs)
+        invalidate_medical_experts([medical_expert_id])
         if not ignore_update_related:
-            if medical_expert:
-                medical_expert.update_number_linked_events()
+            self.update_related([medical_expert_id])
 
 
 class ClinicalTrialInstitutionAbstract(models.Model):
@@ -397,14 +497,12 @@ class ClinicalTrialInstitutionAbstract(models.Model):
 
 class ClinicalTrialInstitutionQuerySet(models.QuerySet):
     def delete(self, *args, **kwargs):
-        clinical_trials = []
-        for obj in self:
-            clinical_trial = obj.clinical_trial
-            if clinical_trial and clinical_trial not in clinical_trials:
-                clinical_trials.append(clinical_trial)
-        super(ClinicalTrialInstitutionQuerySet, self).delete(*args, **kwargs)
-        for clinical_trial in clinical_trials:
-            clinical_trial.update_number_linked_institutions()
+        clinical_trials = get_linked_pks(self, 'clinical_trial')
+        deleted = super(ClinicalTrialInstitutionQuerySet, self).delete(
+            *args, **kwargs)
+        invalidate_clinical_trials(clinical_trials)
+        mark_counters_dirty(ClinicalTrial, clinical_trials, 'institutions')
+        return deleted
 
 
 class ClinicalTrialInstitution(ClinicalTrialInstitutionAbstract):
@@ -413,21 +511,28 @@ class ClinicalTrialInstitution(ClinicalTrialInstitutionAbstract):
     class Meta:
         verbose_name = 'Clinical Trial - Institution'
         verbose_name_plural = 'Clinical Trials - Institutions'
+        index_together = (('clinical_trial', 'relationship_type',
+                           'institution'),
+                          ('institution', 'clinical_trial'))
 
     def save(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
+        saved_clinical_trial_id, = get_saved_values(self, 'clinical_trial')
         super(ClinicalTrialInstitution, self).save(*args, **kwargs)
+        clinical_trials = [saved_clinical_trial_id, self.clinical_trial_id]
+        invalidate_clinical_trials(clinical_trials)
         if not ignore_update_related:
-            if self.clinical_trial:
-                self.clinical_trial.update_number_linked_institutions()
+            mark_counters_dirty(ClinicalTrial, clinical_trials, 'institutions')
 
     def delete(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
-        clinical_trial = self.clinical_trial
+        clinical_trial_id = self.clinical_trial_id
         super(ClinicalTrialInstitution, self).delete(*args, **kwargs)
+        invalidate_clinical_trials([clinical_trial_id])
         if not ignore_update_related:
-            if clinical_trial:
-                clinical_trial.update_number_linked_institutions()
+            if clinical_trial_id:
+                mark_counters_dirty(
+                    ClinicalTrial, [clinical_trial_id], 'institutions')
 
 
 class ClinicalTrialInterventionAbstract(models.Model):
@@ -446,14 +551,12 @@ class ClinicalTrialInterventionAbstract(models.Model):
 
 class ClinicalTrialInterventionQuerySet(models.QuerySet):
     def delete(self, *args, **kwargs):
-        clinical_trials = []
-        for obj in self:
-            clinical_trial = obj.clinical_trial
-            if clinical_trial and clinical_trial not in clinical_trials:
-                clinical_trials.append(clinical_trial)
-        super(ClinicalTrialInterventionQuerySet, self).delete(*args, **kwargs)
-        for clinical_trial in clinical_trials:
-            clinical_trial.update_number_linked_interventions()
+        clinical_trials = get_linked_pks(self, 'clinical_trial')
+        deleted = super(ClinicalTrialInterventionQuerySet, self).delete(
+            *args, **kwargs)
+        invalidate_clinical_trials(clinical_trials)
+        mark_counters_dirty(ClinicalTrial, clinical_trials, 'interventions')
+        return deleted
 
 
 class ClinicalTrialIntervention(ClinicalTrialInterventionAbstract):
@@ -462,21 +565,27 @@ class ClinicalTrialIntervention(ClinicalTrialInterventionAbstract):
     class Meta:
         verbose_name = 'Clinical Trial - Intervention'
         verbose_name_plural = 'Clinical Trials - Interventions'
+        index_together = (('clinical_trial', 'intervention'),)
 
     def save(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
+        saved_clinical_trial_id, = get_saved_values(self, 'clinical_trial')
         super(ClinicalTrialIntervention, self).save(*args, **kwargs)
+        clinical_trials = [saved_clinical_trial_id, self.clinical_trial_id]
+        invalidate_clinical_trials(clinical_trials)
         if not ignore_update_related:
-            if self.clinical_trial:
-                self.clinical_trial.update_number_linked_interventions()
+            mark_counters_dirty(ClinicalTrial, clinical_trials,
+                                'interventions')
 
     def delete(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
-        clinical_trial = self.clinical_trial
+        clinical_trial_id = self.clinical_trial_id
         super(ClinicalTrialIntervention, self).delete(*args, **kwargs)
+        invalidate_clinical_trials([clinical_trial_id])
         if not ignore_update_related:
-            if clinical_trial:
-                clinical_trial.update_number_linked_interventions()
+            if clinical_trial_id:
+                mark_counters_dirty(
+                    ClinicalTrial, [clinical_trial_id], 'interventions')
 
 
 class ClinicalTrialActiveIngredient(models.Model):
@@ -578,14 +687,11 @@ class PublicationClinicalTrial(models.Model):
 
 class InstitutionInstitutionQuerySet(models.QuerySet):
     def delete(self, *args, **kwargs):
-        institutions = []
-        for obj in self:
-            institution = obj.institution
-            if institution and institution not in institutions:
-                institutions.append(institution)
-        super(InstitutionInstitutionQuerySet, self).delete(*args, **kwargs)
-        for institution in institutions:
-            institution.update_number_linked_institutions()
+        institutions = get_linked_pks(self, 'institution')
+        deleted = super(InstitutionInstitutionQuerySet, self).delete(
+            *args, **kwargs)
+        mark_counters_dirty(Institution, institutions, 'institutions')
+        return deleted
 
 
 class InstitutionInstitution(models.Model):
@@ -607,15 +713,275 @@ class InstitutionInstitution(models.Model):
 
     def save(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
+        saved_institution_id, = get_saved_values(self, 'institution')
         super(InstitutionInstitution, self).save(*args, **kwargs)
         if not ignore_update_related:
-            if self.institution:
-                self.institution.update_number_linked_institutions()
+            mark_counters_dirty(
+                Institution, [saved_institution_id, self.institution_id],
+                'institutions')
 
     def delete(self, *args, **kwargs):
         ignore_update_related = kwargs.pop('ignore_update_related', False)
-        institution = self.institution
+        institution_id = self.institution_id
         super(InstitutionInstitution, self).delete(*args, **kwargs)
         if not ignore_update_related:
-            if institution:
-                institution.update_number_linked_institutions()
+            if institution_id:
+                mark_counters_dirty(
+                    Institution, [institution_id], 'institutions')
+
+
+class MedicalExpertConnectionQuerySet(models.QuerySet):
+    def get_connections(self, medical_experts=None, sources_only=False):
+        """
+        Return the (medical_expert, connected_medical_expert) pairs computed
+        from the relation model, limited to the pairs involving
+        MEDICAL_EXPERTS (or having them as source when SOURCES_ONLY is set)
+        """
+        model = self.model
+        field = model.relation_field
+        links = model.relation_model.objects.exclude(**{field: None}). \
+            exclude(medical_expert=None)
+        source_links = model.get_source_links(links)
+        if medical_experts is not None:
+            medical_experts = set(medical_experts)
+            objects = (source_links if sources_only else links). \
+                filter(medical_expert__in=medical_experts).values(field)
+            links = links.filter(**{'%s__in' % field: objects})
+            source_links = source_links.filter(**{'%s__in' % field: objects})
+
+        objects_medical_experts = defaultdict(set)
+        for obj, medical_expert in \
+                links.values_list(field, 'medical_expert').distinct():
+            objects_medical_experts[obj].add(medical_expert)
+
+        connections = set()
+        for obj, medical_expert in \
+                source_links.values_list(field, 'medical_expert').distinct():
+            source_selected = medical_experts is None or \
+                medical_expert in medical_experts
+            if sources_only and not source_selected:
+                continue
+            for connected_medical_expert in objects_medical_experts[obj]:
+                if connected_medical_expert == medical_expert:
+                    continue
+                if source_selected or \
+                   connected_medical_expert in medical_experts:
+                    connections.add(
+                        (medical_expert, connected_medical_expert))
+        return connections
+
+    def refresh(self, medical_experts, chunk_size=1000):
+        """
+        Recompute the connections from and to MEDICAL_EXPERTS, CHUNK_SIZE
+        medical experts at a time
+        """
+        medical_experts = sorted(set(pk for pk in medical_experts if pk))
+        with transaction.atomic():
+            for i in range(0, len(medical_experts), chunk_size):
+                chunk = set(medical_experts[i:i + chunk_size])
+                connections = self.get_connections(chunk)
+                self.filter(
+                    Q(medical_expert__in=chunk) |
+                    Q(connected_medical_expert__in=chunk)).delete()
+                self.bulk_create([
+                    self.model(medical_expert_id=medical_expert,
+                               connected_medical_expert_id=connected)
+                    for medical_expert, connected in connections])
+
+    def rebuild(self, chunk_size=1000):
+        """
+        Recompute all the connections, CHUNK_SIZE source medical experts
+        at a time
+        """
+        medical_experts = list(MedicalExpert.objects.order_by('pk').
+                               values_list('pk', flat=True))
+        total = 0
+        with transaction.atomic():
+            self.all().delete()
+            for i in range(0, len(medical_experts), chunk_size):
+                connections = self.get_connections(
+                    medical_experts[i:i + chunk_size], sources_only=True)
+                self.bulk_create([
+                    self.model(medical_expert_id=medical_expert,
+                               connected_medical_expert_id=connected)
+                    for medical_expert, connected in connections],
+                    batch_size=chunk_size)
+                total += len(connections)
+        return total
+
+
+class MedicalExpertConnectionAbstract(models.Model):
+    """
+    Medical experts connected through a shared clinical trial, event,
+    institution or publication, maintained from the relation models
+    """
+    medical_expert = models.ForeignKey(MedicalExpert, related_name='+')
+    connected_medical_expert = models.ForeignKey(
+        MedicalExpert, related_name='%(app_label)s_%(class)s_related')
+
+    objects = MedicalExpertConnectionQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+        unique_together = (('medical_expert', 'connected_medical_expert'),)
+
+    relation_model = None
+    relation_field = None
+
+    @classmethod
+    def get_source_links(cls, links):
+        """
+        Return the LINKS through which the medical expert gets connected
+        """
+        return links
+
+
+class MedicalExpertConnectionAuthor(MedicalExpertConnectionAbstract):
+    relation_model = MedicalExpertPublication
+    relation_field = 'publication'
+
+    class Meta(MedicalExpertConnectionAbstract.Meta):
+        verbose_name = 'Medical Expert - Connection (Author)'
+        verbose_name_plural = 'Medical Experts - Connections (Authors)'
+
+
+class MedicalExpertConnectionEventParticipant(
+      MedicalExpertConnectionAbstract):
+    relation_model = MedicalExpertEvent
+    relation_field = 'event'
+
+    class Meta(MedicalExpertConnectionAbstract.Meta):
+        verbose_name = 'Medical Expert - Connection (Event Participant)'
+        verbose_name_plural = \
+            'Medical Experts - Connections (Event Participants)'
+
+
+class MedicalExpertConnectionPhysician(MedicalExpertConnectionAbstract):
+    relation_model = MedicalExpertInstitution
+    relation_field = 'institution'
+
+    class Meta(MedicalExpertConnectionAbstract.Meta):
+        verbose_name = 'Medical Expert - Connection (Physician)'
+        verbose_name_plural = 'Medical Experts - Connections (Physicians)'
+
+    @classmethod
+    def get_source_links(cls, links):
+        return links.filter(
+            institution__institution_subtype__name__in=PHYSICIAN_SUBTYPES,
+            position__name__in=PHYSICIAN_POSITIONS)
+
+
+class MedicalExpertConnectionResearcher(MedicalExpertConnectionAbstract):
+    relation_model = MedicalExpertInstitution
+    relation_field = 'institution'
+
+    class Meta(MedicalExpertConnectionAbstract.Meta):
+        verbose_name = 'Medical Expert - Connection (Researcher)'
+        verbose_name_plural = 'Medical Experts - Connections (Researchers)'
+
+    @classmethod
+    def get_source_links(cls, links):
+        return links.exclude(institution__institution_subtype=None). \
+            exclude(position=None). \
+            exclude(
+                institution__institution_subtype__name__in=PHYSICIAN_SUBTYPES,
+                position__name__in=PHYSICIAN_POSITIONS)
+
+
+class MedicalExpertConnectionCTCollaborator(MedicalExpertConnectionAbstract):
+    relation_model = MedicalExpertClinicalTrial
+    relation_field = 'clinical_trial'
+
+    class Meta(MedicalExpertConnectionAbstract.Meta):
+        verbose_name = 'Medical Expert - Connection (CT Collaborator)'
+        verbose_name_plural = \
+            'Medical Experts - Connections (CT Collaborators)'
+
+
+@receiver(pre_save, sender=Institution)
+def remember_institution_subtype(sender, instance, **kwargs):
+    instance._saved_institution_subtype_id, = get_saved_values(
+        instance, 'institution_subtype')
+
+
+@receiver(post_save, sender=Institution)
+def update_institution_medical_experts(sender, instance, created,
+                                       **kwargs):
+    """
+    The company counter and the physician and researcher connections of
+    the medical experts of an institution depend on its subtype
+    """
+    if created or instance.institution_subtype_id == getattr(
+            instance, '_saved_institution_subtype_id',
+            instance.institution_subtype_id):
+        return
+    medical_experts = get_linked_pks(
+        MedicalExpertInstitution.objects.filter(institution=instance),
+        'medical_expert')
+    mark_counters_dirty(MedicalExpert, medical_experts, 'institutions')
+    mark_connections_dirty((MedicalExpertConnectionPhysician,
+                            MedicalExpertConnectionResearcher),
+                           medical_experts)
+    # the company cooperations aggregates are filtered on the subtype too
+    invalidate_medical_experts(get_linked_pks(
+        MedicalExpertInstitutionCOI.objects.filter(institution=instance),
+        'medical_expert'))
+
+
+@receiver(m2m_changed, sender=ClinicalTrial.condition.through)
+@receiver(m2m_changed, sender=ClinicalTrial.study_phases.through)
+def invalidate_clinical_trial_links(sender, instance, action, reverse,
+                                    pk_set, **kwargs):
+    """
+    The investigator aggregates per condition and per study phase read the
+    links of the clinical trials
+    """
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'pre_clear'):
+            invalidate_clinical_trials([instance.pk])
+    elif action in ('post_add', 'post_remove'):
+        invalidate_clinical_trials(pk_set)
+    elif action == 'pre_clear':
+        invalidate_clinical_trials(sender.objects.filter(**{
+            instance._meta.model_name: instance}).
+            values_list('clinicaltrial', flat=True))
+
+
+@receiver(pre_save, sender=Event)
+def remember_event_subtype(sender, instance, **kwargs):
+    instance._saved_event_values = get_saved_values(instance,
+                                                    'event_subtype')
+
+
+@receiver(post_save, sender=Event)
+def invalidate_event_medical_experts(sender, instance, created, **kwargs):
+    """
+    The investigator aggregates per event type read the subtype of the
+    events
+    """
+    if created or getattr(instance, '_saved_event_values', None) == \
+            (instance.event_subtype_id,):
+        return
+    invalidate_medical_experts(get_linked_pks(
+        MedicalExpertEvent.objects.filter(event=instance), 'medical_expert'))
+
+
+@receiver(pre_save, sender=Publication)
+def remember_publication_values(sender, instance, **kwargs):
+    instance._saved_publication_values = get_saved_values(
+        instance, 'publication_year', 'publication_subtype')
+
+
+@receiver(post_save, sender=Publication)
+def invalidate_publication_medical_experts(sender, instance, created,
+                                           **kwargs):
+    """
+    The investigator aggregates per publication year and type read the
+    year and the subtype of the publications
+    """
+    if created or getattr(instance, '_saved_publication_values', None) == \
+            (instance.publication_year, instance.publication_subtype_id):
+        return
+    invalidate_medical_experts(get_linked_pks(
+        MedicalExpertPublication.objects.filter(publication=instance),
+        'medical_expert'))
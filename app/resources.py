@@ -1,10 +1,23 @@
-from django.contrib.auth.models import User
+import tempfile
+from collections import Counter, defaultdict
+from wsgiref.util import FileWrapper
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.encoding import force_text
 
 from import_export import fields, resources
 from import_export.widgets import ForeignKeyWidget, ManyToManyWidget
 
 from app_helpers import models as helper_models
-from .models import MedicalExpert
+from app_helpers.bulk import bulk_update_rows
+from app_helpers.export import iter_csv, write_xlsx
+from .models import MedicalExpert, MedicalExpertRollup, \
+                    MedicalExpertSearchDocument
+
+User = get_user_model()
 
 
 class MedicalExpertResource(resources.ModelResource):
@@ -55,6 +68,183 @@ class MedicalExpertResource(resources.ModelResource):
         exclude = ('id',)
         import_id_fields = ('oid',)
 
+    def find_similar_matches(self, rows):
+        """
+        Return the medical experts likely duplicating each of ROWS, as lists
+        of (medical expert id, score)
+        """
+        return MedicalExpertSearchDocument.objects.find_similar(
+            rows, self.similar_matches_rules,
+            self.similar_matches_rules_full_match_search)
+
+    def get_lookups(self, headers):
+        """
+        Return the {name: pk} dicts of the foreign key and many to many
+        fields in HEADERS, loaded once per import instead of once per row
+        """
+        lookups = {}
+        for field in self.get_fields():
+            if field.column_name in headers and isinstance(
+                    field.widget, (ForeignKeyWidget, ManyToManyWidget)):
+                lookups[field.attribute] = dict(
+                    (force_text(name), pk) for name, pk in
+                    field.widget.model.objects.values_list(
+                        field.widget.field, 'pk'))
+        return lookups
+
+    def bulk_import_row(self, row, obj, lookups):
+        """
+        Set the values of ROW on OBJ. Return the {attname: value} changes and
+        the {field: pks} many to many values of the row
+        """
+        model_fields = dict((field.name, field) for field in
+                            self._meta.model._meta.concrete_fields)
+        changes = {}
+        m2m = {}
+        for field in self.get_fields():
+            if field.column_name not in row:
+                continue
+            widget = field.widget
+            if isinstance(widget, ManyToManyWidget):
+                value = row[field.column_name]
+                names = force_text(value).split(widget.separator) \
+                    if value else []
+                m2m[field.attribute] = set(
+                    lookups[field.attribute][name] for name in names
+                    if name in lookups[field.attribute])
+                continue
+            model_field = model_fields.get(field.attribute)
+            if model_field is None or model_field.primary_key:
+                continue
+            if isinstance(widget, ForeignKeyWidget):
+                name = row[field.column_name] and \
+                    force_text(row[field.column_name])
+                value = None
+                if name:
+                    value = lookups[field.attribute].get(name)
+                    if value is None:
+                        raise ValueError("Column '%s': %s '%s' does not exist"
+                                         % (field.column_name,
+                                            widget.model.__name__, name))
+            else:
+                value = field.clean(row)
+            if getattr(obj, model_field.attname) != value:
+                setattr(obj, model_field.attname, value)
+                changes[model_field.attname] = value
+        return changes, m2m
+
+    def bulk_import_data(self, dataset, chunk_size=1000):
+        """
+        Import DATASET with bulk queries, CHUNK_SIZE rows at a time: the
+        lookup tables are loaded once, the existing medical experts are
+        matched by oid, the new ones are inserted with bulk_create and the
+        changed ones updated with one UPDATE per chunk; the rows repeating
+        an oid are merged in order. Return the number of new, updated and
+        unchanged medical experts
+        """
+        lookups = self.get_lookups(dataset.headers)
+        rows = dataset.dict
+        totals = Counter()
+        with transaction.atomic():
+            for i in range(0, len(rows), chunk_size):
+                try:
+                    totals.update(self.bulk_import_chunk(
+                        rows[i:i + chunk_size], lookups, chunk_size))
+                except ValueError as e:
+                    raise ValueError('Rows %d-%d: %s' % (
+                        i + 1, i + chunk_size, e))
+        return totals
+
+    def bulk_import_chunk(self, rows, lookups, chunk_size):
+        model = self._meta.model
+        m2m_fields = dict(
+            (field.attribute, model._meta.get_field(field.attribute))
+            for field in self.get_fields()
+            if isinstance(field.widget, ManyToManyWidget))
+        oids = [row['oid'] for row in rows if row.get('oid')]
+        medical_experts = dict(
+            (medical_expert.oid, medical_expert)
+            for medical_expert in model._base_manager.filter(oid__in=oids))
+        old_m2m = self.get_m2m_values(
+            m2m_fields, [obj.pk for obj in medical_experts.values()])
+
+        now = timezone.now()
+        new_objs = []
+        changes = {}
+        m2m_changes = []
+        for row in rows:
+            obj = medical_experts.get(row.get('oid')) or model()
+            obj_changes, obj_m2m = self.bulk_import_row(row, obj, lookups)
+            if obj.pk is None:
+                new_objs.append(obj)
+            else:
+                # the rows of the same medical expert apply in turn, the
+                # last one wins
+                obj_m2m = dict(
+                    (attribute, pks) for attribute, pks in obj_m2m.items()
+                    if pks != old_m2m[attribute][obj.pk])
+                if not obj_changes and not obj_m2m:
+                    continue
+                for attribute, pks in obj_m2m.items():
+                    old_m2m[attribute][obj.pk] = pks
+                obj_changes['last_changed_on'] = now
+                changes.setdefault(obj.pk, {}).update(obj_changes)
+            m2m_changes.append((obj, obj_m2m))
+        # each medical expert is counted once
+        totals = Counter(new=len(new_objs), update=len(changes),
+                         skip=len(medical_experts) - len(changes))
+
+        # the bulk queries bypass MedicalExpert.save, so the rollups and the
+        # search documents are updated once for the whole chunk
+        rollups = MedicalExpertRollup.objects.compute_totals(
+            model._base_manager.filter(pk__in=list(changes)))
+        bulk_update_rows(model, changes, chunk_size)
+        model.bulk_create_with_oids(new_objs)
+        self.bulk_set_m2m(m2m_fields, m2m_changes)
+
+        pks = list(changes) + [new_obj.pk for new_obj in new_objs]
+        deltas = Counter(MedicalExpertRollup.objects.compute_totals(
+            model._base_manager.filter(pk__in=pks)))
+        deltas.subtract(rollups)
+        MedicalExpertRollup.objects.apply_deltas(deltas)
+        MedicalExpertSearchDocument.objects.refresh(pks)
+        return totals
+
+    def get_m2m_values(self, m2m_fields, pks):
+        """
+        Return the {attribute: {pk: related pks}} values of the many to many
+        M2M_FIELDS of the medical experts PKS
+        """
+        values = {}
+        for attribute, field in m2m_fields.items():
+            values[attribute] = defaultdict(set)
+            rows = field.remote_field.through.objects.filter(
+                **{'%s__in' % field.m2m_field_name(): pks}).values_list(
+                    field.m2m_column_name(), field.m2m_reverse_name())
+            for pk, related_pk in rows:
+                values[attribute][pk].add(related_pk)
+        return values
+
+    def bulk_set_m2m(self, m2m_fields, m2m_changes):
+        """
+        Replace the many to many rows of M2M_CHANGES, a list of
+        (obj, {attribute: related pks}) pairs, with one DELETE and one
+        bulk INSERT per field
+        """
+        for attribute, field in m2m_fields.items():
+            through = field.remote_field.through
+            values = dict((obj.pk, obj_values[attribute])
+                          for obj, obj_values in m2m_changes
+                          if attribute in obj_values)
+            if not values:
+                continue
+            through.objects.filter(**{
+                '%s__in' % field.m2m_field_name(): list(values)}).delete()
+            through.objects.bulk_create([
+                through(**{field.m2m_column_name(): pk,
+                           field.m2m_reverse_name(): related_pk})
+                for pk in sorted(values) for related_pk in sorted(values[pk])])
+
 
 class MedicalExpertExportResource(MedicalExpertResource):
     combined_name = fields.Field(column_name='combined_name',
@@ -72,3 +262,69 @@ class MedicalExpertExportResource(MedicalExpertResource):
                         'justification_3', 'comment', 'comment_2',
                         'comment_3', 'comment_4', 'last_changed_on',
                         'last_changed_by')
+
+    def iter_export_rows(self, queryset=None, chunk_size=1000):
+        """
+        Yield the export headers, then the rows of QUERYSET (all the medical
+        experts by default) in pk order, loading CHUNK_SIZE medical experts
+        with their related objects at a time
+        """
+        fields = self.get_export_fields()
+        yield self.get_export_headers()
+
+        if queryset is None:
+            queryset = self.get_queryset()
+        queryset = queryset.select_related(*[
+            field.attribute for field in fields
+            if isinstance(field.widget, ForeignKeyWidget)]).prefetch_related(*[
+                field.attribute for field in fields
+                if isinstance(field.widget, ManyToManyWidget)]). \
+            order_by('pk')
+        last_pk = None
+        while True:
+            chunk = queryset if last_pk is None else \
+                queryset.filter(pk__gt=last_pk)
+            objs = list(chunk[:chunk_size])
+            if not objs:
+                return
+            for obj in objs:
+                yield [self.export_field(field, obj) for field in fields]
+            last_pk = objs[-1].pk
+
+    def export_to_file(self, f, file_format, queryset=None,
+                       chunk_size=1000):
+        """
+        Write the export of QUERYSET to F in FILE_FORMAT, csv or xlsx
+        """
+        rows = self.iter_export_rows(queryset, chunk_size)
+        if file_format == 'csv':
+            for line in iter_csv(rows):
+                f.write(line)
+        else:
+            write_xlsx(rows, f)
+
+    def export_response(self, file_format, queryset=None, chunk_size=1000):
+        """
+        Return a StreamingHttpResponse of the export of QUERYSET in
+        FILE_FORMAT. CSV lines are sent as they are produced, XLSX files are
+        written to a temporary file first as the format is zipped
+        """
+        if file_format == 'csv':
+            response = StreamingHttpResponse(
+                iter_csv(self.iter_export_rows(queryset, chunk_size)),
+                content_type='text/csv')
+        else:
+            f = tempfile.TemporaryFile()
+            self.export_to_file(f, file_format, queryset, chunk_size)
+            f.seek(0)
+            response = StreamingHttpResponse(
+                FileWrapper(f), content_type='application/vnd.openxmlformats-'
+                'officedocument.spreadsheetml.sheet')
+        response['Content-Disposition'] = \
+            'attachment; filename="medical_experts.%s"' % file_format
+        return response
+
+
+class MedicalExpertBaseDataExportResource(MedicalExpertExportResource):
+    class Meta:
+        fields = MedicalExpertExportResource.Meta.export_order
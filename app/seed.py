@@ -0,0 +1,372 @@
+"""
+Synthetic data for benchmarks.
+
+BenchmarkDataSeeder inserts medical experts, institutions, clinical trials,
+interventions, publications and events with bulk inserts, links them
+through all the relation tables and rebuilds the derived data (counters,
+rollups, connections and search documents) once at the end. The number of
+links of each object follows a Pareto distribution and the linked objects
+are picked with a power law, so that a few medical experts and a few
+institutions or trials concentrate most of the links, as in production.
+"""
+import random
+from datetime import datetime
+
+from django.db import transaction
+
+from app_helpers import models as helper_models
+from counters import get_link_counters, rebuild_link_counter
+from models import ActiveIngredient, ClinicalTrial, Event, Institution, \
+                   Intervention, MedicalExpert, MedicalExpertRollup, \
+                   MedicalExpertSearchDocument, Publication, months_list
+from models_relations import ClinicalTrialActiveIngredient, \
+                             ClinicalTrialInstitution, \
+                             ClinicalTrialIntervention, EventInstitution, \
+                             InstitutionInstitution, \
+                             InterventionInstitution, \
+                             InterventionIntervention, \
+                             MedicalExpertClinicalTrial, \
+                             MedicalExpertConnectionAuthor, \
+                             MedicalExpertConnectionCTCollaborator, \
+                             MedicalExpertConnectionEventParticipant, \
+                             MedicalExpertConnectionPhysician, \
+                             MedicalExpertConnectionResearcher, \
+                             MedicalExpertEvent, MedicalExpertInstitution, \
+                             MedicalExpertInstitutionCOI, \
+                             MedicalExpertPublication, \
+                             PublicationClinicalTrial
+
+# names of the lookup rows, some of them used by name in the API
+LOOKUPS = (
+    (helper_models.Country,
+     ('Austria', 'France', 'Germany', 'Italy', 'Spain', 'Switzerland',
+      'United Kingdom', 'United States')),
+    (helper_models.Profession,
+     ('Physician', 'Researcher', 'Nurse', 'Pharmacist')),
+    (helper_models.MedicalExpertise,
+     ('Cardiology', 'Dermatology', 'Neurology', 'Oncology', 'Pediatrics',
+      'Psychiatry', 'Radiology', 'Rheumatology')),
+    (helper_models.TherapeuticArea,
+     ('Cardiovascular', 'Immunology', 'Infectious Diseases', 'Metabolism',
+      'Neuroscience', 'Oncology', 'Respiratory')),
+    (helper_models.PersonGender, ('Female', 'Male')),
+    (helper_models.InstitutionSubtype,
+     ('Company', 'Hospital', 'Hospital Department', 'Medical Practice',
+      'University', 'University Department')),
+    (helper_models.MedicalExpertInstitutionPosition,
+     ('Head of Department', 'Professor', 'Role Physician', 'Researcher')),
+    (helper_models.MedicalExpertInstitutionNatureOfPayment,
+     ('Consulting Fee', 'Research Grant', 'Speaker Fee', 'Travel')),
+    (helper_models.MedicalExpertClinicalTrialPosition,
+     ('Principal Investigator', 'Sub Investigator', 'Study Chair')),
+    (helper_models.MedicalExpertPublicationPosition,
+     ('First Author', 'Co-Author', 'Last Author')),
+    (helper_models.MedicalExpertEventPosition,
+     ('Chair', 'Speaker', 'Panelist', 'Poster Presenter')),
+    (helper_models.ClinicalTrialCondition,
+     ('Asthma', 'Breast Cancer', 'Diabetes', 'Heart Failure',
+      'Hypertension', 'Lung Cancer', 'Multiple Sclerosis', 'Psoriasis')),
+    (helper_models.ClinicalTrialStudyPhase,
+     ('Phase 1', 'Phase 2', 'Phase 3', 'Phase 4')),
+    (helper_models.ClinicalTrialInstitutionRelationshipType,
+     ('Sponsor', 'Collaborator', 'Site')),
+    (helper_models.EventSubtype,
+     ('Congress', 'Symposium', 'Webinar', 'Workshop')),
+    (helper_models.PublicationSubtype,
+     ('Journal Article', 'Review', 'Case Report', 'Abstract')),
+    (helper_models.ActiveIngredientCategory,
+     ('Biologic', 'Small Molecule')),
+)
+
+CURRENCIES = (('EUR', u'\u20ac'), ('USD', '$'))
+
+
+class BenchmarkDataSeeder(object):
+    """
+    Insert the objects and links of VOLUMES, a {name: number} dict of the
+    medical_experts, institutions, clinical_trials, interventions,
+    publications and events. The number of links of an object per relation
+    follows a Pareto distribution of shape ALPHA (> 1) scaled to average
+    MEAN_DEGREE, capped to MAX_DEGREE
+    """
+
+    def __init__(self, volumes, alpha=1.5, mean_degree=5, max_degree=200,
+                 seed=0, batch_size=1000, log=None):
+        self.volumes = volumes
+        self.alpha = alpha
+        self.mean_degree = mean_degree
+        self.max_degree = max_degree
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.log = log or (lambda message: None)
+        self.label = 'Benchmark %s' % datetime.now().strftime('%Y%m%d%H%M%S')
+
+    def get_degree(self, minimum=0):
+        # paretovariate - 1 averages 1 / (alpha - 1)
+        degree = (self.random.paretovariate(self.alpha) - 1) * \
+            self.mean_degree * (self.alpha - 1)
+        return min(self.max_degree, minimum + int(round(degree)))
+
+    def pick(self, objects, number):
+        """
+        Return NUMBER distinct OBJECTS, the first ones being the most likely
+        """
+        number = min(number, len(objects))
+        picked = set()
+        while len(picked) < number:
+            picked.add(int(len(objects) * self.random.random() ** 2))
+        return [objects[i] for i in sorted(picked)]
+
+    def choice(self, objects):
+        return objects[int(len(objects) * self.random.random() ** 2)]
+
+    def get_lookups(self):
+        lookups = {}
+        for model, names in LOOKUPS:
+            lookups[model] = [model.objects.get_or_create(name=name)[0]
+                              for name in names]
+        lookups[helper_models.Currency] = [
+            helper_models.Currency.objects.get_or_create(
+                code=code, defaults={'symbol': symbol})[0]
+            for code, symbol in CURRENCIES]
+        return lookups
+
+    def create(self, model, objs):
+        objs = model.bulk_create_with_oids(objs, batch_size=self.batch_size)
+        self.log('%s: %d' % (model._meta.verbose_name_plural, len(objs)))
+        return objs
+
+    def link(self, model, rows):
+        model.objects.bulk_create(rows, batch_size=self.batch_size)
+        self.log('%s: %d' % (model._meta.verbose_name_plural, len(rows)))
+
+    def link_many_to_many(self, field, pairs):
+        through = field.remote_field.through
+        from_field = field.m2m_field_name()
+        to_field = field.m2m_reverse_field_name()
+        through.objects.bulk_create(
+            [through(**{'%s_id' % from_field: from_pk,
+                        '%s_id' % to_field: to_pk})
+             for from_pk, to_pk in pairs],
+            batch_size=self.batch_size)
+
+    def seed(self):
+        with transaction.atomic():
+            lookups = self.get_lookups()
+            objects = self.create_objects(lookups)
+            self.link_objects(lookups, *objects)
+        self.rebuild()
+
+    def create_objects(self, lookups):
+        countries = lookups[helper_models.Country]
+        subtypes = lookups[helper_models.InstitutionSubtype]
+        years = range(datetime.now().year - 10, datetime.now().year + 1)
+
+        institutions = self.create(Institution, [
+            Institution(
+                hospital_university='%s Institution %d' % (self.label, i),
+                institution_subtype=self.choice(subtypes),
+                country=self.choice(countries), city='City %d' % (i % 50),
+                weblink='http://example.com/institutions/%d' % i)
+            for i in range(self.volumes['institutions'])])
+        clinical_trials = self.create(ClinicalTrial, [
+            ClinicalTrial(
+                brief_public_title='%s Clinical Trial %d' % (self.label, i),
+                start_date_year=self.random.choice(years))
+            for i in range(self.volumes['clinical_trials'])])
+        interventions = self.create(Intervention, [
+            Intervention(name='%s Intervention %d' % (self.label, i))
+            for i in range(self.volumes['interventions'])])
+        active_ingredients = self.create(ActiveIngredient, [
+            ActiveIngredient(
+                name='%s Active Ingredient %d' % (self.label, i),
+                category=self.choice(
+                    lookups[helper_models.ActiveIngredientCategory]),
+                weblink='http://example.com/active-ingredients/%d' % i)
+            for i in range(max(1, self.volumes['interventions'] // 2))])
+        publications = self.create(Publication, [
+            Publication(
+                name='%s Publication %d' % (self.label, i),
+                publication_subtype=self.choice(
+                    lookups[helper_models.PublicationSubtype]),
+                publication_year=self.random.choice(years),
+                publication_month=self.random.choice(months_list),
+                weblink='http://example.com/publications/%d' % i)
+            for i in range(self.volumes['publications'])])
+        events = self.create(Event, [
+            Event(name='%s Event %d' % (self.label, i),
+                  event_subtype=self.choice(
+                      lookups[helper_models.EventSubtype]),
+                  country=self.choice(countries),
+                  start_date_year=self.random.choice(years),
+                  weblink='http://example.com/events/%d' % i)
+            for i in range(self.volumes['events'])])
+        medical_experts = self.create(MedicalExpert, [
+            MedicalExpert(
+                first_name='First %d' % i,
+                last_name='%s Last %d' % (self.label, i),
+                country=self.choice(countries),
+                profession=self.choice(lookups[helper_models.Profession]),
+                gender=self.random.choice(
+                    lookups[helper_models.PersonGender]),
+                city='City %d' % (i % 50))
+            for i in range(self.volumes['medical_experts'])])
+        return (medical_experts, institutions, clinical_trials, interventions,
+                active_ingredients, publications, events)
+
+    def link_objects(self, lookups, medical_experts, institutions,
+                     clinical_trials, interventions, active_ingredients,
+                     publications, events):
+        companies = [institution for institution in institutions
+                     if institution.institution_subtype.name == 'Company'] \
+            or institutions
+        relationship_types = dict(
+            (relationship_type.name, relationship_type) for relationship_type
+            in lookups[helper_models.ClinicalTrialInstitutionRelationshipType])
+        year = str(datetime.now().year)
+
+        self.link_many_to_many(MedicalExpert._meta.get_field('specialties'), [
+            (medical_expert.pk, specialty.pk)
+            for medical_expert in medical_experts
+            for specialty in self.pick(
+                lookups[helper_models.MedicalExpertise], self.get_degree(1))])
+        self.link_many_to_many(
+            MedicalExpert._meta.get_field('therapeutic_areas'), [
+                (medical_expert.pk, therapeutic_area.pk)
+                for medical_expert in medical_experts
+                for therapeutic_area in self.pick(
+                    lookups[helper_models.TherapeuticArea],
+                    self.get_degree(1))])
+        self.link_many_to_many(ClinicalTrial._meta.get_field('condition'), [
+            (clinical_trial.pk, condition.pk)
+            for clinical_trial in clinical_trials
+            for condition in self.pick(
+                lookups[helper_models.ClinicalTrialCondition],
+                self.get_degree(1))])
+        self.link_many_to_many(
+            ClinicalTrial._meta.get_field('study_phases'), [
+                (clinical_trial.pk,
+                 self.random.choice(
+                     lookups[helper_models.ClinicalTrialStudyPhase]).pk)
+                for clinical_trial in clinical_trials])
+
+        self.link(MedicalExpertInstitution, [
+            MedicalExpertInstitution(
+                medical_expert=medical_expert, institution=institution,
+                primary_affiliation=i == 0, past_position=i > 1,
+                position=self.choice(
+                    lookups[helper_models.MedicalExpertInstitutionPosition]),
+                year=year, weblink='')
+            for medical_expert in medical_experts
+            for i, institution in enumerate(self.pick(
+                institutions, min(self.get_degree(1), 5)))])
+        self.link(MedicalExpertInstitutionCOI, [
+            MedicalExpertInstitutionCOI(
+                medical_expert=medical_expert, institution=institution,
+                nature_of_payment=self.choice(lookups[
+                    helper_models.MedicalExpertInstitutionNatureOfPayment]),
+                currency=self.random.choice(lookups[helper_models.Currency]),
+                year=str(int(year) - self.random.randint(0, 5)),
+                amount=round(self.random.paretovariate(1.2) * 500, 2),
+                weblink='http://example.com/coi')
+            for medical_expert in medical_experts
+            for institution in self.pick(companies, self.get_degree())])
+        self.link(MedicalExpertClinicalTrial, [
+            MedicalExpertClinicalTrial(
+                medical_expert=medical_expert, clinical_trial=clinical_trial,
+                position=self.choice(lookups[
+                    helper_models.MedicalExpertClinicalTrialPosition]),
+                weblink='')
+            for medical_expert in medical_experts
+            for clinical_trial in self.pick(clinical_trials,
+                                            self.get_degree())])
+        self.link(MedicalExpertPublication, [
+            MedicalExpertPublication(
+                medical_expert=medical_expert, publication=publication,
+                position=self.choice(lookups[
+                    helper_models.MedicalExpertPublicationPosition]),
+                weblink='')
+            for medical_expert in medical_experts
+            for publication in self.pick(publications, self.get_degree())])
+        self.link(MedicalExpertEvent, [
+            MedicalExpertEvent(
+                medical_expert=medical_expert, event=event,
+                position=self.choice(
+                    lookups[helper_models.MedicalExpertEventPosition]))
+            for medical_expert in medical_experts
+            for event in self.pick(events, self.get_degree())])
+
+        clinical_trial_institutions = []
+        for clinical_trial in clinical_trials:
+            clinical_trial_institutions.append(ClinicalTrialInstitution(
+                clinical_trial=clinical_trial,
+                institution=self.choice(companies),
+                relationship_type=relationship_types['Sponsor']))
+            for institution in self.pick(institutions, self.get_degree()):
+                clinical_trial_institutions.append(ClinicalTrialInstitution(
+                    clinical_trial=clinical_trial, institution=institution,
+                    relationship_type=relationship_types['Site']))
+        self.link(ClinicalTrialInstitution, clinical_trial_institutions)
+        self.link(ClinicalTrialIntervention, [
+            ClinicalTrialIntervention(clinical_trial=clinical_trial,
+                                      intervention=intervention)
+            for clinical_trial in clinical_trials
+            for intervention in self.pick(interventions, self.get_degree(1))])
+        self.link(ClinicalTrialActiveIngredient, [
+            ClinicalTrialActiveIngredient(clinical_trial=clinical_trial,
+                                          active_ingredient=active_ingredient)
+            for clinical_trial in clinical_trials
+            for active_ingredient in self.pick(active_ingredients,
+                                               self.get_degree())])
+        self.link(PublicationClinicalTrial, [
+            PublicationClinicalTrial(publication=publication,
+                                     clinical_trial=clinical_trial)
+            for publication in publications
+            for clinical_trial in self.pick(clinical_trials,
+                                            self.get_degree() // 2)])
+        self.link(EventInstitution, [
+            EventInstitution(event=event, institution=institution)
+            for event in events
+            for institution in self.pick(institutions, self.get_degree())])
+        self.link(InterventionInstitution, [
+            InterventionInstitution(intervention=intervention,
+                                    institution=institution)
+            for intervention in interventions
+            for institution in self.pick(companies, self.get_degree(1))])
+        self.link(InterventionIntervention, [
+            InterventionIntervention(intervention=intervention,
+                                     intervention_related=related)
+            for intervention in interventions
+            for related in self.pick(interventions, self.get_degree() // 2)
+            if related != intervention])
+        self.link(InstitutionInstitution, [
+            InstitutionInstitution(institution=institution,
+                                   institution_related=related)
+            for institution in institutions
+            for related in self.pick(institutions, self.get_degree() // 2)
+            if related != institution])
+
+    def rebuild(self):
+        """
+        Recompute the data derived from the links, which the bulk inserts
+        did not maintain
+        """
+        for link_counter in get_link_counters():
+            for drifted in rebuild_link_counter(link_counter,
+                                                chunk_size=self.batch_size):
+                pass
+        self.log('Rebuilt the counters')
+        MedicalExpertRollup.objects.rebuild()
+        self.log('Rebuilt the rollups')
+        for connection_model in (MedicalExpertConnectionAuthor,
+                                 MedicalExpertConnectionCTCollaborator,
+                                 MedicalExpertConnectionEventParticipant,
+                                 MedicalExpertConnectionPhysician,
+                                 MedicalExpertConnectionResearcher):
+            total = connection_model.objects.rebuild(
+                chunk_size=self.batch_size)
+            self.log('%s: %d' % (connection_model._meta.verbose_name_plural,
+                                 total))
+        MedicalExpertSearchDocument.objects.rebuild(
+            chunk_size=self.batch_size)
+        self.log('Rebuilt the search documents')
@@ -1,5 +1,25 @@
+import tempfile
+from StringIO import StringIO
+
+import openpyxl
+import tablib
+from django.core.management import call_command
 from django.test import TestCase
-from ..models import Institution, MedicalExpert
+from app_helpers.models import Country, InstitutionSubtype, \
+                               MedicalExpertInstitutionPosition, \
+                               MedicalExpertise, Profession, TherapeuticArea
+from ..counters import deferred_counters, get_link_counters, \
+                        rebuild_link_counter
+from ..resources import MedicalExpertExportResource, MedicalExpertResource
+from ..models import Event, Institution, MedicalExpert, MedicalExpertRollup, \
+                     MedicalExpertSearchDocument, MedicalExpertSearchTrigram, \
+                     Publication
+from ..models_relations import MedicalExpertConnectionAuthor, \
+                               MedicalExpertConnectionPhysician, \
+                               MedicalExpertConnectionResearcher, \
+                               MedicalExpertEvent, MedicalExpertInstitution, \
+                               MedicalExpertInstitutionCOI, \
+                               MedicalExpertPublication
 
 
 class MedicalExpertTest(TestCase):
@@ -19,6 +39,44 @@ class MedicalExpertTest(TestCase):
         self.assertEqual(
             medical_expert_2.number_linked_clinical_trials, 2)
 
+    def test_oid(self):
+        with self.assertNumQueries(2):
+            country = Country.objects.create(name='Austria')
+        self.assertEqual(country.oid, Country.format_oid(country.pk, 'c'))
+        self.assertEqual(Country.objects.get(pk=country.pk).oid, country.oid)
+
+        countries = Country.bulk_create_with_oids(
+            [Country(name='Germany'), Country(name='Italy')])
+        self.assertEqual(
+            list(Country.objects.order_by('pk').values_list('name', 'oid')),
+            [(name, Country.format_oid(pk, 'c')) for pk, name in
+             Country.objects.order_by('pk').values_list('pk', 'name')])
+        self.assertEqual(len(countries), 2)
+        self.assertEqual([obj.pk for obj in countries],
+                         list(Country.objects.filter(
+                             name__in=['Germany', 'Italy']).order_by('pk').
+                             values_list('pk', flat=True)))
+
+    def test_bulk_create_with_oids_concurrent_insert(self):
+        manager = Country._base_manager
+        bulk_create = manager.bulk_create
+
+        def bulk_create_concurrently(objs, *args, **kwargs):
+            objs = bulk_create(objs, *args, **kwargs)
+            Country.objects.create(name='Concurrent')
+            # the ids are unknown as on MySQL
+            for obj in objs:
+                obj.pk = None
+            return objs
+
+        manager.bulk_create = bulk_create_concurrently
+        try:
+            with self.assertRaises(RuntimeError):
+                Country.bulk_create_with_oids([Country(name='Germany')])
+        finally:
+            del manager.bulk_create
+        self.assertFalse(Country.objects.exists())
+
 
 class InstitutionTest(TestCase):
     def setUp(self):
@@ -45,3 +103,578 @@ class InstitutionTest(TestCase):
             institution_2.combined_name(), 'Hospital 2, Department 2')
         self.assertEqual(
             institution_2.phone(), None)
+
+
+class MedicalExpertRollupTest(TestCase):
+    def setUp(self):
+        self.austria = Country.objects.create(name='Austria')
+        self.germany = Country.objects.create(name='Germany')
+        self.doctor = Profession.objects.create(name='Doctor')
+        self.specialty_1 = MedicalExpertise.objects.create(name='Specialty 1')
+        self.specialty_2 = MedicalExpertise.objects.create(name='Specialty 2')
+        self.medical_expert_1 = MedicalExpert.objects.create(
+            first_name='First_first', last_name='First_last',
+            country=self.austria, profession=self.doctor,
+            number_linked_clinical_trials=1)
+        self.medical_expert_1.specialties.add(self.specialty_1,
+                                              self.specialty_2)
+        self.medical_expert_2 = MedicalExpert.objects.create(
+            first_name='Second_first', last_name='Second_last',
+            country=self.austria, number_linked_events=2)
+        self.medical_expert_2.specialties.add(self.specialty_1)
+
+    def assertRollupsUpToDate(self):
+        rollups = dict(
+            ((rollup.segment, rollup.dimension, rollup.name), rollup.total)
+            for rollup in MedicalExpertRollup.objects.filter(total__gt=0))
+        self.assertEqual(rollups, dict(
+            MedicalExpertRollup.objects.compute_totals(
+                MedicalExpert.objects.all())))
+
+    def test_medical_expert_rollup_create(self):
+        self.assertRollupsUpToDate()
+        self.assertEqual(
+            MedicalExpertRollup.objects.totals(
+                MedicalExpertRollup.SEGMENT_INVESTIGATORS,
+                MedicalExpertRollup.DIMENSION_SPECIALTY),
+            [{'specialties__name': 'Specialty 1', 'total': 1},
+             {'specialties__name': 'Specialty 2', 'total': 1}])
+        self.assertEqual(
+            MedicalExpertRollup.objects.totals(
+                MedicalExpertRollup.SEGMENT_SPEAKERS,
+                MedicalExpertRollup.DIMENSION_COUNTRY),
+            [{'country__name': 'Austria', 'total': 1}])
+
+    def test_medical_expert_rollup_update(self):
+        self.medical_expert_1.country = self.germany
+        self.medical_expert_1.number_linked_events = 1
+        self.medical_expert_1.save()
+        self.assertRollupsUpToDate()
+        self.medical_expert_2.number_linked_events = 0
+        self.medical_expert_2.number_linked_clinical_trials = 3
+        self.medical_expert_2.profession = self.doctor
+        self.medical_expert_2.save()
+        self.assertRollupsUpToDate()
+
+    def test_medical_expert_rollup_specialties(self):
+        self.medical_expert_1.specialties.remove(self.specialty_2)
+        self.assertRollupsUpToDate()
+        self.specialty_2.app_medicalexpert_related.add(self.medical_expert_2)
+        self.assertRollupsUpToDate()
+        self.specialty_1.app_medicalexpert_related.clear()
+        self.assertRollupsUpToDate()
+        self.medical_expert_2.specialties.clear()
+        self.assertRollupsUpToDate()
+
+    def test_medical_expert_rollup_delete(self):
+        self.medical_expert_1.delete()
+        self.assertRollupsUpToDate()
+        deleted, deleted_per_model = MedicalExpert.objects.all().delete()
+        self.assertEqual(deleted_per_model['app.MedicalExpert'], 1)
+        self.assertRollupsUpToDate()
+
+    def test_medical_expert_rollup_lookups(self):
+        self.austria.name = 'Republic of Austria'
+        self.austria.save()
+        self.specialty_1.name = 'Specialty 2b'
+        self.specialty_1.save()
+        self.doctor.name = 'Physician'
+        self.doctor.save()
+        self.assertRollupsUpToDate()
+        self.specialty_2.delete()
+        self.germany.delete()
+        self.austria.delete()
+        self.assertRollupsUpToDate()
+
+    def test_medical_expert_rollup_rebuild(self):
+        MedicalExpertRollup.objects.update(total=0)
+        MedicalExpertRollup.objects.rebuild()
+        self.assertRollupsUpToDate()
+
+
+class MedicalExpertConnectionTest(TestCase):
+    def setUp(self):
+        self.medical_expert_1 = MedicalExpert.objects.create(
+            first_name='First_first', last_name='First_last')
+        self.medical_expert_2 = MedicalExpert.objects.create(
+            first_name='Second_first', last_name='Second_last')
+        self.medical_expert_3 = MedicalExpert.objects.create(
+            first_name='Third_first', last_name='Third_last')
+        self.publication_1 = Publication.objects.create(name='Publication 1')
+        self.publication_2 = Publication.objects.create(name='Publication 2')
+
+    def get_connections(self, connection_model):
+        return set(connection_model.objects.values_list(
+            'medical_expert', 'connected_medical_expert'))
+
+    def test_medical_expert_connection_authors(self):
+        MedicalExpertPublication.objects.create(
+            medical_expert=self.medical_expert_1,
+            publication=self.publication_1)
+        MedicalExpertPublication.objects.create(
+            medical_expert=self.medical_expert_2,
+            publication=self.publication_1)
+        link = MedicalExpertPublication.objects.create(
+            medical_expert=self.medical_expert_3,
+            publication=self.publication_1)
+        MedicalExpertPublication.objects.create(
+            medical_expert=self.medical_expert_1,
+            publication=self.publication_2)
+        connections = MedicalExpertConnectionAuthor.objects.get_connections()
+        self.assertEqual(len(connections), 6)
+        self.assertEqual(
+            self.get_connections(MedicalExpertConnectionAuthor), connections)
+
+        link.delete()
+        self.assertEqual(
+            self.get_connections(MedicalExpertConnectionAuthor),
+            set([(self.medical_expert_1.pk, self.medical_expert_2.pk),
+                 (self.medical_expert_2.pk, self.medical_expert_1.pk)]))
+
+        MedicalExpertPublication.objects. \
+            filter(medical_expert=self.medical_expert_2).delete()
+        self.assertEqual(
+            self.get_connections(MedicalExpertConnectionAuthor), set())
+
+    def test_medical_expert_connection_physicians(self):
+        hospital = InstitutionSubtype.objects.create(name='Hospital')
+        physician = MedicalExpertInstitutionPosition.objects.create(
+            name='Role Physician')
+        other_position = MedicalExpertInstitutionPosition.objects.create(
+            name='Position 1')
+        institution = Institution.objects.create(
+            hospital_university='Institution 1',
+            institution_subtype=hospital)
+        MedicalExpertInstitution.objects.create(
+            medical_expert=self.medical_expert_1, institution=institution,
+            primary_affiliation=True, position=physician)
+        MedicalExpertInstitution.objects.create(
+            medical_expert=self.medical_expert_2, institution=institution,
+            primary_affiliation=True, position=other_position)
+        self.assertEqual(
+            self.get_connections(MedicalExpertConnectionPhysician),
+            set([(self.medical_expert_1.pk, self.medical_expert_2.pk)]))
+        self.assertEqual(
+            self.get_connections(MedicalExpertConnectionResearcher),
+            set([(self.medical_expert_2.pk, self.medical_expert_1.pk)]))
+
+        MedicalExpertConnectionPhysician.objects.all().delete()
+        self.assertEqual(MedicalExpertConnectionPhysician.objects.rebuild(), 1)
+        self.assertEqual(
+            self.get_connections(MedicalExpertConnectionPhysician),
+            set([(self.medical_expert_1.pk, self.medical_expert_2.pk)]))
+
+        # the subtype of the institution decides the kind of connection
+        institution.institution_subtype = InstitutionSubtype.objects.create(
+            name='Company')
+        institution.save()
+        self.assertEqual(
+            self.get_connections(MedicalExpertConnectionPhysician), set())
+        self.assertEqual(
+            self.get_connections(MedicalExpertConnectionResearcher),
+            set([(self.medical_expert_1.pk, self.medical_expert_2.pk),
+                 (self.medical_expert_2.pk, self.medical_expert_1.pk)]))
+
+    def test_medical_expert_connection_moved(self):
+        MedicalExpertPublication.objects.create(
+            medical_expert=self.medical_expert_1,
+            publication=self.publication_1)
+        link = MedicalExpertPublication.objects.create(
+            medical_expert=self.medical_expert_2,
+            publication=self.publication_1)
+        link.medical_expert = self.medical_expert_3
+        link.save()
+        self.assertEqual(
+            self.get_connections(MedicalExpertConnectionAuthor),
+            set([(self.medical_expert_1.pk, self.medical_expert_3.pk),
+                 (self.medical_expert_3.pk, self.medical_expert_1.pk)]))
+        self.assertEqual(MedicalExpert.objects.get(
+            pk=self.medical_expert_2.pk).number_linked_publications, 0)
+
+    def test_medical_expert_connection_deferred(self):
+        with deferred_counters():
+            for medical_expert in (self.medical_expert_1,
+                                   self.medical_expert_2,
+                                   self.medical_expert_3):
+                MedicalExpertPublication.objects.create(
+                    medical_expert=medical_expert,
+                    publication=self.publication_1)
+            self.assertEqual(
+                self.get_connections(MedicalExpertConnectionAuthor), set())
+        self.assertEqual(
+            len(self.get_connections(MedicalExpertConnectionAuthor)), 6)
+
+
+class MedicalExpertSearchDocumentTest(TestCase):
+    def setUp(self):
+        self.austria = Country.objects.create(name='Austria')
+        self.oncology = TherapeuticArea.objects.create(name='Oncology')
+        self.medical_expert_1 = MedicalExpert.objects.create(
+            first_name='Anna', last_name='Muller', city='Wien',
+            country=self.austria)
+        self.medical_expert_1.therapeutic_areas.add(self.oncology)
+        self.medical_expert_2 = MedicalExpert.objects.create(
+            first_name=u'J\xf6rg', middle_name='Hans', last_name='Annaberg',
+            city='Graz')
+
+    def search(self, text, field='document'):
+        return set(MedicalExpert.objects.filter(
+            pk__in=MedicalExpertSearchDocument.objects.search(text, field)).
+            values_list('first_name', flat=True))
+
+    def test_medical_expert_search_document(self):
+        self.assertEqual(self.search('ann'), set(['Anna', u'J\xf6rg']))
+        self.assertEqual(self.search('ANNA', 'first_name'), set(['Anna']))
+        self.assertEqual(self.search('an', 'last_name'), set([u'J\xf6rg']))
+        self.assertEqual(self.search('jorg'), set([u'J\xf6rg']))
+        self.assertEqual(self.search('stria', 'country'), set(['Anna']))
+        self.assertEqual(self.search('onco', 'therapeutic_areas'),
+                         set(['Anna']))
+        self.assertEqual(self.search('vienna'), set())
+        for first_name in ('an', 'Ann', 'nna', 'rg', 'x'):
+            self.assertEqual(
+                self.search(first_name, 'first_name'),
+                set(MedicalExpert.objects.
+                    filter(first_name__icontains=first_name).
+                    values_list('first_name', flat=True)))
+
+    def test_medical_expert_search_document_update(self):
+        self.medical_expert_2.city = 'Vienna'
+        self.medical_expert_2.save()
+        self.assertEqual(self.search('vienna'), set([u'J\xf6rg']))
+
+        self.austria.name = 'Osterreich'
+        self.austria.save()
+        self.assertEqual(self.search('austria'), set())
+        self.assertEqual(self.search('oster', 'country'), set(['Anna']))
+
+        self.oncology.app_medicalexpert_related.add(self.medical_expert_2)
+        self.assertEqual(self.search('oncology'), set(['Anna', u'J\xf6rg']))
+        self.oncology.app_medicalexpert_related.clear()
+        self.assertEqual(self.search('oncology'), set())
+
+        self.medical_expert_1.delete()
+        self.assertFalse(MedicalExpertSearchTrigram.objects.filter(
+            medical_expert=self.medical_expert_1.pk).exists())
+        self.assertEqual(MedicalExpertSearchDocument.objects.rebuild(), 1)
+        self.assertEqual(self.search('vienna'), set([u'J\xf6rg']))
+
+
+class MedicalExpertCountersTest(TestCase):
+    def setUp(self):
+        company = InstitutionSubtype.objects.create(name='Company')
+        self.institution_1 = Institution.objects.create(
+            hospital_university='Institution 1', institution_subtype=company)
+        self.institution_2 = Institution.objects.create(
+            hospital_university='Institution 2')
+        self.medical_expert = MedicalExpert.objects.create(
+            first_name='First_first', last_name='First_last',
+            country=Country.objects.create(name='Austria'))
+
+    def test_medical_expert_counters(self):
+        MedicalExpertInstitution.objects.create(
+            medical_expert=self.medical_expert, institution=self.institution_1,
+            primary_affiliation=True)
+        medical_expert = MedicalExpert.objects.get(pk=self.medical_expert.pk)
+        self.assertEqual(medical_expert.number_linked_institutions, 1)
+        self.assertEqual(
+            medical_expert.number_linked_institutions_primary_affiliation, 1)
+        self.assertEqual(
+            medical_expert.number_linked_institutions_subtype_company, 1)
+
+    def test_medical_expert_counters_deferred(self):
+        with deferred_counters():
+            for institution in (self.institution_1, self.institution_2):
+                MedicalExpertInstitution.objects.create(
+                    medical_expert=self.medical_expert,
+                    institution=institution, primary_affiliation=False)
+            self.assertEqual(MedicalExpert.objects.get(
+                pk=self.medical_expert.pk).number_linked_institutions, 0)
+        medical_expert = MedicalExpert.objects.get(pk=self.medical_expert.pk)
+        self.assertEqual(medical_expert.number_linked_institutions, 2)
+        self.assertEqual(
+            medical_expert.number_linked_institutions_primary_affiliation, 0)
+        self.assertEqual(
+            medical_expert.number_linked_institutions_subtype_company, 1)
+        self.assertEqual(Institution.objects.get(
+            pk=self.institution_2.pk).number_linked_medical_experts, 1)
+
+    def test_medical_expert_counters_rollups(self):
+        event = Event.objects.create(name='Event 1')
+        medical_expert_event = MedicalExpertEvent.objects.create(
+            medical_expert=self.medical_expert, event=event)
+        self.assertEqual(MedicalExpert.objects.get(
+            pk=self.medical_expert.pk).number_linked_events, 1)
+        self.assertEqual(
+            MedicalExpertRollup.objects.totals(
+                MedicalExpertRollup.SEGMENT_SPEAKERS,
+                MedicalExpertRollup.DIMENSION_COUNTRY),
+            [{'country__name': 'Austria', 'total': 1}])
+        medical_expert_event.delete()
+        self.assertEqual(
+            MedicalExpertRollup.objects.totals(
+                MedicalExpertRollup.SEGMENT_SPEAKERS,
+                MedicalExpertRollup.DIMENSION_COUNTRY), [])
+
+    def test_medical_expert_counters_queryset_delete(self):
+        medical_expert_2 = MedicalExpert.objects.create(
+            first_name='Second_first', last_name='Second_last')
+        for medical_expert in (self.medical_expert, medical_expert_2):
+            for institution in (self.institution_1, self.institution_2):
+                MedicalExpertInstitution.objects.create(
+                    medical_expert=medical_expert, institution=institution,
+                    primary_affiliation=False)
+                MedicalExpertInstitutionCOI.objects.create(
+                    medical_expert=medical_expert, institution=institution,
+                    year='2018', weblink='http://example.com')
+        MedicalExpertInstitution.objects.filter(
+            institution=self.institution_1).delete()
+        MedicalExpertInstitutionCOI.objects.all().delete()
+        for medical_expert in MedicalExpert.objects.all():
+            self.assertEqual(medical_expert.number_linked_institutions, 1)
+            self.assertEqual(
+                medical_expert.number_linked_institutions_subtype_company, 0)
+            self.assertEqual(medical_expert.number_linked_institutions_coi, 0)
+        self.assertEqual(
+            list(Institution.objects.order_by('pk').values_list(
+                'number_linked_medical_experts',
+                'number_linked_medical_experts_coi')),
+            [(0, 0), (2, 0)])
+
+    def test_rebuild_link_counters(self):
+        MedicalExpertInstitution(
+            medical_expert=self.medical_expert, institution=self.institution_1,
+            primary_affiliation=True).save(ignore_update_related=True)
+        out = StringIO()
+        call_command('rebuild_link_counters', model='MedicalExpert',
+                     stdout=out)
+        self.assertIn(
+            'MedicalExpert.number_linked_institutions: 1 rows drifted',
+            out.getvalue())
+        self.assertIn(
+            'MedicalExpert.number_linked_events: 0 rows drifted',
+            out.getvalue())
+        self.assertNotIn('Institution.', out.getvalue())
+        self.assertEqual(MedicalExpert.objects.get(
+            pk=self.medical_expert.pk).number_linked_institutions, 1)
+        self.assertEqual(Institution.objects.get(
+            pk=self.institution_1.pk).number_linked_medical_experts, 0)
+
+        out = StringIO()
+        call_command('rebuild_link_counters',
+                     counter='number_linked_medical_experts',
+                     min_pk=self.institution_1.pk,
+                     max_pk=self.institution_1.pk, stdout=out)
+        self.assertEqual(Institution.objects.get(
+            pk=self.institution_1.pk).number_linked_medical_experts, 1)
+
+
+class MedicalExpertBulkImportTest(TestCase):
+    def setUp(self):
+        self.austria = Country.objects.create(name='Austria')
+        self.germany = Country.objects.create(name='Germany')
+        self.specialty_1 = MedicalExpertise.objects.create(name='Specialty 1')
+        self.specialty_2 = MedicalExpertise.objects.create(name='Specialty 2')
+        self.medical_expert_1 = MedicalExpert.objects.create(
+            first_name='First_first', last_name='First_last',
+            country=self.austria, number_linked_events=1)
+        self.medical_expert_1.specialties.add(self.specialty_1)
+        self.medical_expert_2 = MedicalExpert.objects.create(
+            first_name='Second_first', last_name='Second_last')
+
+    def test_bulk_import(self):
+        dataset = tablib.Dataset(headers=[
+            'oid', 'first_name', 'last_name', 'country', 'specialties',
+            'number_linked_events'])
+        dataset.append([self.medical_expert_1.oid, 'First_first',
+                        'First_last', 'Germany', 'Specialty 1|Specialty 2',
+                        1])
+        dataset.append([self.medical_expert_2.oid, 'Second_first',
+                        'Second_last', '', '', 0])
+        dataset.append(['', 'Third_first', 'Third_last', 'Austria',
+                        'Specialty 2', 1])
+        totals = MedicalExpertResource().bulk_import_data(dataset)
+        self.assertEqual(totals, {'new': 1, 'update': 1, 'skip': 1})
+
+        medical_expert_1 = MedicalExpert.objects.get(
+            pk=self.medical_expert_1.pk)
+        self.assertEqual(medical_expert_1.country, self.germany)
+        self.assertEqual(
+            set(medical_expert_1.specialties.values_list('name', flat=True)),
+            set(['Specialty 1', 'Specialty 2']))
+        medical_expert_3 = MedicalExpert.objects.get(first_name='Third_first')
+        self.assertEqual(medical_expert_3.oid, MedicalExpert.format_oid(
+            medical_expert_3.pk, 'me'))
+        self.assertEqual(
+            list(medical_expert_3.specialties.values_list('name', flat=True)),
+            ['Specialty 2'])
+        self.assertEqual(
+            MedicalExpertRollup.objects.totals(
+                MedicalExpertRollup.SEGMENT_SPEAKERS,
+                MedicalExpertRollup.DIMENSION_COUNTRY),
+            [{'country__name': 'Austria', 'total': 1},
+             {'country__name': 'Germany', 'total': 1}])
+        self.assertEqual(
+            list(MedicalExpert.objects.filter(
+                medicalexpertsearchdocument__document__contains='germany').
+                values_list('pk', flat=True)),
+            [self.medical_expert_1.pk])
+
+        dataset.append(['', 'Fourth_first', 'Fourth_last', 'Spain', '', 0])
+        with self.assertRaises(ValueError):
+            MedicalExpertResource().bulk_import_data(dataset)
+        self.assertFalse(
+            MedicalExpert.objects.filter(first_name='Fourth_first').exists())
+
+    def test_bulk_import_repeated_oid(self):
+        dataset = tablib.Dataset(headers=[
+            'oid', 'first_name', 'last_name', 'specialties'])
+        dataset.append([self.medical_expert_2.oid, 'Bob', 'Second_last',
+                        'Specialty 1'])
+        dataset.append([self.medical_expert_2.oid, 'Bob', 'Z', ''])
+        dataset.append([self.medical_expert_1.oid, 'First_first',
+                        'First_last', ''])
+        dataset.append([self.medical_expert_1.oid, 'Anna', 'First_last', ''])
+        totals = MedicalExpertResource().bulk_import_data(dataset)
+        self.assertEqual(totals, {'new': 0, 'update': 2, 'skip': 0})
+
+        medical_expert_1 = MedicalExpert.objects.get(
+            pk=self.medical_expert_1.pk)
+        self.assertEqual(medical_expert_1.first_name, 'Anna')
+        self.assertEqual(medical_expert_1.specialties.count(), 0)
+        medical_expert_2 = MedicalExpert.objects.get(
+            pk=self.medical_expert_2.pk)
+        self.assertEqual(
+            (medical_expert_2.first_name, medical_expert_2.last_name),
+            ('Bob', 'Z'))
+        self.assertEqual(medical_expert_2.specialties.count(), 0)
+
+
+class MedicalExpertSimilarMatchesTest(TestCase):
+    def setUp(self):
+        self.medical_expert_1 = MedicalExpert.objects.create(
+            first_name='Johann', last_name='Mueller')
+        self.medical_expert_2 = MedicalExpert.objects.create(
+            first_name='Johan', last_name=u'M\xfcller')
+        self.medical_expert_3 = MedicalExpert.objects.create(
+            first_name='Johann', last_name='Schmidt')
+
+    def test_find_similar_matches(self):
+        similar = MedicalExpertResource().find_similar_matches([
+            {'first_name': 'Johann', 'last_name': 'Muller'},
+            {'first_name': 'Anna', 'last_name': 'Mueller'},
+            {'first_name': 'Jo', 'last_name': 'Li'}])
+        self.assertEqual(
+            [[medical_expert for medical_expert, score in matches]
+             for matches in similar],
+            [[self.medical_expert_1.pk, self.medical_expert_2.pk], [], []])
+
+    def test_find_similar_blocking(self):
+        medical_expert_4 = MedicalExpert.objects.create(
+            first_name='Jo', last_name='Li', city='Mueller')
+        # only the last names are blocked on, not the other fields
+        candidates = MedicalExpertSearchDocument.objects. \
+            get_blocking_candidates(['mueller', 'li', 'lu', 'la'], 0.7)
+        self.assertEqual(candidates, {
+            'mueller': set([self.medical_expert_1.pk,
+                            self.medical_expert_2.pk]),
+            'li': set([medical_expert_4.pk]),
+            'lu': set([medical_expert_4.pk]),
+            'la': set([medical_expert_4.pk])})
+        similar = MedicalExpertResource().find_similar_matches([
+            {'first_name': 'Jo', 'last_name': 'Li'}])
+        self.assertEqual([medical_expert for medical_expert, score in
+                          similar[0]], [medical_expert_4.pk])
+        # 'muller' only shares the frequent keys 'lle' and 'ler', and does
+        # not sound like 'xueller'
+        candidates = MedicalExpertSearchDocument.objects. \
+            get_blocking_candidates(['xueller'], 0.7, max_key_frequency=1)
+        self.assertEqual(candidates['xueller'],
+                         set([self.medical_expert_1.pk]))
+        candidates = MedicalExpertSearchDocument.objects. \
+            get_blocking_candidates(['xueller'], 0.7)
+        self.assertEqual(candidates['xueller'],
+                         set([self.medical_expert_1.pk,
+                              self.medical_expert_2.pk]))
+
+    def test_find_similar_phonetic(self):
+        medical_expert_4 = MedicalExpert.objects.create(
+            first_name='Anna', last_name='Meier')
+        medical_expert_5 = MedicalExpert.objects.create(
+            first_name='John', last_name='Smith')
+        # the names differing by one substitution share no trigram, and
+        # 'schmidt' sounds like 'smyth' too
+        candidates = MedicalExpertSearchDocument.objects. \
+            get_blocking_candidates(['meyer', 'smyth'], 0.8)
+        self.assertEqual(candidates, {
+            'meyer': set([medical_expert_4.pk]),
+            'smyth': set([self.medical_expert_3.pk, medical_expert_5.pk])})
+        similar = MedicalExpertResource().find_similar_matches([
+            {'first_name': 'Anna', 'last_name': 'Meyer'}])
+        self.assertEqual([medical_expert for medical_expert, score in
+                          similar[0]], [medical_expert_4.pk])
+
+    def test_report_duplicates(self):
+        out = StringIO()
+        call_command('report_duplicates', chunk_size=2, stdout=out)
+        self.assertEqual(out.getvalue().splitlines(), [
+            '%s\t%s\t0.92' % (self.medical_expert_1.oid,
+                              self.medical_expert_2.oid),
+            '1 likely duplicates'])
+
+
+class MedicalExpertExportTest(TestCase):
+    def setUp(self):
+        austria = Country.objects.create(name='Austria')
+        specialty_1 = MedicalExpertise.objects.create(name='Specialty 1')
+        specialty_2 = MedicalExpertise.objects.create(name='Specialty 2')
+        for i in range(5):
+            medical_expert = MedicalExpert.objects.create(
+                first_name='First_%d' % i, last_name='Last_%d' % i,
+                country=austria if i % 2 else None)
+            medical_expert.specialties.add(specialty_1, specialty_2)
+
+    def test_export_rows(self):
+        resource = MedicalExpertExportResource()
+        dataset = resource.export(MedicalExpert.objects.order_by('pk'))
+        # one query for the medical experts and one per many to many field
+        # for each chunk of 2, plus the last empty chunk
+        with self.assertNumQueries(10):
+            rows = list(resource.iter_export_rows(chunk_size=2))
+        self.assertEqual(rows[0], dataset.headers)
+        self.assertEqual(rows[1:], [list(row) for row in dataset])
+
+    def test_export_csv(self):
+        response = MedicalExpertExportResource().export_response('csv')
+        lines = ''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[0].startswith('oid,combined_name,degree,'))
+
+    def test_export_xlsx(self):
+        with tempfile.NamedTemporaryFile(suffix='.xlsx') as f:
+            call_command('export_medical_experts', f.name, chunk_size=2)
+            rows = list(openpyxl.load_workbook(f.name).active.values)
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][:2], (MedicalExpert.objects.order_by(
+            'pk').first().oid, 'First_0 Last_0'))
+
+
+class SeedBenchmarkDataTest(TestCase):
+    def test_seed_benchmark_data(self):
+        call_command('seed_benchmark_data', medical_experts=30,
+                     institutions=10, clinical_trials=15, interventions=6,
+                     publications=40, events=10, batch_size=100,
+                     stdout=StringIO())
+        self.assertEqual(MedicalExpert.objects.count(), 30)
+        self.assertEqual(Institution.objects.count(), 10)
+        for model in (MedicalExpertInstitution, MedicalExpertInstitutionCOI,
+                      MedicalExpertPublication, MedicalExpertEvent,
+                      MedicalExpertConnectionResearcher):
+            self.assertTrue(model.objects.exists(), model.__name__)
+        self.assertFalse(MedicalExpert.objects.filter(oid='').exists())
+        # the counters were rebuilt after the bulk inserts
+        for link_counter in get_link_counters():
+            for drifted in rebuild_link_counter(link_counter):
+                self.assertEqual(drifted, {}, link_counter.field)
+        self.assertTrue(MedicalExpertRollup.objects.exists())
+        self.assertEqual(MedicalExpertSearchDocument.objects.count(), 30)
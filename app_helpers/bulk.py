@@ -0,0 +1,44 @@
+from collections import defaultdict
+
+from django.db.models import Case, F, Value, When
+
+
+def bulk_update(model, field, values, chunk_size=1000):
+    """
+    Set FIELD of the MODEL rows to VALUES, a {pk: value} dict, with one
+    UPDATE ... CASE statement per CHUNK_SIZE rows
+    """
+    output_field = model._meta.get_field(field)
+    pks = sorted(values)
+    for i in range(0, len(pks), chunk_size):
+        chunk = pks[i:i + chunk_size]
+        pks_per_value = defaultdict(list)
+        for pk in chunk:
+            pks_per_value[values[pk]].append(pk)
+        model._base_manager.filter(pk__in=chunk).update(**{field: Case(
+            *[When(pk__in=value_pks, then=Value(value))
+              for value, value_pks in pks_per_value.items()],
+            output_field=output_field)})
+
+
+def bulk_update_rows(model, changes, chunk_size=1000):
+    """
+    Write CHANGES, a {pk: {attname: value}} dict, to the MODEL rows with one
+    UPDATE ... CASE statement per CHUNK_SIZE rows. The columns which are not
+    changed for a row keep their value
+    """
+    pks = sorted(changes)
+    for i in range(0, len(pks), chunk_size):
+        chunk = pks[i:i + chunk_size]
+        pks_per_field = defaultdict(list)
+        for pk in chunk:
+            for attname in changes[pk]:
+                pks_per_field[attname].append(pk)
+        updates = {}
+        for attname, field_pks in pks_per_field.items():
+            field = model._meta.get_field(attname)
+            updates[field.attname] = Case(
+                *[When(pk=pk, then=Value(changes[pk][attname]))
+                  for pk in field_pks],
+                default=F(field.attname), output_field=field)
+        model._base_manager.filter(pk__in=chunk).update(**updates)
@@ -0,0 +1,64 @@
+import hashlib
+import time
+
+from django.core.cache import cache
+from django.utils.encoding import force_bytes
+
+
+def get_generation_key(name, pk):
+    return 'generation:%s:%s' % (name, pk)
+
+
+def get_generation(name, pk):
+    """
+    Return the current generation of the NAME object PK. A missing
+    generation starts from the current time so that the entries cached
+    before it was evicted are not reused
+    """
+    key = get_generation_key(name, pk)
+    cache.add(key, int(time.time() * 1000), None)
+    generation = cache.get(key)
+    if generation is None:
+        generation = int(time.time() * 1000)
+    return generation
+
+
+def bump_generations(name, pks):
+    """
+    Bump the generations of the NAME objects PKS, which invalidates the
+    entries cached for them without looking for their keys
+    """
+    for pk in set(pk for pk in pks if pk):
+        key = get_generation_key(name, pk)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, int(time.time() * 1000), None)
+
+
+def make_cache_key(prefix, name, pk, params):
+    """
+    Return the cache key of PREFIX for the NAME object PK and PARAMS, a
+    list of (name, value) query parameters, at its current generation
+    """
+    params = '&'.join('%s=%s' % (param, value)
+                      for param, value in sorted(params))
+    return '%s:%s:%s:%s:%s' % (
+        prefix, name, pk, get_generation(name, pk),
+        hashlib.md5(force_bytes(params)).hexdigest())
+
+
+def get_table_generations(models):
+    """
+    Return the generations of the tables of MODELS
+    """
+    return [get_generation('table', model._meta.db_table)
+            for model in models]
+
+
+def bump_table_generations(models):
+    """
+    Bump the generations of the tables of MODELS, after writes which do not
+    change the last_changed_on of the rows linked to them
+    """
+    bump_generations('table', [model._meta.db_table for model in models])
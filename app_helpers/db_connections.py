@@ -0,0 +1,96 @@
+"""
+Health and reuse of the persistent database connections.
+
+Django keeps the connections open for CONN_MAX_AGE seconds. Before each
+request check_connections closes the open connections which served
+DB_CONN_MAX_USES requests or, with DB_CONN_HEALTH_CHECKS, do not answer
+a ping anymore, so that the request opens a new one instead of failing.
+The connections opened, their connect time and the connections reused
+are counted per process, for the report_db_connections command.
+"""
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connections
+
+from instrumentation import flush_process_data, get_flushed_process_data
+
+_lock = threading.Lock()
+_stats = defaultdict(Counter)
+
+
+def record(alias, **values):
+    with _lock:
+        _stats[alias].update(values)
+
+
+def get_stats():
+    """
+    Return the {alias: stats} of the connections of the process
+    """
+    with _lock:
+        return dict((alias, dict(stats)) for alias, stats in _stats.items())
+
+
+def timed_connect_factory(connection, get_new_connection):
+    def get_timed_new_connection(conn_params):
+        start = time.time()
+        new_connection = get_new_connection(conn_params)
+        connection.uses = 1
+        record(connection.alias, connects=1,
+               connect_ms=(time.time() - start) * 1000)
+        return new_connection
+    return get_timed_new_connection
+
+
+def install():
+    """
+    Time the new connections of the database connections of the thread
+    """
+    for connection in connections.all():
+        if getattr(connection, 'connect_timed', False):
+            continue
+        connection.get_new_connection = timed_connect_factory(
+            connection, connection.get_new_connection)
+        connection.connect_timed = True
+
+
+def check_connections():
+    """
+    Close the open connections of the thread which served DB_CONN_MAX_USES
+    requests or are not usable anymore, and count the others as reused
+    """
+    install()
+    for connection in connections.all():
+        # a connection in a transaction is not ours to close
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        uses = getattr(connection, 'uses', 0)
+        if uses >= settings.DB_CONN_MAX_USES:
+            connection.close()
+            record(connection.alias, closed_max_uses=1)
+        elif settings.DB_CONN_HEALTH_CHECKS and not connection.is_usable():
+            connection.close()
+            record(connection.alias, closed_unusable=1)
+        else:
+            connection.uses = uses + 1
+            record(connection.alias, reuses=1)
+
+
+def flush_stats(cache_alias='default', timeout=3600):
+    flush_process_data('connections', get_stats(), cache_alias, timeout)
+
+
+def get_flushed_stats(cache_alias='default'):
+    """
+    Return the {alias: stats} of the connections of all the processes,
+    with the number of processes
+    """
+    merged = defaultdict(Counter)
+    for stats in get_flushed_process_data('connections', cache_alias):
+        for alias, alias_stats in stats.items():
+            merged[alias].update(alias_stats)
+            merged[alias]['processes'] += 1
+    return dict((alias, dict(stats)) for alias, stats in merged.items())
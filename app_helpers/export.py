@@ -0,0 +1,36 @@
+import csv
+
+from django.utils.encoding import force_text
+from openpyxl import Workbook
+
+
+class Echo(object):
+    """
+    File-like object returning what is written to it, to stream the output
+    of csv.writer
+    """
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    """
+    Yield ROWS, lists of values, as CSV lines
+    """
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow([force_text(value).encode('utf-8')
+                               for value in row])
+
+
+def write_xlsx(rows, f):
+    """
+    Write ROWS, lists of values, to the XLSX file F. The workbook is written
+    in write-only mode, which keeps the rows on disk instead of in memory
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    for row in rows:
+        sheet.append(row)
+    workbook.save(f)
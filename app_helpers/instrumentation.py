@@ -0,0 +1,319 @@
+"""
+Per-request SQL instrumentation.
+
+The cursors of the database connections are wrapped once (install) to
+record the queries run while a RequestStats is active for the thread: their
+number, their time and the fingerprint of their SQL, to find the queries
+repeated by a N+1. The data of the serializers wrapped by TimedSerializer
+is timed too, apart from the queries it runs. ViewHistograms keeps the
+last requests of each view and is flushed to the cache, where the
+report_slow_endpoints command reads the histograms of all the processes.
+"""
+import bisect
+import os
+import re
+import socket
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.db import connections
+
+_state = threading.local()
+
+# upper bounds of the histogram buckets, in milliseconds and queries
+TIME_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+FINGERPRINT_IN_LISTS = re.compile(r'\bIN \(%s(\s*,\s*%s)*\)', re.I)
+FINGERPRINT_LITERALS = re.compile(r"'[^']*'|\b\d+\b")
+
+
+def get_fingerprint(sql):
+    """
+    Return SQL with the parameter lists and the literals collapsed, so that
+    the same query run with other values has the same fingerprint
+    """
+    sql = FINGERPRINT_IN_LISTS.sub('IN (...)', sql)
+    return ' '.join(FINGERPRINT_LITERALS.sub('?', sql).split())
+
+
+class RequestStats(object):
+    """
+    Queries run by the thread while the stats are active
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.fingerprints = Counter()
+
+    def add_query(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.fingerprints[get_fingerprint(sql)] += 1
+
+    @property
+    def duplicates(self):
+        """
+        Return the number of queries repeating the SQL of a previous one
+        """
+        return sum(count - 1 for count in self.fingerprints.values())
+
+    def get_duplicate_fingerprints(self):
+        return [(fingerprint, count) for fingerprint, count in
+                self.fingerprints.most_common() if count > 1]
+
+    def __enter__(self):
+        install()
+        self.previous = getattr(_state, 'stats', None)
+        _state.stats = self
+        return self
+
+    def __exit__(self, *exc_info):
+        _state.stats = self.previous
+
+
+@contextmanager
+def serializer_timing():
+    """
+    Add the time spent in the block, except in the queries, to the
+    serializer time of the active RequestStats
+    """
+    stats = getattr(_state, 'stats', None)
+    if stats is None:
+        yield
+        return
+    start = time.time()
+    db_time = stats.db_time
+    try:
+        yield
+    finally:
+        stats.serializer_time += \
+            time.time() - start - (stats.db_time - db_time)
+
+
+class TimedSerializer(object):
+    """
+    Serializer wrapper recording the time of its data in the active
+    RequestStats
+    """
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+
+    def __getattr__(self, attr):
+        return getattr(self.serializer, attr)
+
+    @property
+    def data(self):
+        with serializer_timing():
+            return self.serializer.data
+
+
+class InstrumentedCursor(object):
+    """
+    Cursor wrapper recording the queries in the active RequestStats
+    """
+
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def __getattr__(self, attr):
+        return getattr(self.cursor, attr)
+
+    def __iter__(self):
+        return iter(self.cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def record(self, method, sql, *args):
+        stats = getattr(_state, 'stats', None)
+        if stats is None:
+            return method(sql, *args)
+        start = time.time()
+        try:
+            return method(sql, *args)
+        finally:
+            stats.add_query(sql, time.time() - start)
+
+    def execute(self, sql, params=None):
+        return self.record(self.cursor.execute, sql, params)
+
+    def executemany(self, sql, param_list):
+        return self.record(self.cursor.executemany, sql, param_list)
+
+
+def instrument_cursor_factory(make_cursor):
+    def make_instrumented_cursor(cursor):
+        return InstrumentedCursor(make_cursor(cursor))
+    return make_instrumented_cursor
+
+
+def install():
+    """
+    Wrap the cursors of the database connections of the thread
+    """
+    for connection in connections.all():
+        if getattr(connection, 'instrumented', False):
+            continue
+        connection.make_cursor = instrument_cursor_factory(
+            connection.make_cursor)
+        connection.make_debug_cursor = instrument_cursor_factory(
+            connection.make_debug_cursor)
+        connection.instrumented = True
+
+
+def get_bucket(buckets, value):
+    return bisect.bisect_left(buckets, value)
+
+
+def get_percentile(buckets, counts, percentile):
+    """
+    Return the upper bound of the bucket holding PERCENTILE of COUNTS, or
+    None for the last, unbounded, bucket
+    """
+    total = sum(counts)
+    if not total:
+        return None
+    rank = total * percentile / 100.0
+    seen = 0
+    for i, count in enumerate(counts):
+        seen += count
+        if seen >= rank:
+            return buckets[i] if i < len(buckets) else None
+    return None
+
+
+class ViewHistograms(object):
+    """
+    Rolling histograms of the last WINDOW requests of each view
+    """
+
+    def __init__(self, window=1000):
+        self.window = window
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.lock = threading.Lock()
+
+    def add(self, view_name, total_time, stats):
+        with self.lock:
+            self.samples[view_name].append((
+                total_time * 1000, stats.db_time * 1000,
+                stats.serializer_time * 1000, stats.queries,
+                stats.duplicates, stats.get_duplicate_fingerprints()[:1]))
+
+    def get_histograms(self):
+        """
+        Return the {view name: histogram} of the requests in the window,
+        the histograms of several processes being merged with
+        merge_histograms
+        """
+        with self.lock:
+            samples = dict((view_name, list(view_samples))
+                           for view_name, view_samples in self.samples.items())
+        histograms = {}
+        for view_name, view_samples in samples.items():
+            histogram = new_histogram()
+            for total_ms, db_ms, serializer_ms, queries, duplicates, \
+                    fingerprints in view_samples:
+                histogram['requests'] += 1
+                histogram['total_ms'] += total_ms
+                histogram['db_ms'] += db_ms
+                histogram['serializer_ms'] += serializer_ms
+                histogram['queries'] += queries
+                histogram['duplicates'] += duplicates
+                histogram['max_queries'] = max(histogram['max_queries'],
+                                               queries)
+                histogram['time_buckets'][get_bucket(
+                    TIME_BUCKETS, total_ms)] += 1
+                histogram['queries_buckets'][get_bucket(
+                    QUERIES_BUCKETS, queries)] += 1
+                for fingerprint, count in fingerprints:
+                    histogram['fingerprints'][fingerprint] = max(
+                        histogram['fingerprints'].get(fingerprint, 0), count)
+            histograms[view_name] = histogram
+        return histograms
+
+
+def new_histogram():
+    return {'requests': 0, 'total_ms': 0.0, 'db_ms': 0.0,
+            'serializer_ms': 0.0, 'queries': 0, 'duplicates': 0,
+            'max_queries': 0,
+            'time_buckets': [0] * (len(TIME_BUCKETS) + 1),
+            'queries_buckets': [0] * (len(QUERIES_BUCKETS) + 1),
+            'fingerprints': {}}
+
+
+def merge_histograms(histograms_list):
+    """
+    Merge the {view name: histogram} dicts of HISTOGRAMS_LIST
+    """
+    merged = defaultdict(new_histogram)
+    for histograms in histograms_list:
+        for view_name, histogram in histograms.items():
+            total = merged[view_name]
+            for field in ('requests', 'total_ms', 'db_ms', 'serializer_ms',
+                          'queries', 'duplicates'):
+                total[field] += histogram[field]
+            total['max_queries'] = max(total['max_queries'],
+                                       histogram['max_queries'])
+            for field in ('time_buckets', 'queries_buckets'):
+                total[field] = [a + b for a, b in
+                                zip(total[field], histogram[field])]
+            for fingerprint, count in histogram['fingerprints'].items():
+                total['fingerprints'][fingerprint] = max(
+                    total['fingerprints'].get(fingerprint, 0), count)
+    return dict(merged)
+
+
+def get_process_key(name):
+    return '%s:%s:%d' % (name, socket.gethostname(), os.getpid())
+
+
+def flush_process_data(name, data, cache_alias='default', timeout=3600):
+    """
+    Write the NAME DATA of the process to the cache, and register the
+    process for get_flushed_process_data
+    """
+    cache = caches[cache_alias]
+    key = get_process_key(name)
+    processes_key = '%s:processes' % name
+    cache.set(key, data, timeout)
+    keys = cache.get(processes_key) or set()
+    if key not in keys:
+        keys.add(key)
+        cache.set(processes_key, keys, None)
+
+
+def get_flushed_process_data(name, cache_alias='default'):
+    """
+    Return the NAME data flushed by the processes, forgetting the processes
+    whose data expired
+    """
+    cache = caches[cache_alias]
+    processes_key = '%s:processes' % name
+    keys = cache.get(processes_key) or set()
+    data = cache.get_many(list(keys))
+    if set(data) != keys:
+        cache.set(processes_key, set(data), None)
+    return data.values()
+
+
+def flush_histograms(histograms, cache_alias='default', timeout=3600):
+    flush_process_data('instrumentation', histograms.get_histograms(),
+                       cache_alias, timeout)
+
+
+def get_flushed_histograms(cache_alias='default'):
+    """
+    Return the merged histograms flushed by the processes
+    """
+    return merge_histograms(
+        get_flushed_process_data('instrumentation', cache_alias))
@@ -1,8 +1,9 @@
 from __future__ import unicode_literals
 
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
 
+from app_helpers.bulk import bulk_update
 from project.settings import APP_OID_PREFIX
 
 User = settings.AUTH_USER_MODEL
@@ -29,6 +30,53 @@ class OIDModel(models.Model):
                                           formatted_oid)
         return formatted_oid
 
+    @classmethod
+    def assign_oids(cls, queryset=None, chunk_size=1000):
+        """
+        Set the OID of the rows of QUERYSET (all the rows by default) which
+        have none, with one UPDATE per CHUNK_SIZE rows
+        """
+        if queryset is None:
+            queryset = cls._base_manager.all()
+        model_prefix = cls.get_model_prefix()
+        oids = dict(
+            (pk, cls.format_oid(pk, model_prefix))
+            for pk in queryset.filter(models.Q(oid='') | models.Q(oid=None)).
+            order_by().values_list('pk', flat=True))
+        bulk_update(cls, 'oid', oids, chunk_size)
+        return oids
+
+    @classmethod
+    def bulk_create_with_oids(cls, objs, batch_size=None):
+        """
+        Insert OBJS with bulk_create and assign their OIDs in bulk
+        afterwards. As bulk_create does not return the new ids on MySQL, they
+        are set on OBJS in insertion order. When other rows were inserted
+        meanwhile the ids are unknown, RuntimeError is raised and nothing is
+        inserted
+        """
+        with transaction.atomic():
+            last_pk = cls._base_manager.order_by('-pk'). \
+                values_list('pk', flat=True).first()
+            objs = cls._base_manager.bulk_create(objs, batch_size=batch_size)
+            queryset = cls._base_manager.all()
+            if last_pk is not None:
+                queryset = queryset.filter(pk__gt=last_pk)
+            if any(obj.pk is None for obj in objs):
+                new_pks = list(queryset.order_by('pk').
+                               values_list('pk', flat=True))
+                if len(new_pks) != len(objs):
+                    raise RuntimeError(
+                        'Rows were inserted in %s meanwhile, the ids of the '
+                        'new rows are unknown' % cls._meta.db_table)
+                for obj, pk in zip(objs, new_pks):
+                    obj.pk = pk
+            oids = cls.assign_oids(queryset)
+        for obj in objs:
+            if obj.pk in oids:
+                obj.oid = oids[obj.pk]
+        return objs
+
     def save(self, *args, **kwargs):
         save_oid = False
         if not self.oid and not self.id:
@@ -39,10 +87,10 @@ class OIDModel(models.Model):
         if save_oid:
             model_prefix = self.__class__.get_model_prefix()
             self.oid = self.__class__.format_oid(self.id, model_prefix)
-            # remove force_insert kwarg in case the objet was already created
-            if kwargs.get('force_insert', False):
-                kwargs.pop('force_insert')
-            super(OIDModel, self).save(*args, **kwargs)
+            # only write the oid column, without running the save hooks and
+            # signals of the row a second time
+            self.__class__._base_manager.filter(pk=self.pk). \
+                update(oid=self.oid)
 
     class Meta():
         abstract = True
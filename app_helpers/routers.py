@@ -0,0 +1,161 @@
+"""
+Routing of the reads to the replicas of the default database.
+
+The replicas listed in DATABASE_REPLICAS only get the reads of the models
+of REPLICA_APP_LABELS made inside replica_reads, entered by
+ReplicaRoutingMiddleware for the GET requests of the api app. Everything
+else goes to the primary: the writes, the reads inside an atomic block,
+the reads of a request after it wrote and the requests of a user pinned
+by pin_primary after modifying their favorites or requests, for
+REPLICA_PIN_SECONDS. One replica is used per request, picked round robin
+or, with REPLICA_SELECTION = 'least_lag', the least lagging one of those
+less than REPLICA_MAX_LAG seconds behind.
+"""
+import itertools
+import logging
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+_state = threading.local()
+_round_robin = itertools.count()
+
+LAGS_KEY = 'replica:lags'
+
+
+def get_pin_key(user_pk):
+    return 'replica:pin:%s' % user_pk
+
+
+def pin_primary(user_pk):
+    """
+    Send the reads of the requests of the user USER_PK to the primary for
+    REPLICA_PIN_SECONDS, so that they see their own writes
+    """
+    if user_pk:
+        cache.set(get_pin_key(user_pk), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned(user_pk):
+    return bool(user_pk) and cache.get(get_pin_key(user_pk), False)
+
+
+def get_replica_lag(alias):
+    """
+    Return the seconds the replica ALIAS is behind the primary, or None
+    when it does not replicate or cannot be reached
+    """
+    connection = connections[alias]
+    try:
+        if connection.vendor != 'mysql':
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute('SHOW SLAVE STATUS')
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            columns = [column[0] for column in cursor.description]
+    except DatabaseError:
+        logger.exception('Failed to read the lag of the replica %s', alias)
+        return None
+    return dict(zip(columns, row)).get('Seconds_Behind_Master')
+
+
+def get_replica_lags():
+    """
+    Return the {alias: lag} of the replicas, read at most once every
+    REPLICA_LAG_CHECK_INTERVAL seconds
+    """
+    lags = cache.get(LAGS_KEY)
+    if lags is None:
+        lags = dict((alias, get_replica_lag(alias))
+                    for alias in settings.DATABASE_REPLICAS)
+        cache.set(LAGS_KEY, lags, settings.REPLICA_LAG_CHECK_INTERVAL)
+    return lags
+
+
+def select_replica():
+    """
+    Return the alias of the replica serving the reads of a request, or the
+    primary when no replica is available
+    """
+    replicas = list(settings.DATABASE_REPLICAS)
+    if settings.REPLICA_SELECTION == 'least_lag':
+        lags = get_replica_lags()
+        replicas = [alias for alias in replicas
+                    if lags.get(alias) is not None and
+                    lags[alias] <= settings.REPLICA_MAX_LAG]
+        if replicas:
+            least_lag = min(lags[alias] for alias in replicas)
+            replicas = [alias for alias in replicas
+                        if lags[alias] == least_lag]
+    if not replicas:
+        return DEFAULT_DB_ALIAS
+    return replicas[next(_round_robin) % len(replicas)]
+
+
+class ReplicaReads(object):
+    """
+    Routing state of the block: whether its reads may go to a replica, the
+    replica picked for them and whether it wrote to the primary
+    """
+
+    def __init__(self, enabled):
+        self.enabled = enabled
+        self.alias = None
+        self.wrote = False
+
+    def get_alias(self):
+        if not self.enabled or self.wrote or \
+                connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        if self.alias is None:
+            self.alias = select_replica()
+        return self.alias
+
+
+@contextmanager
+def replica_reads(enabled=True, user_pk=None):
+    """
+    Route the reads of the block to a replica when ENABLED and the user
+    USER_PK is not pinned to the primary
+    """
+    previous = getattr(_state, 'reads', None)
+    reads = ReplicaReads(enabled and bool(settings.DATABASE_REPLICAS) and
+                         not is_pinned(user_pk))
+    _state.reads = reads
+    try:
+        yield reads
+    finally:
+        _state.reads = previous
+
+
+class ReplicaRouter(object):
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in settings.REPLICA_APP_LABELS:
+            return DEFAULT_DB_ALIAS
+        # the related objects are read from the database of their instance
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        reads = getattr(_state, 'reads', None)
+        if reads is None:
+            return DEFAULT_DB_ALIAS
+        return reads.get_alias()
+
+    def db_for_write(self, model, **hints):
+        reads = getattr(_state, 'reads', None)
+        if reads is not None:
+            reads.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = set([DEFAULT_DB_ALIAS]) | set(settings.DATABASE_REPLICAS)
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
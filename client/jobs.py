@@ -0,0 +1,116 @@
+"""
+Generation of the files of the requests queued as RequestJob
+"""
+import logging
+import tempfile
+import traceback
+from datetime import timedelta
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from app.models import MedicalExpert
+from app.models_relations import MedicalExpertPublication
+from app.resources import MedicalExpertBaseDataExportResource, \
+                          MedicalExpertExportResource
+from .models import AuthorsRequest, Request, RequestJob
+
+logger = logging.getLogger(__name__)
+
+
+def get_favorites(request):
+    return MedicalExpert.objects.filter(
+        favoriteinvestigator__user=request.user_id)
+
+
+def get_authors(request):
+    """
+    Return the medical experts matching the criteria of the authors REQUEST.
+    The topic of interest is free text, it is left to the analyst
+    """
+    request = AuthorsRequest.objects.get(pk=request.pk)
+    publication_filters = {
+        'publication__publication_year__gte': request.year_from,
+        'publication__publication_year__lte': request.year_to,
+    }
+    subtypes = list(request.types_publication_interest.
+                    values_list('pk', flat=True))
+    if subtypes:
+        publication_filters['publication__publication_subtype__in'] = subtypes
+    medical_experts = MedicalExpert.objects.filter(
+        pk__in=MedicalExpertPublication.objects.filter(
+            **publication_filters).values('medical_expert'))
+    countries = list(request.countries_interest.values_list('pk', flat=True))
+    if countries:
+        medical_experts = medical_experts.filter(country__in=countries)
+    return medical_experts
+
+
+# the medical experts and the export resource of each request type; the
+# full profile is the export of all the medical expert columns and counters,
+# the profile sections stay served by the API
+REQUEST_EXPORTS = {
+    Request.REQUEST_TYPE_FAVORITES_BASE_DATA:
+        (get_favorites, MedicalExpertBaseDataExportResource),
+    Request.REQUEST_TYPE_FAVORITES_FULL_PROFILE:
+        (get_favorites, MedicalExpertExportResource),
+    Request.REQUEST_TYPE_AUTHORS:
+        (get_authors, MedicalExpertExportResource),
+}
+
+
+def run_job(job, chunk_size=1000):
+    """
+    Generate the file of the request of JOB in MEDIA_ROOT/requests and mark
+    the request as sent
+    """
+    request = job.request
+    get_medical_experts, resource_class = \
+        REQUEST_EXPORTS[request.request_type]
+    with tempfile.TemporaryFile() as f:
+        resource_class().export_to_file(
+            f, 'xlsx', get_medical_experts(request), chunk_size)
+        f.seek(0)
+        name = default_storage.save(
+            'requests/%s_%d.xlsx' % (request.request_type, request.pk),
+            File(f))
+    # the Request subclasses reset request_file in save
+    Request.objects.filter(pk=request.pk).update(
+        request_file=name, status=Request.REQUEST_STATUS_SENT,
+        sent=timezone.now())
+    RequestJob.objects.filter(pk=job.pk).update(
+        status=RequestJob.STATUS_DONE, locked_by='', last_error='')
+
+
+def fail_job(job, error, max_attempts=3, retry_delay=60):
+    """
+    Record ERROR on JOB and queue it again after an exponential delay, or
+    mark it as failed after MAX_ATTEMPTS
+    """
+    if job.attempts < max_attempts:
+        RequestJob.objects.filter(pk=job.pk).update(
+            status=RequestJob.STATUS_QUEUED, locked_by='', last_error=error,
+            run_after=timezone.now() + timedelta(
+                seconds=retry_delay * 2 ** (job.attempts - 1)))
+    else:
+        RequestJob.objects.filter(pk=job.pk).update(
+            status=RequestJob.STATUS_FAILED, locked_by='', last_error=error)
+
+
+def process_jobs(worker, max_attempts=3, retry_delay=60, chunk_size=1000):
+    """
+    Run the due jobs as WORKER until there is none left. Return the number
+    of jobs run
+    """
+    total = 0
+    while True:
+        job = RequestJob.objects.claim(worker)
+        if job is None:
+            return total
+        try:
+            run_job(job, chunk_size)
+        except Exception:
+            logger.exception('Request job %d failed', job.pk)
+            fail_job(job, traceback.format_exc(), max_attempts, retry_delay)
+        total += 1
@@ -0,0 +1,65 @@
+import os
+import socket
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from client.jobs import process_jobs
+from client.models import RequestJob
+
+
+class Command(BaseCommand):
+    help = 'Generate the files of the pending requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Number of requests processed concurrently')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when there is no due request left '
+                                 'instead of polling')
+        parser.add_argument('--poll-interval', type=int, default=30,
+                            help='Seconds to wait for new requests')
+        parser.add_argument('--max-attempts', type=int, default=3,
+                            help='Number of attempts before a request is '
+                                 'marked as failed')
+        parser.add_argument('--retry-delay', type=int, default=60,
+                            help='Seconds before the first retry, doubled '
+                                 'at each attempt')
+        parser.add_argument('--lock-timeout', type=int, default=3600,
+                            help='Seconds after which a request still '
+                                 'running is queued again')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of medical experts exported at a '
+                                 'time')
+
+    def handle(self, *args, **options):
+        worker_prefix = '%s:%d' % (socket.gethostname(), os.getpid())
+        while True:
+            RequestJob.objects.enqueue_pending(options['lock_timeout'],
+                                               options['max_attempts'])
+            totals = []
+            threads = [
+                threading.Thread(target=self.run_worker, args=(
+                    '%s:%d' % (worker_prefix, i), options, totals))
+                for i in range(options['workers'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            if sum(totals):
+                self.stdout.write('%d requests processed' % sum(totals))
+            if options['once']:
+                return
+            time.sleep(options['poll_interval'])
+
+    def run_worker(self, worker, options, totals):
+        try:
+            totals.append(process_jobs(
+                worker, max_attempts=options['max_attempts'],
+                retry_delay=options['retry_delay'],
+                chunk_size=options['chunk_size']))
+        finally:
+            # each thread has its own database connection
+            connection.close()
@@ -1,10 +1,19 @@
 from __future__ import unicode_literals
 
+from collections import defaultdict
+from datetime import timedelta
+
 from django.conf import settings
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
 
 from app.models import MedicalExpert
 from app_helpers import models as helper_models
+from app_helpers.cache import bump_generations
+from app_helpers.routers import pin_primary
 
 User = settings.AUTH_USER_MODEL
 
@@ -27,6 +36,46 @@ class UnlockedInvestigator(models.Model):
         unique_together = (('user', 'investigator'),)
 
 
+@receiver(post_save, sender=FavoriteInvestigator)
+@receiver(post_delete, sender=FavoriteInvestigator)
+@receiver(post_save, sender=UnlockedInvestigator)
+@receiver(post_delete, sender=UnlockedInvestigator)
+def bump_investigator_flags_generation(sender, instance, **kwargs):
+    bump_generations('investigator_flags', [instance.user_id])
+
+
+class RequestQuerySet(models.QuerySet):
+    def preload_details(self, requests):
+        """
+        Load the subclass rows used by the details of REQUESTS with one query
+        per request type, prefetching their many to many fields, instead of
+        one query per request
+        """
+        subclasses = {
+            Request.REQUEST_TYPE_AUTHORS: (
+                AuthorsRequest,
+                ('types_publication_interest', 'countries_interest')),
+            Request.REQUEST_TYPE_MARKET_ACCESS: (
+                MarketAccessRequest, ('countries_interest',)),
+            Request.REQUEST_TYPE_COMPANY_COOPERATION: (
+                CompanyCooperationRequest, ()),
+            Request.REQUEST_TYPE_OTHER: (OtherRequest, ()),
+        }
+        pks_per_type = defaultdict(list)
+        for request in requests:
+            if request.request_type in subclasses:
+                pks_per_type[request.request_type].append(request.pk)
+        details_requests = {}
+        for request_type, pks in pks_per_type.items():
+            model, m2m_fields = subclasses[request_type]
+            for details_request in model.objects.filter(pk__in=pks). \
+                    prefetch_related(*m2m_fields):
+                details_requests[details_request.pk] = details_request
+        for request in requests:
+            request._details_request = details_requests.get(request.pk)
+        return requests
+
+
 class Request(models.Model):
     REQUEST_TYPE_FAVORITES_BASE_DATA = 'favorites_base_data'
     REQUEST_TYPE_FAVORITES_FULL_PROFILE = 'favorites_full_profile'
@@ -67,6 +116,8 @@ class Request(models.Model):
     status = models.CharField(max_length=10, choices=REQUEST_STATUS_CHOICES,
                               default=REQUEST_STATUS_PENDING)
 
+    objects = RequestQuerySet.as_manager()
+
     @property
     def added_date(self):
         return self.added.date()
@@ -77,6 +128,16 @@ class Request(models.Model):
             return self.sent.date()
         return 'Pending'
 
+    def get_details_request(self, model):
+        """
+        Return the MODEL row of the request, preloaded by
+        RequestQuerySet.preload_details when available
+        """
+        details_request = getattr(self, '_details_request', None)
+        if details_request is None:
+            details_request = model.objects.get(pk=self.pk)
+        return details_request
+
     @property
     def details(self):
         details_text = ''
@@ -85,7 +146,7 @@ class Request(models.Model):
         elif self.request_type == self.REQUEST_TYPE_FAVORITES_FULL_PROFILE:
             details_text = 'Full Profile'
         elif self.request_type == self.REQUEST_TYPE_AUTHORS:
-            request = AuthorsRequest.objects.get(pk=self.pk)
+            request = self.get_details_request(AuthorsRequest)
             details_text = 'From: %s To: %s<br />' \
                            'Type of Publication of Interest: %s<br />' \
                            'Topic of Interest: %s<br />' \
@@ -102,7 +163,7 @@ class Request(models.Model):
                                       request.countries_interest.all()),
                             request.other_comments)
         elif self.request_type == self.REQUEST_TYPE_MARKET_ACCESS:
-            request = MarketAccessRequest.objects.get(pk=self.pk)
+            request = self.get_details_request(MarketAccessRequest)
             details_text = 'Topic of Interest: %s<br />' \
                            'Countries of Interest: %s<br />' \
                            'Other Comments: %s' % \
@@ -112,7 +173,7 @@ class Request(models.Model):
                                       request.countries_interest.all()),
                             request.other_comments)
         elif self.request_type == self.REQUEST_TYPE_COMPANY_COOPERATION:
-            request = CompanyCooperationRequest.objects.get(pk=self.pk)
+            request = self.get_details_request(CompanyCooperationRequest)
             details_text = 'Companies of Interest: %s<br />' \
                            'Drugs / Medical Devices of Interest: %s<br />' \
                            'Other Comments: %s' % \
@@ -120,7 +181,7 @@ class Request(models.Model):
                             request.drugs_medical_devices_interest,
                             request.other_comments)
         elif self.request_type == self.REQUEST_TYPE_OTHER:
-            request = OtherRequest.objects.get(pk=self.pk)
+            request = self.get_details_request(OtherRequest)
             details_text = 'Description: %s' % \
                            (request.description)
         return [
@@ -186,3 +247,121 @@ class OtherRequest(Request):
     def save(self, *args, **kwargs):
         self.request_type = self.REQUEST_TYPE_OTHER
         super(OtherRequest, self).save(*args, **kwargs)
+
+
+class RequestJobQuerySet(models.QuerySet):
+    def enqueue(self, requests):
+        """
+        Queue a job for each of the REQUESTS ids and return the number of
+        jobs created. A request queued meanwhile by another process is
+        skipped: each job is inserted in its own savepoint, so its
+        IntegrityError does not abort the others
+        """
+        total = 0
+        for pk in requests:
+            try:
+                with transaction.atomic():
+                    self.create(request_id=pk)
+            except IntegrityError:
+                continue
+            total += 1
+        return total
+
+    def enqueue_pending(self, lock_timeout=3600, max_attempts=3):
+        """
+        Queue a job for the pending requests which can be fulfilled
+        automatically and have none yet, and requeue the jobs whose worker
+        has not finished after LOCK_TIMEOUT seconds, or mark them as failed
+        after MAX_ATTEMPTS
+        """
+        requests = Request.objects.filter(
+            status=Request.REQUEST_STATUS_PENDING,
+            request_type__in=RequestJob.REQUEST_TYPES, requestjob=None)
+        self.enqueue(list(requests.values_list('pk', flat=True)))
+        stale = self.filter(status=RequestJob.STATUS_RUNNING,
+                            locked_at__lt=timezone.now() -
+                            timedelta(seconds=lock_timeout))
+        # a job which keeps crashing its worker is never failed by fail_job
+        stale.filter(attempts__gte=max_attempts). \
+            update(status=RequestJob.STATUS_FAILED, locked_by='',
+                   last_error=RequestJob.LOCK_TIMEOUT_ERROR)
+        stale.update(status=RequestJob.STATUS_QUEUED, locked_by='',
+                     last_error=RequestJob.LOCK_TIMEOUT_ERROR)
+
+    def claim(self, worker):
+        """
+        Lock the next due job for WORKER and return it, or None when there
+        is none. The job is locked with a conditional UPDATE, so concurrent
+        workers never claim the same job
+        """
+        while True:
+            now = timezone.now()
+            job = self.filter(
+                Q(run_after=None) | Q(run_after__lte=now),
+                status=RequestJob.STATUS_QUEUED).order_by('pk').first()
+            if job is None:
+                return None
+            if self.filter(pk=job.pk, status=RequestJob.STATUS_QUEUED). \
+                    update(status=RequestJob.STATUS_RUNNING, locked_by=worker,
+                           locked_at=now, attempts=models.F('attempts') + 1):
+                return self.get(pk=job.pk)
+
+
+class RequestJob(models.Model):
+    """
+    Queued generation of the file of a Request, run by the process_requests
+    command
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = (
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    )
+
+    # the request types whose file can be generated without an analyst
+    REQUEST_TYPES = (
+        Request.REQUEST_TYPE_FAVORITES_BASE_DATA,
+        Request.REQUEST_TYPE_FAVORITES_FULL_PROFILE,
+        Request.REQUEST_TYPE_AUTHORS,
+    )
+
+    LOCK_TIMEOUT_ERROR = 'Lock timed out'
+
+    request = models.OneToOneField(Request)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES,
+                              default=STATUS_QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=255, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    objects = RequestJobQuerySet.as_manager()
+
+    class Meta:
+        index_together = (('status', 'run_after'),)
+
+
+# the signals of the Request subclasses are sent with their own sender
+@receiver([post_save, post_delete], sender=FavoriteInvestigator)
+@receiver([post_save, post_delete], sender=UnlockedInvestigator)
+@receiver([post_save, post_delete], sender=Request)
+@receiver([post_save, post_delete], sender=FavoritesBaseDataRequest)
+@receiver([post_save, post_delete], sender=FavoritesFullProfileRequest)
+@receiver([post_save, post_delete], sender=AuthorsRequest)
+@receiver([post_save, post_delete], sender=MarketAccessRequest)
+@receiver([post_save, post_delete], sender=CompanyCooperationRequest)
+@receiver([post_save, post_delete], sender=OtherRequest)
+def pin_user_to_primary(sender, instance, **kwargs):
+    """
+    Read the data of the user from the primary for a while after they
+    modified their favorites or requests, the replicas being behind
+    """
+    pin_primary(instance.user_id)
@@ -0,0 +1,99 @@
+import shutil
+import tempfile
+from datetime import timedelta
+
+import openpyxl
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..jobs import process_jobs
+from ..models import FavoritesBaseDataRequest, FavoriteInvestigator, \
+                     OtherRequest, Request, RequestJob
+from app.models import MedicalExpert
+
+User = get_user_model()
+
+
+class RequestJobTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.user = User.objects.create_user(
+            username='user1', email='user1@example.com', password='pass')
+        for i in range(3):
+            medical_expert = MedicalExpert.objects.create(
+                first_name='First_%d' % i, last_name='Last_%d' % i)
+            if i:
+                FavoriteInvestigator.objects.create(
+                    user=self.user, investigator=medical_expert)
+        self.request = FavoritesBaseDataRequest.objects.create(user=self.user)
+        OtherRequest.objects.create(user=self.user, description='Other',
+                                    favorites=False)
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root)
+
+    def test_process_jobs(self):
+        RequestJob.objects.enqueue_pending()
+        RequestJob.objects.enqueue_pending()
+        self.assertEqual(
+            list(RequestJob.objects.values_list('request', flat=True)),
+            [self.request.pk])
+        with override_settings(MEDIA_ROOT=self.media_root):
+            self.assertEqual(process_jobs('worker'), 1)
+            request = Request.objects.get(pk=self.request.pk)
+            self.assertEqual(request.status, Request.REQUEST_STATUS_SENT)
+            self.assertIsNotNone(request.sent)
+            rows = list(openpyxl.load_workbook(
+                request.request_file.path).active.values)
+        self.assertEqual([row[1] for row in rows],
+                         ['combined_name', 'First_1 Last_1', 'First_2 Last_2'])
+        self.assertEqual(RequestJob.objects.get().status,
+                         RequestJob.STATUS_DONE)
+
+    def test_process_jobs_retry(self):
+        RequestJob.objects.enqueue_pending()
+        Request.objects.filter(pk=self.request.pk).update(
+            request_type=Request.REQUEST_TYPE_OTHER)
+        self.assertEqual(process_jobs('worker', max_attempts=2), 1)
+        job = RequestJob.objects.get()
+        self.assertEqual((job.status, job.attempts),
+                         (RequestJob.STATUS_QUEUED, 1))
+        self.assertIn('KeyError', job.last_error)
+        self.assertEqual(process_jobs('worker'), 0)
+
+        RequestJob.objects.update(run_after=None)
+        self.assertEqual(process_jobs('worker', max_attempts=2), 1)
+        job = RequestJob.objects.get()
+        self.assertEqual((job.status, job.attempts),
+                         (RequestJob.STATUS_FAILED, 2))
+
+    def test_enqueue_queued_meanwhile(self):
+        # another process queued the request after it was selected
+        RequestJob.objects.enqueue_pending()
+        self.assertEqual(RequestJob.objects.enqueue(
+            [self.request.pk, self.request.pk]), 0)
+        self.assertEqual(
+            list(RequestJob.objects.values_list('request', flat=True)),
+            [self.request.pk])
+
+    def test_enqueue_pending_lock_timeout(self):
+        RequestJob.objects.enqueue_pending()
+        locked_at = timezone.now() - timedelta(hours=2)
+        RequestJob.objects.update(status=RequestJob.STATUS_RUNNING,
+                                  locked_by='worker', locked_at=locked_at,
+                                  attempts=1)
+        RequestJob.objects.enqueue_pending(max_attempts=2)
+        job = RequestJob.objects.get()
+        self.assertEqual((job.status, job.locked_by),
+                         (RequestJob.STATUS_QUEUED, ''))
+        self.assertEqual(job.last_error, RequestJob.LOCK_TIMEOUT_ERROR)
+
+        RequestJob.objects.update(status=RequestJob.STATUS_RUNNING,
+                                  locked_by='worker', locked_at=locked_at,
+                                  attempts=2)
+        RequestJob.objects.enqueue_pending(max_attempts=2)
+        job = RequestJob.objects.get()
+        self.assertEqual((job.status, job.locked_by),
+                         (RequestJob.STATUS_FAILED, ''))
+        self.assertEqual(process_jobs('worker'), 0)
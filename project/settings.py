@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/1.10/ref/settings/
 """
 
 import os
+import tempfile
 from settings_local import *
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app.middleware.QueryInstrumentationMiddleware',
+    'app.middleware.ConnectionHealthMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -49,6 +52,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'app.middleware.ReplicaRoutingMiddleware',
+    'app.middleware.DeferredCountersMiddleware',
 ]
 
 AUTH_USER_MODEL = 'users.User'
@@ -87,12 +92,74 @@ DATABASES = {
         'PASSWORD': API_DB_PASSWORD,
         'HOST': API_DB_HOST,
         'PORT': '',
+        'CONN_MAX_AGE': globals().get('API_DB_CONN_MAX_AGE', 60),
         'OPTIONS': {
             'init_command': "SET sql_mode='STRICT_TRANS_TABLES'",
         },
     },
 }
 
+# read only replicas of the default database: API_DB_REPLICAS in
+# settings_local is the {alias: settings} of the replicas, their missing
+# settings being those of default
+API_DB_REPLICAS = globals().get('API_DB_REPLICAS', {})
+for alias, replica in API_DB_REPLICAS.items():
+    DATABASES[alias] = dict(DATABASES['default'], **replica)
+
+# persistent connections, kept CONN_MAX_AGE seconds: the number of requests
+# a connection serves before it is replaced, and whether it is pinged
+# before each request, see app_helpers.db_connections
+DB_CONN_MAX_USES = 1000
+DB_CONN_HEALTH_CHECKS = True
+
+DATABASE_ROUTERS = ['app_helpers.routers.ReplicaRouter']
+DATABASE_REPLICAS = sorted(API_DB_REPLICAS)
+# apps whose models are read from the replicas by the GET requests of the
+# api app, see app_helpers.routers
+REPLICA_APP_LABELS = ('app', 'app_helpers', 'client')
+# 'round_robin' or 'least_lag'
+REPLICA_SELECTION = 'round_robin'
+# seconds a replica may be behind the primary, and between two reads of the
+# lags, with 'least_lag'
+REPLICA_MAX_LAG = 30
+REPLICA_LAG_CHECK_INTERVAL = 10
+# seconds the reads of a user go to the primary after they modified their
+# favorites or requests. The pin is kept in the default cache, which must
+# be shared by the processes of the server
+REPLICA_PIN_SECONDS = 30
+
+
+# Cache
+# https://docs.djangoproject.com/en/1.10/topics/cache/
+
+CACHES = {
+    # the generations bumped on writes and the users pinned to the primary
+    # are seen by all the processes of the server and the management commands
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(),
+                                 'medical-experts-api'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    'instrumentation': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(tempfile.gettempdir(),
+                                 'medical-experts-api-instrumentation'),
+    },
+}
+
+# seconds the per-investigator aggregates stay cached, as a safety net for
+# the changes which do not bump the investigator generation
+INVESTIGATOR_CACHE_TIMEOUT = 60 * 60
+
+# query instrumentation: number of requests kept per view, and how often
+# (seconds) each process writes its histograms to INSTRUMENTATION_CACHE
+INSTRUMENTATION_WINDOW = 1000
+INSTRUMENTATION_FLUSH_INTERVAL = 60
+INSTRUMENTATION_CACHE = 'instrumentation'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/1.10/ref/settings/#auth-password-validators
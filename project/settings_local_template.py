@@ -4,6 +4,12 @@ API_DB_NAME = '<insert here>'
 API_DB_USER = '<insert here>'
 API_DB_PASSWORD = '<insert here>'
 API_DB_HOST = '<insert here>'
+# seconds the database connections are kept open, 0 to close them after
+# each request
+API_DB_CONN_MAX_AGE = 60
+# {alias: settings} of the read only replicas, e.g.
+# {'replica_1': {'HOST': '<insert here>'}}
+API_DB_REPLICAS = {}
 EMAIL_BACKEND = '<insert here>'
 EMAIL_PORT = '<insert here>'
 EMAIL_HOST = '<insert here>'